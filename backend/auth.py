@@ -0,0 +1,138 @@
+import hmac
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from flask import current_app, has_app_context, jsonify, request
+from flask_jwt_extended import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
+from database import User
+from replicas import primary
+
+# Read-only view of the authenticated user; load the User row to modify it
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'email', 'first_name', 'last_name', 'role'])
+
+class IdentityCache:
+    """Short-TTL cache of CurrentUser snapshots keyed by JWT subject"""
+
+    def __init__(self, max_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.max_entries = max_entries
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(str(key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# One cache per app instance (user ids are only unique within one database); see create_app()
+identity_cache = LocalProxy(lambda: current_app.extensions['identity_cache'])
+
+def load_identity(user_id):
+    """Return the CurrentUser for user_id, from the identity cache when fresh"""
+    key = str(user_id)
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 0)
+    if ttl > 0:
+        cached = identity_cache.get(key)
+        if cached:
+            return cached
+    with primary():
+        user = User.query.get(int(user_id))
+    if not user or user.is_active is False:
+        # Deactivated users' tokens stop working (flask_jwt_extended answers 401)
+        return None
+    identity = CurrentUser(user.id, user.username, user.email, user.first_name, user.last_name, user.role)
+    if ttl > 0:
+        identity_cache.put(key, identity, ttl)
+    return identity
+
+def user_lookup_callback(_jwt_header, jwt_data):
+    """flask_jwt_extended user_lookup_loader; runs at most once per request"""
+    return load_identity(jwt_data['sub'])
+
+def invalidate_identity(user_id):
+    identity_cache.invalidate(user_id)
+
+# User columns a cached CurrentUser depends on
+_IDENTITY_FIELDS = CurrentUser._fields[1:] + ('is_active',)
+
+@event.listens_for(User, 'after_update')
+def _note_identity_change(mapper, connection, target):
+    # Any ORM write path (routes, admin scripts) that changes these drops the cached identity
+    state = inspect(target)
+    if state.session is not None and any(state.attrs[f].history.has_changes() for f in _IDENTITY_FIELDS):
+        state.session.info.setdefault('stale_identities', set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _drop_stale_identities(session):
+    # After commit, so a request in between cannot cache the old row again
+    stale = session.info.pop('stale_identities', None)
+    if stale and has_app_context() and 'identity_cache' in current_app.extensions:
+        for user_id in stale:
+            invalidate_identity(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_stale_identities(session):
+    session.info.pop('stale_identities', None)
+
+def roles_required(*roles, message='Insufficient permissions'):
+    """Reject the request with 403 unless the current user has one of roles.
+
+    Must be applied below @jwt_required().
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_user.role not in roles:
+                return jsonify({'error': message}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def external_required(message='Insufficient permissions'):
+    """External agencies (and admins) only"""
+    return roles_required('external', 'admin', message=message)
+
+def admin_required(message='Insufficient permissions'):
+    return roles_required('admin', message=message)
+
+def student_required(message='Insufficient permissions'):
+    return roles_required('student', message=message)
+
+def is_debug_token(token):
+    """True when token is the operator's DEBUG_TOKEN (never true while it is unset)"""
+    expected = current_app.config.get('DEBUG_TOKEN') or ''
+    return bool(expected) and hmac.compare_digest((token or '').encode(), expected.encode())
+
+def debug_required(fn):
+    """Debug endpoints: the X-Debug-Token header must carry DEBUG_TOKEN.
+
+    Gated on an operator secret rather than a role, since users can sign up
+    as (or switch to) admin.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not is_debug_token(request.headers.get('X-Debug-Token')):
+            return jsonify({'error': 'Debug token required'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
@@ -3,6 +3,23 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def engine_options(uri):
+    """SQLAlchemy pool settings; in-memory SQLite uses a single static connection and takes none"""
+    options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1'}
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return options
+    options.update({
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+    })
+    if uri.startswith('mysql'):
+        # MySQL drops idle connections after wait_timeout (8h by default, often far less behind
+        # proxies); recycle before that. utf8mb4 is MySQL's real UTF-8 (utf8 stops at 3 bytes).
+        options['pool_recycle'] = int(os.getenv('DB_POOL_RECYCLE', '280'))
+        options['connect_args'] = {'charset': 'utf8mb4'}
+    return options
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
     # Default to SQLite database located at project root instance/data.db
@@ -10,8 +27,115 @@ class Config:
     _DEFAULT_SQLITE_PATH = os.path.abspath(os.path.join(_BASE_DIR, '..', 'instance', 'data.db'))
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f"sqlite:///{_DEFAULT_SQLITE_PATH}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite tuning profile applied to every new connection (set SQLITE_TUNING=0 for stock settings).
+    # WAL lets readers run alongside the writer; synchronous=NORMAL skips the per-commit fsync
+    # (still crash safe in WAL mode, only the last transactions can be lost on power failure).
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', '1') == '1'
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),  # negative = KiB, i.e. 64 MiB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Comma-separated read replicas; SELECTs from GET routes are spread across them
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    # After a write, that user's reads stay on the primary for this long (should exceed replica lag)
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+    # Workspace shards as 'name=url,name=url': messages, files and tasks of each workspace live on
+    # one shard, users/workspaces/memberships stay in DATABASE_URL (run `flask shards init` once)
+    DATABASE_SHARDS = dict(item.strip().split('=', 1) for item in os.getenv('DATABASE_SHARDS', '').split(',')
+                           if item.strip())
+    SHARD_MAP_TTL = float(os.getenv('SHARD_MAP_TTL', '5'))  # seconds a workspace's shard is cached
+    SHARD_ID_BLOCK = int(os.getenv('SHARD_ID_BLOCK', '1000'))  # ids reserved per global round trip
+    # Startup compares the alembic_version stamp with the code's schema revision:
+    # strict refuses to start on a mismatch, warn only logs it, off skips the query
+    SCHEMA_CHECK = os.getenv('SCHEMA_CHECK', 'strict')
+    # Operator secret for the debug endpoints, sent as X-Debug-Token; unset, they answer 403
+    DEBUG_TOKEN = os.getenv('DEBUG_TOKEN', '')
+    # Count and time SQL per request/Socket.IO event, listed at GET /api/debug/queries;
+    # QUERY_STATS_SERVER_TIMING also sends each request's totals in a Server-Timing header
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', '0') == '1'
+    QUERY_STATS_SERVER_TIMING = os.getenv('QUERY_STATS_SERVER_TIMING', '0') == '1'
+    QUERY_STATS_HISTORY = int(os.getenv('QUERY_STATS_HISTORY', '200'))  # recent requests kept
+    QUERY_STATS_STATEMENTS = 50  # statements kept per request
+    # Prometheus text format at GET /metrics (per process), scraped with METRICS_TOKEN as a bearer
+    # token; without a token it answers 403 unless METRICS_PUBLIC=1 opts in to an open endpoint
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', '0') == '1'
+    # Statements slower than SLOW_QUERY_MS go to a rotating JSON-lines log with their EXPLAIN output;
+    # repeats within SLOW_QUERY_WINDOW seconds are folded into one summary line
+    SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', '1') == '1'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(os.path.dirname(_DEFAULT_SQLITE_PATH), 'slow_queries.log'))
+    SLOW_QUERY_WINDOW = int(os.getenv('SLOW_QUERY_WINDOW', '60'))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+    # With the DEBUG_TOKEN in X-Debug-Token, `X-Profile: 1` (or ?profile=1) profiles one request;
+    # '_profile': <DEBUG_TOKEN> in a Socket.IO event's data profiles that event. Collapsed-stack
+    # files land in PROFILER_DIR
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0') == '1'
+    PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(os.path.dirname(_DEFAULT_SQLITE_PATH), 'profiles'))
+    PROFILER_KEEP = int(os.getenv('PROFILER_KEEP', '50'))
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '1'))
+    # Always-on sampling of all threads at a low rate, one profile per window
+    PROFILER_CONTINUOUS = os.getenv('PROFILER_CONTINUOUS', '0') == '1'
+    PROFILER_CONTINUOUS_INTERVAL = float(os.getenv('PROFILER_CONTINUOUS_INTERVAL', '0.1'))
+    PROFILER_CONTINUOUS_WINDOW = int(os.getenv('PROFILER_CONTINUOUS_WINDOW', '300'))
+    PROFILER_CONTINUOUS_MAX_OVERHEAD = 0.01  # fraction of wall time the sampler may spend
+    # Socket.IO chat; with REALTIME_ENABLED=0 flask_socketio is never imported
+    REALTIME_ENABLED = os.getenv('REALTIME_ENABLED', '1') == '1'
+    # Run chat, task and upload writes on one dedicated writer thread
+    DB_SINGLE_WRITER = os.getenv('DB_SINGLE_WRITER', '0') == '1'
+    DB_WRITE_TIMEOUT = 30  # seconds a caller waits for its queued write before it is dropped (503)
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = 86400  # 24 hours
+    # Seconds between pulls of token revocations made by other workers
+    REVOCATION_SYNC_INTERVAL = int(os.getenv('REVOCATION_SYNC_INTERVAL', '10'))
+    # Token-bucket rate limits as 'requests/seconds'; memory:// or sqlite:///path to share across workers
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '1') == '1'
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMITS = {
+        'login': os.getenv('RATELIMIT_LOGIN', '10/60'),  # per IP
+        'forgot_password': os.getenv('RATELIMIT_FORGOT_PASSWORD', '5/3600'),  # per IP
+        'send_message_user': os.getenv('RATELIMIT_SEND_MESSAGE_USER', '20/10'),  # per Socket.IO connection
+        # per workspace; connections that did not authenticate share a separate bucket
+        'send_message_workspace': os.getenv('RATELIMIT_SEND_MESSAGE_WORKSPACE', '200/10'),
+        'profile': os.getenv('RATELIMIT_PROFILE', '6/60'),  # on-demand profiles, all operators together
+    }
+    # Password hashing: Werkzeug method string with explicit cost parameters
+    # (e.g. pbkdf2:sha256:600000 or scrypt:32768:8:1); changing it rehashes on next login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))  # 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '8'))
+    PASSWORD_HASH_QUEUE_TIMEOUT = 5  # seconds to wait for a free slot before answering 503
+    # Seconds an authenticated user's id/role snapshot is reused across requests (0 disables)
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '30'))
+    # Max seconds a cached student directory snapshot is served without a rebuild
+    STUDENT_DIRECTORY_TTL = int(os.getenv('STUDENT_DIRECTORY_TTL', '60'))
+    
+    # Outbound email queue; leave MAIL_SERVER empty to print emails to the console.
+    # For local testing point it at an SMTP sink, e.g. `python -m aiosmtpd -n -l localhost:8025`
+    MAIL_SERVER = os.getenv('MAIL_SERVER', '')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', '587'))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', '1') == '1'
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@collaborationhub.com')
+    MAIL_WORKER_ENABLED = os.getenv('MAIL_WORKER_ENABLED', '1') == '1'
+    MAIL_SEND_INVITATIONS = os.getenv('MAIL_SEND_INVITATIONS', '1') == '1'
+    MAIL_BATCH_SIZE = 50
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BACKOFF = 30  # seconds, doubled after each failed attempt
+    MAIL_POLL_INTERVAL = 5
+    # Sent and failed emails are deleted after this many days (their bodies are cleared on completion)
+    MAIL_RETENTION_DAYS = int(os.getenv('MAIL_RETENTION_DAYS', '7'))
+    MAINTENANCE_ENABLED = os.getenv('MAINTENANCE_ENABLED', '1') == '1'
+    FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
     
     # File upload settings
     UPLOAD_FOLDER = 'uploads'
@@ -1,7 +1,36 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
+from replicas import RoutingSession
+from sharding import assign_id
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every new DBAPI connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def stream_rows(statement, batch_size=1000):
+    """Yield the rows of a SELECT without loading the whole result.
+
+    Runs on its own connection with stream_results, which is a server-side
+    cursor (SSCursor) on MySQL; SQLite cursors already stream. The session's
+    connection stays free, so the caller may write while iterating. Reads
+    from a replica when the session would route the statement there.
+    """
+    engine = db.session.get_bind(clause=statement)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(statement)
+        for rows in result.partitions(batch_size):
+            yield from rows
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -25,6 +54,12 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    # email and username are already indexed by their unique constraints
+    __table_args__ = (
+        db.Index('idx_users_active', 'is_active'),
+        db.Index('idx_users_role', 'role'),
+    )
+    
     # Relationships
     created_workspaces = db.relationship('Workspace', backref='creator', lazy='dynamic')
     memberships = db.relationship('Membership', foreign_keys='Membership.user_id', backref='user', lazy='dynamic')
@@ -47,6 +82,11 @@ class Workspace(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    __table_args__ = (
+        db.Index('idx_workspaces_created_by', 'created_by'),
+        db.Index('idx_workspaces_active', 'is_active'),
+    )
+    
     # Relationships
     memberships = db.relationship('Membership', backref='workspace', lazy='dynamic')
     messages = db.relationship('Message', backref='workspace', lazy='dynamic')
@@ -65,7 +105,14 @@ class Membership(db.Model):
     invited_at = db.Column(db.DateTime, default=datetime.utcnow)
     joined_at = db.Column(db.DateTime)
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'workspace_id', name='unique_membership'),)
+    # unique_membership leads with user_id, so it also serves user-only lookups
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'workspace_id', name='unique_membership'),
+        db.Index('idx_memberships_user_status', 'user_id', 'status'),
+        db.Index('idx_memberships_workspace_status', 'workspace_id', 'status'),
+        db.Index('idx_memberships_role', 'role'),
+        db.Index('idx_memberships_invited_by', 'invited_by'),
+    )
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -78,6 +125,12 @@ class Message(db.Model):
     file_path = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_messages_workspace_created', 'workspace_id', 'created_at'),
+        db.Index('idx_messages_user', 'user_id'),
+        db.Index('idx_messages_created_at', 'created_at'),
+    )
 
 class File(db.Model):
     __tablename__ = 'files'
@@ -93,6 +146,12 @@ class File(db.Model):
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_files_workspace_created', 'workspace_id', 'created_at'),
+        db.Index('idx_files_uploaded_by', 'uploaded_by'),
+        db.Index('idx_files_created_at', 'created_at'),
+    )
 
 class Task(db.Model):
     __tablename__ = 'tasks'
@@ -108,6 +167,15 @@ class Task(db.Model):
     due_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_tasks_workspace_created', 'workspace_id', 'created_at'),
+        db.Index('idx_tasks_assigned_to', 'assigned_to'),
+        db.Index('idx_tasks_created_by', 'created_by'),
+        db.Index('idx_tasks_status', 'status'),
+        db.Index('idx_tasks_priority', 'priority'),
+        db.Index('idx_tasks_due_date', 'due_date'),
+    )
 
 class Project(db.Model):
     __tablename__ = 'projects'
@@ -121,6 +189,13 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_projects_workspace_created', 'workspace_id', 'created_at'),
+        db.Index('idx_projects_status_created', 'status', 'created_at'),
+        db.Index('idx_projects_created_at', 'created_at'),
+        db.Index('idx_projects_created_by', 'created_by'),
+    )
+
 class JoinRequest(db.Model):
     __tablename__ = 'join_requests'
 
@@ -132,6 +207,25 @@ class JoinRequest(db.Model):
     message = db.Column(db.Text)
     status = db.Column(db.Enum('pending', 'accepted', 'rejected'), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set while pending and cleared once answered; its unique index allows one pending
+    # request per agency, student and project/workspace (see pending_request_key)
+    pending_key = db.Column(db.String(64))
+
+    __table_args__ = (
+        db.Index('idx_join_requests_agency_created', 'from_agency_id', 'created_at'),
+        db.Index('idx_join_requests_student_status', 'to_student_id', 'status'),
+        db.Index('uq_join_requests_pending_key', 'pending_key', unique=True),
+    )
+
+def pending_request_key(agency_id, student_id, project_id, workspace_id):
+    return f"{agency_id}:{student_id}:{project_id or ''}:{workspace_id or ''}"
+
+@event.listens_for(JoinRequest, 'before_insert')
+@event.listens_for(JoinRequest, 'before_update')
+def _set_pending_key(mapper, connection, target):
+    pending = target.status in (None, 'pending')
+    target.pending_key = pending_request_key(target.from_agency_id, target.to_student_id, target.project_id,
+                                             target.workspace_id) if pending else None
 
 class ProjectSubmission(db.Model):
     __tablename__ = 'project_submissions'
@@ -143,6 +237,8 @@ class ProjectSubmission(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('idx_project_submissions_project_created', 'project_id', 'created_at'),)
+
 class ProjectReview(db.Model):
     __tablename__ = 'project_reviews'
 
@@ -153,12 +249,81 @@ class ProjectReview(db.Model):
     feedback = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('idx_project_reviews_submission', 'submission_id'),)
+
+class UserTrigram(db.Model):
+    __tablename__ = 'user_trigrams'
+
+    # (trigram, user_id) primary key doubles as the lookup index for fuzzy search.
+    # Binary collation on MySQL: the default utf8mb4 collations treat 'e' and 'é' as equal
+    trigram = db.Column(db.String(3).with_variant(db.String(3, collation='utf8mb4_bin'), 'mysql'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
+    __table_args__ = (db.Index('idx_user_trigrams_user', 'user_id'),)
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_revoked_tokens_revoked_at', 'revoked_at'),
+        db.Index('idx_revoked_tokens_expires_at', 'expires_at'),
+    )
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_emails'
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_address = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum('pending', 'sending', 'sent', 'failed'), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(36))
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('idx_outbound_emails_status_next', 'status', 'next_attempt_at'),)
+
 class PasswordReset(db.Model):
     __tablename__ = 'password_resets'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    token = db.Column(db.String(255), unique=True, nullable=False)
+    # SHA-256 of the emailed token; the plaintext token is never stored
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
     used = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_password_resets_user', 'user_id'),
+        db.Index('idx_password_resets_expires', 'expires_at'),
+    )
+
+class WorkspaceShard(db.Model):
+    __tablename__ = 'workspace_shards'
+
+    # Where a workspace's messages, files and tasks live when sharding is enabled
+    workspace_id = db.Column(db.Integer, db.ForeignKey('workspaces.id'), primary_key=True)
+    shard = db.Column(db.String(50), nullable=False)
+    state = db.Column(db.Enum('active', 'moving'), nullable=False, default='active')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdAllocation(db.Model):
+    __tablename__ = 'id_allocations'
+
+    # Next unreserved id per sharded table (see sharding.IdAllocator)
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.BigInteger, nullable=False)
+
+for _model in (Message, File, Task):
+    event.listen(_model, 'before_insert', assign_id)
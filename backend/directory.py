@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from flask import Response, current_app, request
+from werkzeug.local import LocalProxy
+from database import User
+from replicas import primary
+
+# Payloads smaller than this are not worth gzipping
+_GZIP_MIN_SIZE = 1024
+
+class Snapshot:
+    """Precomputed response body for one directory resource"""
+
+    def __init__(self, data):
+        self.payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha1(self.payload).hexdigest()[:20]
+        self.gzip_payload = gzip.compress(self.payload, 6) if len(self.payload) >= _GZIP_MIN_SIZE else None
+
+    def response(self):
+        """Serve the snapshot, answering 304 when the client already has it"""
+        gzipped = self.gzip_payload is not None and 'gzip' in request.accept_encodings
+        etag = f"{self.etag}-gz" if gzipped else self.etag
+        if request.if_none_match.contains(self.etag) or request.if_none_match.contains(f"{self.etag}-gz"):
+            resp = Response(status=304)
+        else:
+            resp = Response(self.gzip_payload if gzipped else self.payload, mimetype='application/json')
+            if gzipped:
+                resp.headers['Content-Encoding'] = 'gzip'
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        resp.headers['Vary'] = 'Accept-Encoding, Authorization'
+        return resp
+
+def _summary(u):
+    return {
+        'id': u.id,
+        'first_name': u.first_name,
+        'last_name': u.last_name,
+        'email': u.email,
+        'domain': u.domain,
+        'skills': u.skills,
+        'experience_years': u.experience_years,
+        'portfolio_link': u.portfolio_link
+    }
+
+def _detail(u):
+    data = _summary(u)
+    data['resume_link'] = u.resume_link
+    data['bio'] = u.bio
+    return data
+
+class StudentDirectory:
+    """Versioned, in-process snapshot of the student directory.
+
+    Profile writes call invalidate(student_id); the next read re-queries
+    only those students and rebuilds their snapshots and the listing.
+    invalidate() with no id, or the TTL running out, rebuilds everything
+    from a single query; the TTL bounds staleness when other worker
+    processes handled the write.
+
+    Snapshots are built outside the state lock, so invalidate() and reads
+    of a fresh directory never wait for the database; one builder runs at
+    a time and swaps its result in under the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._version = 0
+        self._built_version = -1
+        self._built_at = 0.0
+        self._stale = True
+        self._dirty = set()
+        self._listing = None
+        self._summaries = {}
+        self._students = {}
+
+    def invalidate(self, student_id=None):
+        with self._lock:
+            if student_id is None:
+                self._stale = True
+            else:
+                self._dirty.add(student_id)
+            self._version += 1
+
+    def _is_fresh(self, ttl):
+        return self._built_version == self._version and time.monotonic() - self._built_at < ttl
+
+    def _ensure_fresh(self):
+        ttl = current_app.config.get('STUDENT_DIRECTORY_TTL', 60)
+        if self._is_fresh(ttl):
+            return
+        with self._build_lock:
+            with self._lock:
+                # Another builder may have caught up while this thread waited
+                if self._is_fresh(ttl):
+                    return
+                version = self._version
+                full = self._stale or time.monotonic() - self._built_at >= ttl
+                dirty, self._dirty = self._dirty, set()
+                self._stale = False
+                summaries, students = dict(self._summaries), dict(self._students)
+            try:
+                # Rebuilt right after an invalidating write, so a lagging replica would cache stale data
+                with primary():
+                    if full:
+                        rows = User.query.filter_by(role='student').all()
+                        summaries, students = {}, {}
+                    else:
+                        rows = User.query.filter(User.id.in_(dirty)).all() if dirty else []
+                        for student_id in dirty:
+                            summaries.pop(student_id, None)
+                            students.pop(student_id, None)
+                for u in rows:
+                    if u.role == 'student':
+                        summaries[u.id] = _summary(u)
+                        students[u.id] = Snapshot(_detail(u))
+                listing = Snapshot([summaries[i] for i in sorted(summaries)])
+            except Exception:
+                with self._lock:
+                    self._dirty |= dirty
+                    self._stale = self._stale or full
+                raise
+            with self._lock:
+                self._listing, self._summaries, self._students = listing, summaries, students
+                self._built_version = version
+                if full:
+                    self._built_at = time.monotonic()
+
+    def listing(self):
+        self._ensure_fresh()
+        return self._listing
+
+    def student(self, student_id):
+        self._ensure_fresh()
+        return self._students.get(student_id)
+
+# One directory per app instance; see create_app()
+student_directory = LocalProxy(lambda: current_app.extensions['student_directory'])
@@ -0,0 +1,219 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from database import db, OutboundEmail
+
+def _notify_after_commit():
+    # Waking the worker before the row is committed lets it poll, miss the row and sleep
+    db.session.info['notify_mail_worker'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('notify_mail_worker', False) and has_app_context():
+        worker = current_app.extensions.get('mail_worker')
+        if worker is not None:
+            worker.notify()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_notify(session):
+    session.info.pop('notify_mail_worker', None)
+
+def enqueue_email(to_address, subject, body):
+    """Queue an email; it is sent once the caller's transaction commits"""
+    db.session.add(OutboundEmail(to_address=to_address, subject=subject, body=body))
+    _notify_after_commit()
+
+def enqueue_emails(messages):
+    """Queue many (to_address, subject, body) tuples with one batched INSERT"""
+    if not messages:
+        return
+    now = datetime.utcnow()
+    db.session.execute(OutboundEmail.__table__.insert(), [{
+        'to_address': to_address,
+        'subject': subject,
+        'body': body,
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for to_address, subject, body in messages])
+    _notify_after_commit()
+
+class SMTPTransport:
+    """One SMTP connection reused across a batch of messages"""
+
+    def __init__(self, config):
+        self.config = config
+        self.conn = None
+
+    def send(self, msg):
+        # smtplib is only needed by the process that actually delivers mail
+        import smtplib
+        if self.conn is None:
+            self.conn = self._connect(smtplib)
+        try:
+            self.conn.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.conn = None
+            raise
+
+    def _connect(self, smtplib):
+        # Only cache the connection once TLS and login are done, so a failed setup
+        # can never leave a plaintext or unauthenticated connection for the next message
+        conn = smtplib.SMTP(self.config['MAIL_SERVER'], self.config['MAIL_PORT'], timeout=30)
+        try:
+            if self.config.get('MAIL_USE_TLS'):
+                conn.starttls()
+            if self.config.get('MAIL_USERNAME'):
+                conn.login(self.config['MAIL_USERNAME'], self.config['MAIL_PASSWORD'])
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def close(self):
+        if self.conn is not None:
+            import smtplib
+            try:
+                self.conn.quit()
+            except smtplib.SMTPException:
+                pass
+            self.conn = None
+
+class ConsoleTransport:
+    """Development transport used when MAIL_SERVER is not configured"""
+
+    def send(self, msg):
+        print(f"--- Email to {msg['To']}: {msg['Subject']}\n{msg.get_content()}")
+
+    def close(self):
+        pass
+
+def _claim_batch(config):
+    """Mark a batch of due emails as ours; rows stuck in 'sending' past the lease are reclaimed"""
+    now = datetime.utcnow()
+    token = str(uuid.uuid4())
+    lease_expired = now - timedelta(seconds=config.get('MAIL_CLAIM_LEASE', 600))
+    claimable = or_(
+        (OutboundEmail.status == 'pending') & (OutboundEmail.next_attempt_at <= now),
+        (OutboundEmail.status == 'sending') & (OutboundEmail.claimed_at < lease_expired))
+    ids = [row.id for row in db.session.query(OutboundEmail.id).filter(claimable)
+           .order_by(OutboundEmail.id).limit(config.get('MAIL_BATCH_SIZE', 50))]
+    if not ids:
+        return []
+    # Re-check the predicate so a row claimed by another worker in between is skipped
+    OutboundEmail.query.filter(OutboundEmail.id.in_(ids), claimable).update(
+        {'status': 'sending', 'claim_token': token, 'claimed_at': now}, synchronize_session=False)
+    db.session.commit()
+    return OutboundEmail.query.filter_by(claim_token=token, status='sending').order_by(OutboundEmail.id).all()
+
+def process_batch(transport):
+    """Send one batch of due emails; returns the number of emails attempted"""
+    from email.message import EmailMessage
+    config = current_app.config
+    batch = _claim_batch(config)
+    for email in batch:
+        msg = EmailMessage()
+        msg['From'] = config.get('MAIL_DEFAULT_SENDER')
+        msg['To'] = email.to_address
+        msg['Subject'] = email.subject
+        msg.set_content(email.body)
+        try:
+            transport.send(msg)
+            email.status = 'sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+            # Bodies can carry live links (password reset tokens); keep only the envelope
+            email.body = ''
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = str(e)
+            if email.attempts >= config.get('MAIL_MAX_ATTEMPTS', 5):
+                email.status = 'failed'
+                email.body = ''
+            else:
+                backoff = config.get('MAIL_RETRY_BACKOFF', 30) * 2 ** (email.attempts - 1)
+                email.status = 'pending'
+                email.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+        email.claim_token = None
+        db.session.commit()
+    return len(batch)
+
+def purge_outbound_emails(batch_size=500):
+    """Maintenance job: delete sent and failed emails older than MAIL_RETENTION_DAYS in small batches.
+
+    Finished rows still holding a body (queued before bodies were cleared on
+    delivery) are blanked straight away.
+    """
+    finished = OutboundEmail.status.in_(('sent', 'failed'))
+    OutboundEmail.query.filter(finished, OutboundEmail.body != '').update({'body': ''}, synchronize_session=False)
+    db.session.commit()
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config.get('MAIL_RETENTION_DAYS', 7))
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.query(OutboundEmail.id)
+               .filter(finished, OutboundEmail.created_at < cutoff).limit(batch_size)]
+        if not ids:
+            return deleted
+        OutboundEmail.query.filter(OutboundEmail.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+def make_transport(config):
+    return SMTPTransport(config) if config.get('MAIL_SERVER') else ConsoleTransport()
+
+def drain(app):
+    """Send everything currently due, synchronously (CLI and tests)"""
+    with app.app_context():
+        transport = make_transport(app.config)
+        try:
+            while process_batch(transport):
+                pass
+        finally:
+            transport.close()
+
+class EmailWorker:
+    """Background thread draining one app's outbound_emails table"""
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='email-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self, app):
+        transport = make_transport(app.config)
+        while not self._stop.is_set():
+            sent = 0
+            try:
+                with app.app_context():
+                    sent = process_batch(transport)
+            except Exception as e:
+                app.logger.warning('Email worker error: %s', e)
+                transport.close()
+            if not sent:
+                # Idle: let the SMTP connection go and sleep until notified or polled
+                transport.close()
+                self._wakeup.wait(app.config.get('MAIL_POLL_INTERVAL', 5))
+                self._wakeup.clear()
+
+def init_mail_worker(app):
+    """Start a worker for app; commits that queue email in that app wake it"""
+    worker = app.extensions['mail_worker'] = EmailWorker()
+    worker.start(app)
+    return worker
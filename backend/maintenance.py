@@ -0,0 +1,71 @@
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import or_
+from database import db, PasswordReset
+from mailer import purge_outbound_emails
+from revocation import purge_expired_revocations
+from slowlog import flush_slow_queries
+
+def purge_password_resets(batch_size=500):
+    """Delete used or expired reset tokens in small batches so each write lock is short"""
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.query(PasswordReset.id)
+               .filter(or_(PasswordReset.used.is_(True), PasswordReset.expires_at < datetime.utcnow()))
+               .limit(batch_size)]
+        if not ids:
+            return deleted
+        PasswordReset.query.filter(PasswordReset.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+class MaintenanceWorker:
+    """Daemon thread running periodic housekeeping jobs inside an app context"""
+
+    def __init__(self):
+        self._jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, fn, interval):
+        self._jobs.append({'fn': fn, 'interval': interval, 'next_run': 0.0})
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, app):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self._jobs:
+                if now < job['next_run']:
+                    continue
+                job['next_run'] = now + job['interval']
+                try:
+                    with app.app_context():
+                        job['fn']()
+                except Exception as e:
+                    app.logger.warning('Maintenance job %s failed: %s', job['fn'].__name__, e)
+            self._stop.wait(1)
+
+# Housekeeping jobs and their intervals in seconds
+JOBS = [
+    (purge_password_resets, 600),
+    (purge_outbound_emails, 600),
+    (purge_expired_revocations, 3600),
+    (flush_slow_queries, 10),
+]
+
+def init_maintenance(app):
+    """Start a worker running JOBS against app's database"""
+    worker = app.extensions['maintenance_worker'] = MaintenanceWorker()
+    for fn, interval in JOBS:
+        worker.add_job(fn, interval)
+    worker.start(app)
+    return worker
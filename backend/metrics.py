@@ -0,0 +1,292 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import Response, current_app, g, request
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+
+# Seconds; Prometheus' default buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _Shards:
+    """Per-thread value tables, summed when metrics are scraped.
+
+    A thread only ever writes its own table, so recording a value takes no
+    lock once the thread has a table. The lock is held when a thread
+    registers its table and during a scrape. Werkzeug's threaded server
+    starts a thread per request, so there every request registers a table
+    and takes the lock once (a short append); long-lived worker threads
+    register only once. Tables of finished threads are folded into a
+    retired total so the list stays short.
+    """
+
+    max_live = 64
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self._retired = {}
+
+    def table(self):
+        try:
+            return self._local.table
+        except AttributeError:
+            return self._register()
+
+    def _register(self):
+        table = {}
+        with self._lock:
+            if len(self._live) >= self.max_live:
+                self._fold()
+            self._live.append((threading.current_thread(), table))
+        self._local.table = table
+        return table
+
+    def _fold(self):
+        alive = []
+        for thread, table in self._live:
+            if thread.is_alive():
+                alive.append((thread, table))
+            else:
+                _merge(self._retired, table)
+        self._live = alive
+
+    def merged(self):
+        with self._lock:
+            self._fold()
+            total = {}
+            for table in [self._retired] + [table for _, table in self._live]:
+                _merge(total, dict(table))
+        return total
+
+def _merge(into, table):
+    for key, value in table.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._shards = registry._shards
+        registry._metrics.append(self)
+
+    def _series(self, merged):
+        return sorted((key[1], value) for key, value in merged.items() if key[0] is self)
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        table = self._shards.table()
+        slot = table.get((self, labels))
+        if slot is None:
+            table[(self, labels)] = [amount]
+        else:
+            slot[0] += amount
+
+    def render(self, merged):
+        for labels, value in self._series(merged):
+            yield _sample(self.name, self.labels, labels, value[0])
+
+class Gauge(Counter):
+    """Up/down gauge; inc and dec may happen on different threads"""
+
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        table = self._shards.table()
+        slot = table.get((self, labels))
+        if slot is None:
+            # One count per bucket (non-cumulative), then +Inf, sum and count
+            slot = table[(self, labels)] = [0] * (len(self.buckets) + 3)
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-2] += value
+        slot[-1] += 1
+
+    def render(self, merged):
+        names = self.labels + ('le',)
+        for labels, value in self._series(merged):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), value):
+                cumulative += count
+                yield _sample(f'{self.name}_bucket', names, labels + (_le(bound),), cumulative)
+            yield _sample(f'{self.name}_sum', self.labels, labels, value[-2])
+            yield _sample(f'{self.name}_count', self.labels, labels, value[-1])
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time; fn returns (labels, value) pairs"""
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help, labels, fn):
+        super().__init__(registry, name, help, labels)
+        self.fn = fn
+
+    def render(self, merged):
+        for labels, value in sorted(self.fn()):
+            yield _sample(self.name, self.labels, labels, value)
+
+class CallbackHistogram(_Metric):
+    """Histogram computed at scrape time; fn returns the observed values"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, fn, buckets):
+        super().__init__(registry, name, help)
+        self.fn = fn
+        self.buckets = tuple(buckets)
+
+    def render(self, merged):
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0
+        for value in self.fn():
+            counts[bisect_left(self.buckets, value)] += 1
+            total += value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield _sample(f'{self.name}_bucket', ('le',), (_le(bound),), cumulative)
+        yield _sample(f'{self.name}_sum', (), (), total)
+        yield _sample(f'{self.name}_count', (), (), cumulative)
+
+def _le(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _sample(name, names, values, value):
+    if names:
+        pairs = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+        name = f'{name}{{{pairs}}}'
+    return f'{name} {float(value)!r}' if isinstance(value, float) else f'{name} {value}'
+
+class Registry:
+    """The metrics of one app instance, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._shards = _Shards()
+        self._metrics = []
+        self.http_duration = Histogram(self, 'http_request_duration_seconds', 'HTTP request latency',
+                                       ('method', 'route'))
+        self.http_requests = Counter(self, 'http_requests_total', 'HTTP requests', ('method', 'route', 'status'))
+        self.http_errors = Counter(self, 'http_request_errors_total', 'HTTP requests answered with a 5xx',
+                                   ('method', 'route'))
+        self.event_duration = Histogram(self, 'socketio_event_duration_seconds', 'Socket.IO event handler latency',
+                                        ('event',))
+        self.events = Counter(self, 'socketio_events_total', 'Socket.IO events handled', ('event',))
+        self.event_errors = Counter(self, 'socketio_event_errors_total', 'Socket.IO events that raised', ('event',))
+        self.connections = Gauge(self, 'socketio_connections', 'Connected Socket.IO clients')
+        self.pool_checkouts = Counter(self, 'db_pool_checkouts_total', 'Connections checked out of the pool',
+                                      ('bind',))
+        self.upload_bytes = Counter(self, 'upload_bytes_total', 'Bytes of uploaded files stored')
+        self.uploads = Counter(self, 'uploads_total', 'Files uploaded')
+
+    def render(self):
+        merged = self._shards.merged()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(merged))
+        return '\n'.join(lines) + '\n'
+
+# One registry per app instance; see create_app()
+metrics = LocalProxy(lambda: current_app.extensions['metrics'])
+
+def _registry():
+    return current_app.extensions.get('metrics')
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+
+def _finish_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return response
+    registry = current_app.extensions['metrics']
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method = request.method
+    registry.http_duration.observe(time.perf_counter() - started, (method, route))
+    registry.http_requests.inc((method, route, response.status_code))
+    if response.status_code >= 500:
+        registry.http_errors.inc((method, route))
+    return response
+
+def observe_event(name):
+    """Decorator for Socket.IO handlers: count and time the event"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            registry = _registry()
+            if registry is None:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                registry.event_errors.inc((name,))
+                raise
+            finally:
+                registry.event_duration.observe(time.perf_counter() - started, (name,))
+                registry.events.inc((name,))
+        return wrapper
+    return decorator
+
+def record_upload(size):
+    registry = _registry()
+    if registry is not None:
+        registry.uploads.inc()
+        registry.upload_bytes.inc(amount=size)
+
+def instrument_pool(registry, key, engine):
+    labels = (key or 'default',)
+    event.listen(engine, 'checkout', lambda *args: registry.pool_checkouts.inc(labels))
+
+def metrics_endpoint():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif not current_app.config.get('METRICS_PUBLIC'):
+        # No token configured: closed unless the operator opted in to a public endpoint
+        return Response('Set METRICS_TOKEN (or METRICS_PUBLIC=1) to enable /metrics\n', status=403,
+                        mimetype='text/plain')
+    return Response(current_app.extensions['metrics'].render(), content_type=CONTENT_TYPE)
+
+def init_metrics(app, engines):
+    """Attach a registry to app and expose it at /metrics"""
+    registry = Registry()
+    app.extensions['metrics'] = registry
+    for key, engine in engines.items():
+        instrument_pool(registry, key, engine)
+    CallbackGauge(registry, 'db_pool_checked_out', 'Connections currently checked out', ('bind',),
+                  lambda: [((key or 'default',), engine.pool.checkedout()) for key, engine in engines.items()
+                           if hasattr(engine.pool, 'checkedout')])
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+    return registry
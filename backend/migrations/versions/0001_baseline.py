@@ -0,0 +1,411 @@
+"""baseline
+
+Creates the full schema on an empty database. Databases created before
+migrations existed (db.create_all at import time, or database/schema.sql)
+are adopted instead: missing tables, columns and indexes are added, the
+plaintext-token password_resets table is recreated and the user search
+index is backfilled, which is what app startup used to do on every boot.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 02:35:08.707329
+
+"""
+from alembic import op
+import re
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+LEGACY_USER_COLUMNS = [
+    ('role', lambda: sa.Column('role', sa.String(length=20), nullable=False, server_default='student')),
+    ('domain', lambda: sa.Column('domain', sa.String(length=120), nullable=True)),
+    ('skills', lambda: sa.Column('skills', sa.Text(), nullable=True)),
+    ('experience_years', lambda: sa.Column('experience_years', sa.Integer(), nullable=True)),
+    ('portfolio_link', lambda: sa.Column('portfolio_link', sa.String(length=255), nullable=True)),
+    ('resume_link', lambda: sa.Column('resume_link', sa.String(length=255), nullable=True)),
+]
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+def _create_table(name, *columns):
+    if not _inspector().has_table(name):
+        op.create_table(name, *columns)
+
+def _create_index(name, table, columns):
+    if name not in {index['name'] for index in _inspector().get_indexes(table)}:
+        op.create_index(name, table, columns, unique=False)
+
+def _upgrade_legacy_tables():
+    inspector = _inspector()
+    if inspector.has_table('users'):
+        existing = {column['name'] for column in inspector.get_columns('users')}
+        for name, column in LEGACY_USER_COLUMNS:
+            if name not in existing:
+                op.add_column('users', column())
+    # password_resets used to store plaintext tokens; those expire within an hour, so drop the table
+    if inspector.has_table('password_resets'):
+        if 'token_hash' not in {column['name'] for column in inspector.get_columns('password_resets')}:
+            op.drop_table('password_resets')
+
+# The search tokenizer as it was at this revision; search.py may change, this must not
+_SEARCH_FIELDS = ('first_name', 'last_name', 'username', 'email')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+def _user_trigrams(user):
+    grams = set()
+    for field in _SEARCH_FIELDS:
+        for word in _WORD_RE.findall((getattr(user, field) or '').lower()):
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _users(bind, batch_size=1000):
+    """Yield users one page (keyset on id) at a time, so the table is never loaded whole"""
+    page_sql = sa.text('SELECT id, %s FROM users WHERE id > :after ORDER BY id LIMIT :limit'
+                       % ', '.join(_SEARCH_FIELDS))
+    after = 0
+    while True:
+        page = bind.execute(page_sql, {'after': after, 'limit': batch_size}).fetchall()
+        if not page:
+            return
+        yield from page
+        after = page[-1].id
+
+def _backfill_user_trigrams():
+    bind = op.get_bind()
+    if bind.execute(sa.text('SELECT 1 FROM user_trigrams LIMIT 1')).first():
+        return
+    trigram_table = sa.table('user_trigrams', sa.column('trigram'), sa.column('user_id'))
+    rows = []
+    for user in _users(bind):
+        rows.extend({'trigram': g, 'user_id': user.id} for g in _user_trigrams(user))
+        if len(rows) >= 5000:
+            op.bulk_insert(trigram_table, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(trigram_table, rows)
+
+
+def upgrade():
+    _upgrade_legacy_tables()
+    _create_table('outbound_emails',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('to_address', sa.String(length=100), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'sending', 'sent', 'failed'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claim_token', sa.String(length=36), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_outbound_emails_status_next', 'outbound_emails', ['status', 'next_attempt_at'])
+
+    _create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('email', sa.String(length=100), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('first_name', sa.String(length=50), nullable=False),
+    sa.Column('last_name', sa.String(length=50), nullable=False),
+    sa.Column('role', sa.Enum('student', 'admin', 'external'), nullable=False),
+    sa.Column('profile_picture', sa.String(length=255), nullable=True),
+    sa.Column('bio', sa.Text(), nullable=True),
+    sa.Column('domain', sa.String(length=120), nullable=True),
+    sa.Column('skills', sa.Text(), nullable=True),
+    sa.Column('experience_years', sa.Integer(), nullable=True),
+    sa.Column('portfolio_link', sa.String(length=255), nullable=True),
+    sa.Column('resume_link', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    _create_index('idx_users_active', 'users', ['is_active'])
+    _create_index('idx_users_role', 'users', ['role'])
+
+    _create_table('password_resets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('used', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    _create_index('idx_password_resets_expires', 'password_resets', ['expires_at'])
+    _create_index('idx_password_resets_user', 'password_resets', ['user_id'])
+
+    _create_table('revoked_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti')
+    )
+    _create_index('idx_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+    _create_index('idx_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+
+    _create_table('user_trigrams',
+    sa.Column('trigram', sa.String(length=3), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('trigram', 'user_id')
+    )
+    _create_index('idx_user_trigrams_user', 'user_trigrams', ['user_id'])
+
+    _create_table('workspaces',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_workspaces_active', 'workspaces', ['is_active'])
+    _create_index('idx_workspaces_created_by', 'workspaces', ['created_by'])
+
+    _create_table('files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('uploaded_by', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('file_type', sa.String(length=100), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_files_created_at', 'files', ['created_at'])
+    _create_index('idx_files_uploaded_by', 'files', ['uploaded_by'])
+    _create_index('idx_files_workspace_created', 'files', ['workspace_id', 'created_at'])
+
+    _create_table('memberships',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.Enum('owner', 'admin', 'member'), nullable=True),
+    sa.Column('status', sa.Enum('invited', 'accepted', 'declined'), nullable=True),
+    sa.Column('invited_by', sa.Integer(), nullable=True),
+    sa.Column('invited_at', sa.DateTime(), nullable=True),
+    sa.Column('joined_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['invited_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'workspace_id', name='unique_membership')
+    )
+    _create_index('idx_memberships_invited_by', 'memberships', ['invited_by'])
+    _create_index('idx_memberships_role', 'memberships', ['role'])
+    _create_index('idx_memberships_user_status', 'memberships', ['user_id', 'status'])
+    _create_index('idx_memberships_workspace_status', 'memberships', ['workspace_id', 'status'])
+
+    _create_table('messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('message_type', sa.Enum('text', 'file', 'system'), nullable=True),
+    sa.Column('file_path', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_messages_created_at', 'messages', ['created_at'])
+    _create_index('idx_messages_user', 'messages', ['user_id'])
+    _create_index('idx_messages_workspace_created', 'messages', ['workspace_id', 'created_at'])
+
+    _create_table('projects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Enum('open', 'in_progress', 'submitted', 'reviewed', 'rework', 'rejected', 'completed'), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_projects_created_at', 'projects', ['created_at'])
+    _create_index('idx_projects_created_by', 'projects', ['created_by'])
+    _create_index('idx_projects_status_created', 'projects', ['status', 'created_at'])
+    _create_index('idx_projects_workspace_created', 'projects', ['workspace_id', 'created_at'])
+
+    _create_table('tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('assigned_to', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'in_progress', 'completed', 'cancelled'), nullable=True),
+    sa.Column('priority', sa.Enum('low', 'medium', 'high', 'urgent'), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['assigned_to'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_tasks_assigned_to', 'tasks', ['assigned_to'])
+    _create_index('idx_tasks_created_by', 'tasks', ['created_by'])
+    _create_index('idx_tasks_due_date', 'tasks', ['due_date'])
+    _create_index('idx_tasks_priority', 'tasks', ['priority'])
+    _create_index('idx_tasks_status', 'tasks', ['status'])
+    _create_index('idx_tasks_workspace_created', 'tasks', ['workspace_id', 'created_at'])
+
+    _create_table('join_requests',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('from_agency_id', sa.Integer(), nullable=False),
+    sa.Column('to_student_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('workspace_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'accepted', 'rejected'), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['from_agency_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['to_student_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_join_requests_agency_created', 'join_requests', ['from_agency_id', 'created_at'])
+    _create_index('idx_join_requests_student_status', 'join_requests', ['to_student_id', 'status'])
+
+    _create_table('project_submissions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('content_url', sa.String(length=500), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_project_submissions_project_created', 'project_submissions', ['project_id', 'created_at'])
+
+    _create_table('project_reviews',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('submission_id', sa.Integer(), nullable=False),
+    sa.Column('reviewer_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('approved', 'rework', 'rejected'), nullable=True),
+    sa.Column('feedback', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['reviewer_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['submission_id'], ['project_submissions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_index('idx_project_reviews_submission', 'project_reviews', ['submission_id'])
+
+    _backfill_user_trigrams()
+
+
+def downgrade():
+    with op.batch_alter_table('project_reviews', schema=None) as batch_op:
+        batch_op.drop_index('idx_project_reviews_submission')
+
+    op.drop_table('project_reviews')
+    with op.batch_alter_table('project_submissions', schema=None) as batch_op:
+        batch_op.drop_index('idx_project_submissions_project_created')
+
+    op.drop_table('project_submissions')
+    with op.batch_alter_table('join_requests', schema=None) as batch_op:
+        batch_op.drop_index('idx_join_requests_student_status')
+        batch_op.drop_index('idx_join_requests_agency_created')
+
+    op.drop_table('join_requests')
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index('idx_tasks_workspace_created')
+        batch_op.drop_index('idx_tasks_status')
+        batch_op.drop_index('idx_tasks_priority')
+        batch_op.drop_index('idx_tasks_due_date')
+        batch_op.drop_index('idx_tasks_created_by')
+        batch_op.drop_index('idx_tasks_assigned_to')
+
+    op.drop_table('tasks')
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_index('idx_projects_workspace_created')
+        batch_op.drop_index('idx_projects_status_created')
+        batch_op.drop_index('idx_projects_created_by')
+        batch_op.drop_index('idx_projects_created_at')
+
+    op.drop_table('projects')
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('idx_messages_workspace_created')
+        batch_op.drop_index('idx_messages_user')
+        batch_op.drop_index('idx_messages_created_at')
+
+    op.drop_table('messages')
+    with op.batch_alter_table('memberships', schema=None) as batch_op:
+        batch_op.drop_index('idx_memberships_workspace_status')
+        batch_op.drop_index('idx_memberships_user_status')
+        batch_op.drop_index('idx_memberships_role')
+        batch_op.drop_index('idx_memberships_invited_by')
+
+    op.drop_table('memberships')
+    with op.batch_alter_table('files', schema=None) as batch_op:
+        batch_op.drop_index('idx_files_workspace_created')
+        batch_op.drop_index('idx_files_uploaded_by')
+        batch_op.drop_index('idx_files_created_at')
+
+    op.drop_table('files')
+    with op.batch_alter_table('workspaces', schema=None) as batch_op:
+        batch_op.drop_index('idx_workspaces_created_by')
+        batch_op.drop_index('idx_workspaces_active')
+
+    op.drop_table('workspaces')
+    with op.batch_alter_table('user_trigrams', schema=None) as batch_op:
+        batch_op.drop_index('idx_user_trigrams_user')
+
+    op.drop_table('user_trigrams')
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index('idx_revoked_tokens_revoked_at')
+        batch_op.drop_index('idx_revoked_tokens_expires_at')
+
+    op.drop_table('revoked_tokens')
+    with op.batch_alter_table('password_resets', schema=None) as batch_op:
+        batch_op.drop_index('idx_password_resets_user')
+        batch_op.drop_index('idx_password_resets_expires')
+
+    op.drop_table('password_resets')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('idx_users_role')
+        batch_op.drop_index('idx_users_active')
+
+    op.drop_table('users')
+    with op.batch_alter_table('outbound_emails', schema=None) as batch_op:
+        batch_op.drop_index('idx_outbound_emails_status_next')
+
+    op.drop_table('outbound_emails')
@@ -0,0 +1,36 @@
+"""binary collation for user_trigrams.trigram on MySQL
+
+The search tokenizer keeps letters in any script (see 0004_unicode_trigrams),
+so one user can hold trigrams that differ only by an accent: first name
+'Zoë' and username 'zoe' index both 'zoë' and 'zoe'. utf8mb4's default
+collations are accent insensitive, so the second insert would collide with
+the first on the (trigram, user_id) primary key. Trigrams are casefolded, so
+case never differs. SQLite and PostgreSQL compare the column byte-wise by
+default; nothing to change there.
+
+Revision ID: 0002_trigram_collation
+Revises: 0001_baseline
+Create Date: 2026-10-19 04:10:22.519043
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_trigram_collation'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'mysql':
+        op.alter_column('user_trigrams', 'trigram', existing_type=sa.String(length=3), existing_nullable=False,
+                        type_=sa.String(length=3, collation='utf8mb4_bin'))
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'mysql':
+        op.alter_column('user_trigrams', 'trigram', existing_type=sa.String(length=3, collation='utf8mb4_bin'),
+                        existing_nullable=False, type_=sa.String(length=3))
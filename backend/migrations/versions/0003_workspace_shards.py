@@ -0,0 +1,45 @@
+"""workspace shards
+
+workspace_shards maps a workspace to the shard holding its messages, files
+and tasks (no row: the global database). id_allocations hands out ids for
+those tables in blocks so they stay unique across shards; it starts after
+the ids already in use.
+
+Revision ID: 0003_workspace_shards
+Revises: 0002_trigram_collation
+Create Date: 2026-10-19 02:46:32.841541
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_workspace_shards'
+down_revision = '0002_trigram_collation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('id_allocations',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('workspace_shards',
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=50), nullable=False),
+    sa.Column('state', sa.Enum('active', 'moving'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('workspace_id')
+    )
+    for table in ('messages', 'files', 'tasks'):
+        op.execute(f"INSERT INTO id_allocations (name, next_id) "
+                   f"SELECT '{table}', COALESCE(MAX(id), 0) + 1 FROM {table}")
+
+
+def downgrade():
+    op.drop_table('workspace_shards')
+    op.drop_table('id_allocations')
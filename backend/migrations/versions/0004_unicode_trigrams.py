@@ -0,0 +1,71 @@
+"""reindex user_trigrams with the Unicode tokenizer
+
+The search tokenizer used to keep only [a-z0-9], so names such as 'Zoë'
+or 'Łukasz' were split into fragments or dropped from the index, and the
+email domain was indexed although every user on it shares its trigrams.
+Rebuild every user's trigrams with the Unicode tokenizer, which is copied
+here so later changes to search.py cannot change what this revision does.
+
+Revision ID: 0004_unicode_trigrams
+Revises: 0003_workspace_shards
+Create Date: 2026-10-19 09:12:40.318274
+
+"""
+from alembic import op
+import re
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_unicode_trigrams'
+down_revision = '0003_workspace_shards'
+branch_labels = None
+depends_on = None
+
+
+# search.py's tokenizer at this revision
+_SEARCH_FIELDS = ('first_name', 'last_name', 'username', 'email')
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+def _field_text(user, field):
+    value = getattr(user, field) or ''
+    return value.rsplit('@', 1)[0] if field == 'email' else value
+
+def _user_trigrams(user):
+    grams = set()
+    for field in _SEARCH_FIELDS:
+        for word in _WORD_RE.findall(_field_text(user, field).casefold()):
+            padded = f" {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _users(bind, batch_size=1000):
+    """Yield users one page (keyset on id) at a time, so the table is never loaded whole"""
+    page_sql = sa.text('SELECT id, %s FROM users WHERE id > :after ORDER BY id LIMIT :limit'
+                       % ', '.join(_SEARCH_FIELDS))
+    after = 0
+    while True:
+        page = bind.execute(page_sql, {'after': after, 'limit': batch_size}).fetchall()
+        if not page:
+            return
+        yield from page
+        after = page[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    trigram_table = sa.table('user_trigrams', sa.column('trigram'), sa.column('user_id'))
+    op.execute(trigram_table.delete())
+    rows = []
+    for user in _users(bind):
+        rows.extend({'trigram': g, 'user_id': user.id} for g in _user_trigrams(user))
+        if len(rows) >= 5000:
+            op.bulk_insert(trigram_table, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(trigram_table, rows)
+
+
+def downgrade():
+    # The ASCII-only index is a subset of what search can use; nothing to undo
+    pass
@@ -0,0 +1,65 @@
+"""one pending join request per agency, student and project/workspace
+
+The request routes checked for a pending request before inserting one, so
+two concurrent calls could both pass the check. join_requests.pending_key
+holds "agency:student:project:workspace" while a request is pending and
+NULL once it is answered, under a unique index (NULLs never collide), which
+works on MySQL as well as SQLite and PostgreSQL, unlike a partial index.
+Existing duplicates are kept; only the oldest pending request of each group
+gets the key.
+
+Revision ID: 0005_pending_request_key
+Revises: 0004_unicode_trigrams
+Create Date: 2026-10-19 15:02:11.604917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_pending_request_key'
+down_revision = '0004_unicode_trigrams'
+branch_labels = None
+depends_on = None
+
+
+def _pending_requests(bind, batch_size=1000):
+    """Yield pending requests oldest first, one page (keyset on id) at a time"""
+    page_sql = sa.text("SELECT id, from_agency_id, to_student_id, project_id, workspace_id FROM join_requests "
+                       "WHERE status = 'pending' AND id > :after ORDER BY id LIMIT :limit")
+    after = 0
+    while True:
+        page = bind.execute(page_sql, {'after': after, 'limit': batch_size}).fetchall()
+        if not page:
+            return
+        yield from page
+        after = page[-1].id
+
+
+def upgrade():
+    with op.batch_alter_table('join_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pending_key', sa.String(length=64), nullable=True))
+
+    bind = op.get_bind()
+    update = sa.text('UPDATE join_requests SET pending_key = :key WHERE id = :id')
+    seen, rows = set(), []
+    for req in _pending_requests(bind):
+        key = f"{req.from_agency_id}:{req.to_student_id}:{req.project_id or ''}:{req.workspace_id or ''}"
+        if key not in seen:
+            seen.add(key)
+            rows.append({'key': key, 'id': req.id})
+        if len(rows) >= 1000:
+            bind.execute(update, rows)
+            rows = []
+    if rows:
+        bind.execute(update, rows)
+
+    with op.batch_alter_table('join_requests', schema=None) as batch_op:
+        batch_op.create_index('uq_join_requests_pending_key', ['pending_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('join_requests', schema=None) as batch_op:
+        batch_op.drop_index('uq_join_requests_pending_key')
+        batch_op.drop_column('pending_key')
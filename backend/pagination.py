@@ -0,0 +1,60 @@
+import base64
+from datetime import datetime
+from flask import jsonify
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size into [1, MAX_PAGE_SIZE]"""
+    if value is None:
+        return default
+    return min(max(value, 1), MAX_PAGE_SIZE)
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_page(query, created_col, id_col, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                descending=True, row_key=None):
+    """Fetch one page of query ordered by (created_col, id_col).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    row_key extracts (created_at, id) from a row and defaults to the
+    attributes named after the two columns.
+    """
+    if row_key is None:
+        row_key = lambda row: (getattr(row, created_col.key), getattr(row, id_col.key))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(created_col < created_at, and_(created_col == created_at, id_col < row_id)))
+        else:
+            query = query.filter(or_(created_col > created_at, and_(created_col == created_at, id_col > row_id)))
+    if descending:
+        query = query.order_by(created_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(created_col.asc(), id_col.asc())
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*row_key(rows[-1]))
+    return rows, next_cursor
+
+def paginated_response(items, next_cursor):
+    """JSON list response with the next page cursor in the X-Next-Cursor header"""
+    resp = jsonify(items)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
@@ -0,0 +1,59 @@
+import hashlib
+import threading
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Fully spelled out so stored hashes can be compared against it for rehashing
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify operations are already in flight"""
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Return the worker pool and this app's concurrency cap, creating them on first use
+
+    Worker processes are shared by every app in the process that asks for
+    the same number of them; the cap on operations in flight is per app.
+    """
+    app = current_app._get_current_object()
+    with _pool_lock:
+        if 'password_hash_slots' not in app.extensions:
+            workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+            if workers > 0 and workers not in _pools:
+                # multiprocessing is only imported once a password is hashed
+                from concurrent.futures import ProcessPoolExecutor
+                _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+            app.extensions['password_hash_pool'] = _pools.get(workers)
+            app.extensions['password_hash_slots'] = threading.BoundedSemaphore(
+                app.config.get('PASSWORD_HASH_MAX_PENDING', 8))
+    return app.extensions['password_hash_pool'], app.extensions['password_hash_slots']
+
+def _run(fn, *args):
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=current_app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)):
+        raise PasswordHasherBusy('Too many concurrent password operations, try again shortly')
+    try:
+        if pool is None:
+            return fn(*args)
+        return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+def hash_password(password):
+    return _run(generate_password_hash, password,
+                current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                current_app.config.get('PASSWORD_SALT_LENGTH', 16))
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+def needs_rehash(pwhash):
+    """True if pwhash was produced with parameters other than the configured ones"""
+    return pwhash.split('$', 1)[0] != current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+def hash_reset_token(token):
+    """SHA-256 of an emailed reset token; only this is stored, so the table holds no live links"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
@@ -0,0 +1,207 @@
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, request
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+_NAME_RE = re.compile(r'^[\w.-]+\.folded$')
+
+def _frame_label(code):
+    path = code.co_filename
+    if path.startswith(_BACKEND_DIR):
+        path = os.path.relpath(path, _BACKEND_DIR)
+    else:
+        path = '/'.join(path.replace('\\', '/').split('/')[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ':')
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return labels[::-1]
+
+def folded(stacks):
+    """Collapsed-stack text ("root;caller;callee count" per line) for flamegraph.pl, speedscope or inferno"""
+    return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds until stopped"""
+
+    def __init__(self, thread_id, root, interval):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[(self.root, *_stack(frame))] += 1
+            if self._stop.wait(self.interval):
+                return
+
+class ProfileStore:
+    """Folded profiles in PROFILER_DIR, newest PROFILER_KEEP kept"""
+
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def new_name(self, label):
+        slug = re.sub(r'[^\w-]+', '-', label).strip('-')[:60] or 'profile'
+        return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{slug}-{secrets.token_hex(3)}.folded"
+
+    def save(self, name, stacks):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+                f.write(folded(stacks))
+            for old in self.list()[self.keep:]:
+                os.remove(os.path.join(self.directory, old['name']))
+        return name
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = [entry for entry in os.scandir(self.directory) if _NAME_RE.match(entry.name)]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [{'name': entry.name, 'bytes': entry.stat().st_size,
+                 'created_at': datetime.utcfromtimestamp(entry.stat().st_mtime).isoformat()} for entry in entries]
+
+    def path(self, name):
+        """File path for a stored profile name, or None"""
+        if not _NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+def _allowed(token):
+    """The operator's DEBUG_TOKEN, and within the RATELIMITS['profile'] budget"""
+    from auth import is_debug_token
+    from ratelimit import limiter
+    return is_debug_token(token) and not limiter.hit('profile', 'debug')
+
+def _start_request():
+    if not (request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'):
+        return
+    if not _allowed(request.headers.get('X-Debug-Token')):
+        return
+    label = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    g._profile_name = current_app.extensions['profile_store'].new_name(label)
+    g._profile_sampler = StackSampler(threading.get_ident(), label,
+                                      current_app.config.get('PROFILER_INTERVAL_MS', 1) / 1000).start()
+
+def _profile_header(response):
+    if g.get('_profile_sampler') is not None:
+        # Written once the request is torn down; fetch it from /api/debug/profiles/<name>
+        response.headers['X-Profile-Id'] = g._profile_name
+    return response
+
+def _finish_request(error=None):
+    sampler = g.pop('_profile_sampler', None)
+    if sampler is not None:
+        current_app.extensions['profile_store'].save(g.pop('_profile_name'), sampler.stop())
+
+def profile_event(name):
+    """Decorator for Socket.IO handlers: profile the event when data['_profile'] is the DEBUG_TOKEN"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = args[0].get('_profile') if args and isinstance(args[0], dict) else None
+            if not token or 'profile_store' not in current_app.extensions or not _allowed(token):
+                return fn(*args, **kwargs)
+            from flask_socketio import emit
+            store = current_app.extensions['profile_store']
+            label = f"socket {name}"
+            sampler = StackSampler(threading.get_ident(), label,
+                                   current_app.config.get('PROFILER_INTERVAL_MS', 1) / 1000).start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile = store.new_name(label)
+                store.save(profile, sampler.stop())
+                emit('profile', {'id': profile})
+        return wrapper
+    return decorator
+
+class ContinuousProfiler:
+    """Low-frequency sampling of every thread, saved as one folded profile per window.
+
+    Samples every PROFILER_CONTINUOUS_INTERVAL seconds, and further apart
+    whenever taking a sample would use more than PROFILER_CONTINUOUS_MAX_OVERHEAD
+    of the time, so a process with many threads or deep stacks is not slowed.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='continuous-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self, stacks):
+        """Add one sample of every other thread to stacks; returns seconds spent"""
+        start = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own:
+                stacks[(f"thread {names.get(thread_id, thread_id)}", *_stack(frame))] += 1
+        return time.perf_counter() - start
+
+    def _run(self, app):
+        config = app.config
+        interval = config.get('PROFILER_CONTINUOUS_INTERVAL', 0.1)
+        window = config.get('PROFILER_CONTINUOUS_WINDOW', 300)
+        max_overhead = config.get('PROFILER_CONTINUOUS_MAX_OVERHEAD', 0.01)
+        store = app.extensions['profile_store']
+        stacks = Counter()
+        window_end = time.monotonic() + window
+        while True:
+            cost = self.sample(stacks)
+            stopping = self._stop.wait(max(interval, cost / max_overhead))
+            if stopping or time.monotonic() >= window_end:
+                if stacks:
+                    store.save(store.new_name('continuous'), stacks)
+                stacks = Counter()
+                window_end = time.monotonic() + window
+            if stopping:
+                return
+
+def init_profiler(app):
+    app.extensions['profile_store'] = ProfileStore(os.path.abspath(app.config['PROFILER_DIR']),
+                                                   app.config.get('PROFILER_KEEP', 50))
+    app.before_request(_start_request)
+    app.after_request(_profile_header)
+    app.teardown_request(_finish_request)
+    if app.config.get('PROFILER_CONTINUOUS'):
+        app.extensions['continuous_profiler'] = ContinuousProfiler()
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+
+class QueryStats:
+    """Statements issued while handling one request or Socket.IO event"""
+
+    __slots__ = ('count', 'seconds', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def add(self, statement, seconds, keep):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.statements) < keep:
+            self.statements.append((statement, seconds))
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_started')
+    if not has_app_context():
+        return
+    stats = g.get('_query_stats')
+    if stats is None:
+        stats = g._query_stats = QueryStats()
+    stats.add(statement, elapsed, current_app.config.get('QUERY_STATS_STATEMENTS', 50))
+
+def instrument_engine(engine):
+    """Count and time every statement run on engine"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+class QueryLog:
+    """Recent requests with their query counts, plus per-endpoint totals"""
+
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=size)
+        self._endpoints = {}
+
+    def record(self, endpoint, entry):
+        with self._lock:
+            self._recent.append(entry)
+            totals = self._endpoints.setdefault(endpoint, {'requests': 0, 'queries': 0, 'max_queries': 0,
+                                                           'db_ms': 0.0})
+            totals['requests'] += 1
+            totals['queries'] += entry['queries']
+            totals['max_queries'] = max(totals['max_queries'], entry['queries'])
+            totals['db_ms'] += entry['db_ms']
+
+    def snapshot(self):
+        with self._lock:
+            recent = list(self._recent)
+            endpoints = {name: dict(totals, avg_queries=round(totals['queries'] / totals['requests'], 2),
+                                    avg_db_ms=round(totals['db_ms'] / totals['requests'], 3))
+                         for name, totals in self._endpoints.items()}
+        return {'recent': recent[::-1], 'endpoints': endpoints}
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._endpoints.clear()
+
+# One log per app instance; see create_app()
+query_log = LocalProxy(lambda: current_app.extensions['query_log'])
+
+def _entry(name, stats, status=None):
+    return {
+        'name': name,
+        'status': status,
+        'queries': stats.count,
+        'db_ms': round(stats.seconds * 1000, 3),
+        'statements': [{'sql': sql, 'ms': round(seconds * 1000, 3)} for sql, seconds in stats.statements],
+        'at': time.time(),
+    }
+
+def _start_request():
+    g._request_started = time.perf_counter()
+
+def _finish_request(response):
+    stats = g.pop('_query_stats', None) or QueryStats()
+    name = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    entry = _entry(name, stats, response.status_code)
+    started = g.get('_request_started')
+    if started is not None:
+        entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    query_log.record(name, entry)
+    if current_app.config.get('QUERY_STATS_SERVER_TIMING'):
+        timing = f'db;dur={entry["db_ms"]:.2f};desc="{stats.count} queries"'
+        if 'duration_ms' in entry:
+            timing += f', app;dur={entry["duration_ms"]:.2f}'
+        response.headers.add('Server-Timing', timing)
+    return response
+
+def _finish_event(error=None):
+    # Socket.IO events run in a request context of their own but skip after_request
+    event_info = getattr(request, 'event', None)
+    if event_info is None:
+        return
+    stats = g.pop('_query_stats', None)
+    if stats is not None:
+        name = f"socket {event_info['message']}"
+        query_log.record(name, _entry(name, stats))
+
+def init_query_stats(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_finish_event)
+
+@contextmanager
+def query_budget(app, max_queries):
+    """Fail the block if it runs more than max_queries statements (for tests).
+
+        with query_budget(app, 4):
+            client.get('/api/workspaces/1/tasks', headers=headers)
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engines = list(app.extensions['sqlalchemy'].engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+    if len(statements) > max_queries:
+        listing = '\n'.join(f"  {sql}" for sql in statements)
+        raise AssertionError(f"{len(statements)} queries, budget is {max_queries}:\n{listing}")
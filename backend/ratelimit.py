@@ -0,0 +1,124 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+from werkzeug.local import LocalProxy
+
+def parse_limit(spec):
+    """Parse 'count/seconds' into (refill rate per second, capacity)"""
+    count, seconds = spec.split('/')
+    return float(count) / float(seconds), float(count)
+
+def _take(state, now, rate, capacity):
+    """Refill a bucket and try to take one token; returns (tokens, retry_after)"""
+    tokens, updated = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+class MemoryBackend:
+    """Per-process buckets; enough for a single worker"""
+
+    max_keys = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, rate, capacity):
+        now = time.monotonic()
+        with self._lock:
+            tokens, retry_after = _take(self._buckets.get(key), now, rate, capacity)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._sweep(now)
+        return retry_after
+
+    def _sweep(self, now):
+        # Buckets idle for an hour are full for any sane limit; forgetting them is lossless
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+
+class SQLiteBackend:
+    """Buckets shared by every worker on the host through a small SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, capacity):
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, retry_after = _take(row, now, rate, capacity)
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            self._ops += 1
+            if self._ops % 10000 == 0:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return retry_after
+
+class RateLimiter:
+    """Token buckets for one app, stored where its RATELIMIT_STORAGE_URL says"""
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def _get_backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    url = current_app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
+                    if url.startswith('sqlite:///'):
+                        path = url[len('sqlite:///'):]
+                        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                        self._backend = SQLiteBackend(path)
+                    else:
+                        self._backend = MemoryBackend()
+        return self._backend
+
+    def hit(self, name, key):
+        """Take one token from the name/key bucket; returns seconds to wait, 0 if allowed"""
+        if not current_app.config.get('RATELIMIT_ENABLED', True):
+            return 0
+        spec = current_app.config.get('RATELIMITS', {}).get(name)
+        if not spec:
+            return 0
+        rate, capacity = parse_limit(spec)
+        return self._get_backend().consume(f"{name}:{key}", rate, capacity)
+
+limiter = LocalProxy(lambda: current_app.extensions['rate_limiter'])
+
+def rate_limit(name, key_func=lambda: request.remote_addr):
+    """Reject with 429 and Retry-After once the route's bucket for key_func() is empty"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            retry_after = limiter.hit(name, key_func())
+            if retry_after:
+                resp = jsonify({'error': 'Too many requests, please slow down'})
+                resp.headers['Retry-After'] = str(math.ceil(retry_after))
+                return resp, 429
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
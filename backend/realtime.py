@@ -0,0 +1,160 @@
+import math
+from flask import current_app, request, session
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from database import db, Membership, Message
+from auth import load_identity
+from metrics import observe_event
+from profiler import profile_event
+from ratelimit import limiter
+from revocation import revocation_list
+from sharding import workspace_shard
+from writer import run_write, WriterBusy
+
+# Upper bounds of the socketio_room_members buckets
+ROOM_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Event handlers, registered on each app's SocketIO by init_realtime()
+_handlers = {}
+
+def on(event):
+    def decorator(fn):
+        _handlers[event] = fn
+        return fn
+    return decorator
+
+def init_realtime(app):
+    """Attach a Socket.IO server to app (app.extensions['socketio']); returns the SocketIO instance"""
+    socketio = SocketIO(app, cors_allowed_origins="*")
+    for event, handler in _handlers.items():
+        socketio.on_event(event, handler)
+    if 'metrics' in app.extensions:
+        # A distribution rather than one series per room, so the scrape does not list workspace ids
+        from metrics import CallbackHistogram
+        CallbackHistogram(app.extensions['metrics'], 'socketio_room_members', 'Clients joined per workspace room',
+                          lambda: _room_sizes(socketio), ROOM_SIZE_BUCKETS)
+    return socketio
+
+def _speaks_for(user_id):
+    """False when the connection authenticated as a different user than user_id"""
+    return session.get('user_id') in (None, str(user_id))
+
+def _room_sizes(socketio):
+    rooms = socketio.server.manager.rooms.get('/', {}) if socketio.server else {}
+    return [len(members) for room, members in list(rooms.items())
+            if isinstance(room, str) and room.startswith('workspace_')]
+
+@on('connect')
+def on_connect(auth=None):
+    # A client that passes its access token (io(url, {auth: {token}})) is tied to that user
+    token = auth.get('token') if isinstance(auth, dict) else None
+    if token:
+        from flask_jwt_extended import decode_token
+        try:
+            claims = decode_token(token)
+        except Exception:
+            return False
+        if revocation_list.is_revoked(claims['jti']):
+            return False
+        session['user_id'] = str(claims['sub'])
+    if 'metrics' in current_app.extensions:
+        current_app.extensions['metrics'].connections.inc()
+
+@on('disconnect')
+def on_disconnect():
+    if 'metrics' in current_app.extensions:
+        current_app.extensions['metrics'].connections.dec()
+
+# Socket.IO events for real-time chat
+@on('join_workspace')
+@observe_event('join_workspace')
+@profile_event('join_workspace')
+def on_join_workspace(data):
+    workspace_id = data.get('workspace_id')
+    user_id = data.get('user_id')
+    if not workspace_id or not user_id:
+        emit('error', {'msg': 'Missing workspace_id or user_id'})
+        return
+    # Check if user is an active member of workspace
+    user = _speaks_for(user_id) and load_identity(user_id)
+    membership = user and Membership.query.filter_by(user_id=user.id, workspace_id=workspace_id).first()
+    if membership:
+        join_room(f'workspace_{workspace_id}')
+        emit('status', {'msg': f'Joined workspace {workspace_id}'})
+    else:
+        emit('error', {'msg': 'Access denied'})
+
+@on('leave_workspace')
+@observe_event('leave_workspace')
+@profile_event('leave_workspace')
+def on_leave_workspace(data):
+    workspace_id = data.get('workspace_id')
+    if not workspace_id:
+        emit('error', {'msg': 'Missing workspace_id'})
+        return
+    leave_room(f'workspace_{workspace_id}')
+    emit('status', {'msg': f'Left workspace {workspace_id}'})
+
+def create_message(workspace_id, user_id, content):
+    """Write unit for send_message"""
+    with workspace_shard(workspace_id, write=True):
+        message = Message(
+            workspace_id=workspace_id,
+            user_id=user_id,
+            content=content
+        )
+        db.session.add(message)
+        db.session.flush()
+        return {'id': message.id, 'content': message.content, 'created_at': message.created_at.isoformat()}
+
+@on('send_message')
+@observe_event('send_message')
+@profile_event('send_message')
+def handle_message(data):
+    try:
+        user_id = data.get('user_id')
+        workspace_id = data.get('workspace_id')
+        content = data.get('content')
+        if not user_id or not workspace_id or not content:
+            emit('error', {'msg': 'Missing required fields'})
+            return
+        
+        # Resolved before the write: a deactivated user gets no identity and must not post
+        user = _speaks_for(user_id) and load_identity(user_id)
+        
+        # Check if user is member of workspace
+        membership = user and Membership.query.filter_by(user_id=user.id, workspace_id=workspace_id).first()
+        if not membership:
+            emit('error', {'msg': 'Access denied'})
+            return
+        
+        # Only members reach the buckets. user_id is whatever the client sent, so the
+        # per-sender bucket is keyed on the connection instead. An unauthenticated
+        # connection can name any member, so those share a separate workspace bucket
+        # and cannot drain the one authenticated members use
+        workspace_key = workspace_id if 'user_id' in session else f'{workspace_id}:unauthenticated'
+        retry_after = (limiter.hit('send_message_user', request.sid)
+                       or limiter.hit('send_message_workspace', workspace_key))
+        if retry_after:
+            emit('error', {'msg': 'Rate limit exceeded', 'retry_after': math.ceil(retry_after)})
+            return
+        
+        # Create message
+        message = run_write(create_message, workspace_id, user.id, content)
+        
+        # Emit to all users in the workspace
+        emit('new_message', {
+            'id': message['id'],
+            'content': message['content'],
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name
+            },
+            'created_at': message['created_at']
+        }, room=f'workspace_{workspace_id}')
+        
+    except WriterBusy as e:
+        emit('error', {'msg': str(e), 'retry_after': 1})
+    except Exception as e:
+        emit('error', {'msg': str(e)})
@@ -0,0 +1,150 @@
+import math
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from werkzeug.local import LocalProxy
+from sqlalchemy import inspect
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import CompoundSelect
+from sqlalchemy.sql.util import find_tables
+from sharding import SHARDED_TABLES, ShardingError, current_bind_key, is_unset
+
+READ_METHODS = ('GET', 'HEAD')
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for DATABASE_REPLICA_URLS"""
+    return {f'replica_{i}': url for i, url in enumerate(urls)}
+
+class RecentWriters:
+    """Who wrote in the last few seconds, so their reads stay on the primary.
+
+    Keys are the JWT identity, or for anonymous clients a random token set
+    as the STICKY_COOKIE cookie on their write (never the client address:
+    behind a proxy or NAT one write would pin everyone to the primary). The
+    map is per process; with several workers a follow-up read that lands
+    on another worker only gets read-your-writes from the replica lag being
+    shorter than the window.
+    """
+
+    max_keys = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writes = {}
+
+    def note(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._writes[key] = now
+            if len(self._writes) > self.max_keys:
+                cutoff = now - 3600
+                self._writes = {k: v for k, v in self._writes.items() if v > cutoff}
+
+    def recent(self, keys, window):
+        cutoff = time.monotonic() - window
+        return any(self._writes.get(key, 0) > cutoff for key in keys)
+
+    def clear(self):
+        with self._lock:
+            self._writes.clear()
+
+# One map per app instance; see create_app()
+recent_writers = LocalProxy(lambda: current_app.extensions['recent_writers'])
+
+STICKY_COOKIE = 'db_sticky'
+
+def _client_keys(writing=False):
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # Not verified yet (or not a JWT route)
+        identity = None
+    if identity is not None:
+        return [f"user:{identity}"]
+    token = request.cookies.get(STICKY_COOKIE) or g.get('_db_sticky_token')
+    if token is None and writing:
+        token = g._db_sticky_token = secrets.token_urlsafe(16)
+    return [f"anon:{token}"] if token else []
+
+def _set_sticky_cookie(response):
+    token = g.get('_db_sticky_token')
+    if token is not None:
+        window = current_app.config.get('DB_REPLICA_STICKY_SECONDS', 5)
+        response.set_cookie(STICKY_COOKIE, token, max_age=math.ceil(window), httponly=True, samesite='Lax')
+    return response
+
+def init_replicas(app):
+    app.after_request(_set_sticky_cookie)
+
+@contextmanager
+def primary():
+    """Run the block's reads on the primary, e.g. to rebuild a cache after a write"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('_db_primary', False)
+    g._db_primary = True
+    try:
+        yield
+    finally:
+        g._db_primary = previous
+
+def _sharded_table(mapper, clause):
+    """Name of the sharded table a statement targets, if any"""
+    if mapper is not None:
+        name = inspect(mapper).local_table.name
+        return name if name in SHARDED_TABLES else None
+    if clause is None:
+        return None
+    for table in find_tables(clause, include_crud=True):
+        if table.name in SHARDED_TABLES:
+            return table.name
+    return None
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs from GET/HEAD routes to a read replica.
+
+    Everything else uses the primary: flushes, INSERT/UPDATE/DELETE, raw SQL,
+    background threads, Socket.IO events and, for DB_REPLICA_STICKY_SECONDS
+    after a write, every read by the same user or client. With
+    DATABASE_SHARDS set, statements on messages/files/tasks go to the shard
+    chosen by sharding.workspace_shard() instead.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and current_app.config.get('DATABASE_SHARDS'):
+            table = _sharded_table(mapper, clause)
+            if table is not None:
+                key = current_bind_key()
+                if is_unset(key):
+                    raise ShardingError(f"{table} used outside workspace_shard(); its shard is unknown")
+                # Shards have no replicas; the shard primary serves reads and writes
+                return self._db.engines[key]
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g._db_primary = True
+                recent_writers.note(_client_keys(writing=True))
+            else:
+                replica = self._replica_for(clause)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for(self, clause):
+        count = len(current_app.config.get('DATABASE_REPLICA_URLS') or ())
+        if not count or not isinstance(clause, (Select, CompoundSelect)):
+            return None
+        # Socket.IO events run in a request context without a URL rule
+        if request.method not in READ_METHODS or request.url_rule is None or g.get('_db_primary'):
+            return None
+        window = current_app.config.get('DB_REPLICA_STICKY_SECONDS', 5)
+        if window > 0 and recent_writers.recent(_client_keys(), window):
+            return None
+        return self._db.engines[f'replica_{random.randrange(count)}']
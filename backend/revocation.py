@@ -0,0 +1,93 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
+from database import db, RevokedToken
+from replicas import primary
+
+class RevocationList:
+    """In-memory mirror of the revoked_tokens table.
+
+    Holds jti -> expiry (epoch seconds) for revoked tokens that have not
+    expired yet, so memory is bounded by revocations within one token
+    lifetime rather than by tokens issued. Every sync interval the list
+    pulls rows revoked by other workers and drops expired entries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loaded = False
+        self._watermark = None
+        self._next_sync = 0.0
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def revoke(self, jti, user_id, expires_at):
+        """Persist a revocation and apply it locally straight away"""
+        db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # A concurrent logout with the same token got there first; it is revoked either way
+            with primary():
+                if not RevokedToken.query.filter_by(jti=jti).first():
+                    raise
+        with self._lock:
+            self._entries[jti] = _epoch(expires_at)
+
+    def sync(self):
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + current_app.config.get('REVOCATION_SYNC_INTERVAL', 10)
+            now = datetime.utcnow()
+            q = db.session.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+            if self._loaded:
+                # Overlap the watermark slightly to tolerate clock skew between workers
+                q = q.filter(RevokedToken.revoked_at >= self._watermark - timedelta(seconds=5))
+            else:
+                q = q.filter(RevokedToken.expires_at > now)
+            # The watermark assumes it sees every row committed so far; a replica may lag
+            with primary():
+                rows = q.all()
+            for jti, expires_at, revoked_at in rows:
+                self._entries[jti] = _epoch(expires_at)
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            if self._watermark is None:
+                self._watermark = now
+            self._loaded = True
+            cutoff = time.time()
+            self._entries = {jti: exp for jti, exp in self._entries.items() if exp > cutoff}
+
+    def __len__(self):
+        return len(self._entries)
+
+def _epoch(dt):
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+def purge_expired_revocations(batch_size=1000):
+    """Maintenance job: delete revoked_tokens rows whose tokens have expired anyway, in small batches"""
+    now = datetime.utcnow()
+    while True:
+        ids = [row.id for row in db.session.query(RevokedToken.id)
+               .filter(RevokedToken.expires_at < now).limit(batch_size)]
+        if not ids:
+            return
+        RevokedToken.query.filter(RevokedToken.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+# One list per app instance; see create_app()
+revocation_list = LocalProxy(lambda: current_app.extensions['revocation_list'])
+
+def token_in_blocklist_callback(_jwt_header, jwt_payload):
+    """flask_jwt_extended token_in_blocklist_loader"""
+    return revocation_list.is_revoked(jwt_payload['jti'])
@@ -1,14 +1,481 @@
-from flask import Blueprint, request, jsonify, send_file
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, current_user
 from werkzeug.utils import secure_filename
-from database import db, User, Workspace, Membership, Message, File, Task, Project, JoinRequest, ProjectSubmission, ProjectReview
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from database import db, pending_request_key, stream_rows, User, Workspace, Membership, Message, File, Task, Project, JoinRequest, ProjectSubmission, ProjectReview, PasswordReset
+from auth import debug_required, external_required, student_required
+from mailer import enqueue_email, enqueue_emails
+from metrics import record_upload
+from passwords import hash_password, hash_reset_token, verify_password, needs_rehash, PasswordHasherBusy
+from querystats import query_log
+from ratelimit import rate_limit
+from revocation import revocation_list
+from search import search_users
+from sharding import WorkspaceMoving, ensure_writable, find_by_id, shard_map, sharding_enabled, workspace_shard
+from writer import run_write, WriterBusy
+from directory import student_directory
+from pagination import keyset_page, page_size, paginated_response
+import json
 import os
+import secrets
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
 
 # Create blueprint
 api = Blueprint('api', __name__)
 
+def _users_by_id(ids):
+    """Load the users behind a list of rows in one query"""
+    ids = {user_id for user_id in ids if user_id is not None}
+    return {user.id: user for user in User.query.filter(User.id.in_(ids))} if ids else {}
+
+def busy_response(error):
+    resp = jsonify({'error': str(error)})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
+
+# Authentication routes
+@api.route('/api/signup', methods=['POST'])
+def signup():
+    try:
+        data = request.get_json() or {}
+        
+        # Validate required fields
+        required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+        # Validate role
+        role = data.get('role', 'student')
+        if role not in ['student', 'admin', 'external']:
+            return jsonify({'error': 'Invalid role'}), 400
+        
+        # Validate email format
+        import re
+        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        if not re.match(email_pattern, data['email']):
+            return jsonify({'error': 'Invalid email format'}), 400
+        
+        # Validate password strength
+        if len(data['password']) < 6:
+            return jsonify({'error': 'Password must be at least 6 characters long'}), 400
+        
+        # Check if user already exists
+        if User.query.filter_by(email=data['email']).first():
+            return jsonify({'error': 'Email already registered'}), 400
+        
+        if User.query.filter_by(username=data['username']).first():
+            return jsonify({'error': 'Username already taken'}), 400
+        
+        # Create new user
+        user = User(
+            username=data['username'],
+            email=data['email'],
+            password_hash=hash_password(data['password']),
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            role=role
+        )
+        
+        db.session.add(user)
+        db.session.commit()
+        if user.role == 'student':
+            student_directory.invalidate(user.id)
+        
+        # Create access token
+        access_token = create_access_token(identity=str(user.id))
+        
+        return jsonify({
+            'message': 'User created successfully',
+            'access_token': access_token,
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'role': user.role
+            }
+        }), 201
+        
+    except PasswordHasherBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/login', methods=['POST'])
+@rate_limit('login')
+def login():
+    try:
+        data = request.get_json()
+        user = User.query.filter_by(email=data['email']).first()
+        
+        if user and verify_password(user.password_hash, data['password']):
+            # Upgrade hashes made with outdated cost parameters while we have the plaintext
+            if needs_rehash(user.password_hash):
+                user.password_hash = hash_password(data['password'])
+                db.session.commit()
+            access_token = create_access_token(identity=str(user.id))
+            return jsonify({
+                'message': 'Login successful',
+                'access_token': access_token,
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'role': user.role
+                }
+            }), 200
+        else:
+            return jsonify({'error': 'Invalid credentials'}), 401
+            
+    except PasswordHasherBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    try:
+        claims = get_jwt()
+        revocation_list.revoke(claims['jti'], int(get_jwt_identity()), datetime.utcfromtimestamp(claims['exp']))
+        return jsonify({'message': 'Logout successful'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Forgot password endpoints
+@api.route('/api/forgot-password', methods=['POST'])
+@rate_limit('forgot_password')
+def forgot_password():
+    try:
+        data = request.get_json()
+        email = data.get('email')
+        
+        if not email:
+            return jsonify({'error': 'Email is required'}), 400
+        
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            return jsonify({'error': 'Email not found'}), 404
+        
+        # Generate reset token
+        token = secrets.token_urlsafe(32)
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        
+        # A new token supersedes any outstanding ones for this user
+        PasswordReset.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+        
+        # Create password reset record (only the token's hash is stored)
+        reset_record = PasswordReset(
+            user_id=user.id,
+            token_hash=hash_reset_token(token),
+            expires_at=expires_at
+        )
+        
+        db.session.add(reset_record)
+        # Queued in the same transaction as the token; delivery happens off the request path
+        queue_reset_email(user.email, token)
+        db.session.commit()
+        
+        return jsonify({'message': 'Password reset email sent'}), 200
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/reset-password', methods=['POST'])
+def reset_password():
+    try:
+        data = request.get_json()
+        token = data.get('token')
+        new_password = data.get('password')
+        
+        if not token or not new_password:
+            return jsonify({'error': 'Token and password are required'}), 400
+        
+        if len(new_password) < 6:
+            return jsonify({'error': 'Password must be at least 6 characters long'}), 400
+        
+        # Find valid reset record
+        reset_record = PasswordReset.query.filter_by(
+            token_hash=hash_reset_token(token),
+            used=False
+        ).first()
+        
+        if not reset_record:
+            return jsonify({'error': 'Invalid or expired token'}), 400
+        
+        if reset_record.expires_at < datetime.utcnow():
+            return jsonify({'error': 'Token has expired'}), 400
+        
+        # Update user password
+        user = User.query.get(reset_record.user_id)
+        user.password_hash = hash_password(new_password)
+        
+        # Mark token as used
+        reset_record.used = True
+        
+        db.session.commit()
+        
+        return jsonify({'message': 'Password updated successfully'}), 200
+        
+    except PasswordHasherBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def queue_reset_email(email, token):
+    """Queue the password reset email; the mail worker delivers it"""
+    reset_url = f"{current_app.config['FRONTEND_URL']}/reset-password.html?token={token}"
+    body = f"""
+    You requested a password reset for your Global Collaboration Hub account.
+    
+    Click the link below to reset your password:
+    {reset_url}
+    
+    This link will expire in 1 hour.
+    
+    If you didn't request this reset, please ignore this email.
+    """
+    enqueue_email(email, "Password Reset Request", body)
+
+# User profile routes
+@api.route('/api/profile', methods=['GET'])
+@jwt_required()
+def get_profile():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': user.role,
+            'profile_picture': user.profile_picture,
+            'bio': user.bio,
+            'domain': user.domain,
+            'skills': user.skills,
+            'experience_years': user.experience_years,
+            'portfolio_link': user.portfolio_link,
+            'resume_link': user.resume_link,
+            'created_at': user.created_at.isoformat()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/profile', methods=['PUT'])
+@jwt_required()
+def update_profile():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        data = request.get_json()
+        
+        # Update user fields
+        if 'first_name' in data:
+            user.first_name = data['first_name']
+        if 'last_name' in data:
+            user.last_name = data['last_name']
+        if 'bio' in data:
+            user.bio = data['bio']
+        if 'profile_picture' in data:
+            user.profile_picture = data['profile_picture']
+        # Extended profile
+        if 'domain' in data:
+            user.domain = data['domain']
+        if 'skills' in data:
+            user.skills = data['skills']
+        if 'experience_years' in data:
+            try:
+                user.experience_years = int(data['experience_years']) if data['experience_years'] is not None else None
+            except ValueError:
+                return jsonify({'error': 'experience_years must be a number'}), 400
+        if 'portfolio_link' in data:
+            user.portfolio_link = data['portfolio_link']
+        if 'resume_link' in data:
+            user.resume_link = data['resume_link']
+        
+        db.session.commit()
+        student_directory.invalidate(user.id)
+        
+        return jsonify({'message': 'Profile updated successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Workspace routes
+@api.route('/api/workspaces', methods=['GET'])
+@jwt_required()
+def get_workspaces():
+    try:
+        user_id = int(get_jwt_identity())
+        
+        # Get workspaces where user is an accepted member, joined in one query
+        rows = (db.session.query(Membership, Workspace)
+                .join(Workspace, Workspace.id == Membership.workspace_id)
+                .filter(Membership.user_id == user_id, Membership.status == 'accepted')
+                .all())
+        workspaces = []
+        
+        for membership, workspace in rows:
+            workspaces.append({
+                'id': workspace.id,
+                'name': workspace.name,
+                'description': workspace.description,
+                'role': membership.role,
+                'status': membership.status,
+                'created_at': workspace.created_at.isoformat()
+            })
+        
+        return jsonify(workspaces), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/workspaces', methods=['POST'])
+@jwt_required()
+def create_workspace():
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json()
+        
+        # Create workspace
+        workspace = Workspace(
+            name=data['name'],
+            description=data.get('description', ''),
+            created_by=user_id
+        )
+        
+        db.session.add(workspace)
+        db.session.flush()  # Get the workspace ID
+        
+        # Add creator as owner with accepted status
+        membership = Membership(
+            user_id=user_id,
+            workspace_id=workspace.id,
+            role='owner',
+            status='accepted',
+            joined_at=datetime.utcnow()
+        )
+        
+        db.session.add(membership)
+        if sharding_enabled():
+            shard_map.assign(workspace.id)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Workspace created successfully',
+            'workspace': {
+                'id': workspace.id,
+                'name': workspace.name,
+                'description': workspace.description,
+                'role': 'owner'
+            }
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Message routes
+@api.route('/api/workspaces/<int:workspace_id>/messages', methods=['GET'])
+@jwt_required()
+def get_messages(workspace_id):
+    try:
+        user_id = int(get_jwt_identity())
+        
+        # Check if user is accepted member of workspace
+        membership = Membership.query.filter_by(user_id=user_id, workspace_id=workspace_id, status='accepted').first()
+        if not membership:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        # Get messages
+        with workspace_shard(workspace_id):
+            messages = Message.query.filter_by(workspace_id=workspace_id).order_by(Message.created_at.desc()).limit(50).all()
+        
+        users = _users_by_id(message.user_id for message in messages)
+        message_list = []
+        for message in messages:
+            user = users[message.user_id]
+            message_list.append({
+                'id': message.id,
+                'content': message.content,
+                'message_type': message.message_type,
+                'file_path': message.file_path,
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name
+                },
+                'created_at': message.created_at.isoformat()
+            })
+        
+        return jsonify(message_list[::-1]), 200  # Reverse to show oldest first
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/workspaces/<int:workspace_id>/messages/export', methods=['GET'])
+@jwt_required()
+def export_messages(workspace_id):
+    """Stream the workspace's whole chat history as NDJSON, oldest first"""
+    try:
+        user_id = int(get_jwt_identity())
+        
+        membership = Membership.query.filter_by(user_id=user_id, workspace_id=workspace_id, status='accepted').first()
+        if not membership:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        # No join with users: messages may live on a shard while users stay in the global database
+        statement = (select(Message.id, Message.content, Message.message_type, Message.file_path, Message.created_at,
+                            Message.user_id)
+                     .where(Message.workspace_id == workspace_id)
+                     .order_by(Message.created_at, Message.id))
+        
+        def generate():
+            usernames = {}
+            with workspace_shard(workspace_id):
+                # Rows come off a server-side cursor, so memory stays flat however long the history is
+                rows = stream_rows(statement)
+                for batch in iter(lambda: list(islice(rows, 1000)), []):
+                    missing = {row.user_id for row in batch} - usernames.keys()
+                    if missing:
+                        usernames.update(db.session.execute(select(User.id, User.username)
+                                                            .where(User.id.in_(missing))).all())
+                    for row in batch:
+                        yield json.dumps({
+                            'id': row.id,
+                            'content': row.content,
+                            'message_type': row.message_type,
+                            'file_path': row.file_path,
+                            'user': {'id': row.user_id, 'username': usernames.get(row.user_id)},
+                            'created_at': row.created_at.isoformat()
+                        }) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+            'Content-Disposition': f'attachment; filename=workspace-{workspace_id}-messages.ndjson'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # File routes
 @api.route('/api/workspaces/<int:workspace_id>/files', methods=['GET'])
 @jwt_required()
@@ -22,11 +489,13 @@ def get_files(workspace_id):
             return jsonify({'error': 'Access denied'}), 403
         
         # Get files
-        files = File.query.filter_by(workspace_id=workspace_id).order_by(File.created_at.desc()).all()
+        with workspace_shard(workspace_id):
+            files = File.query.filter_by(workspace_id=workspace_id).order_by(File.created_at.desc()).all()
         
+        users = _users_by_id(file.uploaded_by for file in files)
         file_list = []
         for file in files:
-            uploader = User.query.get(file.uploaded_by)
+            uploader = users[file.uploaded_by]
             file_list.append({
                 'id': file.id,
                 'filename': file.filename,
@@ -88,6 +557,9 @@ def upload_file(workspace_id):
             return jsonify({'error': 'No file selected'}), 400
         
         if file:
+            # Refuse before writing to disk while the workspace is being moved
+            ensure_writable(workspace_id)
+            
             # Generate unique filename
             filename = secure_filename(file.filename)
             unique_filename = f"{uuid.uuid4()}_{filename}"
@@ -101,10 +573,11 @@ def upload_file(workspace_id):
             
             # Get file info
             file_size = os.path.getsize(file_path)
+            record_upload(file_size)
             file_type = file.content_type or 'application/octet-stream'
             
             # Save file record to database
-            file_record = File(
+            file_record = run_write(_create_file_record,
                 workspace_id=workspace_id,
                 uploaded_by=user_id,
                 filename=unique_filename,
@@ -115,23 +588,30 @@ def upload_file(workspace_id):
                 description=request.form.get('description', '')
             )
             
-            db.session.add(file_record)
-            db.session.commit()
-            
             return jsonify({
                 'message': 'File uploaded successfully',
-                'file': {
-                    'id': file_record.id,
-                    'filename': file_record.filename,
-                    'original_filename': file_record.original_filename,
-                    'file_size': file_record.file_size,
-                    'file_type': file_record.file_type
-                }
+                'file': file_record
             }), 201
             
+    except (WorkspaceMoving, WriterBusy) as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _create_file_record(**fields):
+    """Write unit for upload_file"""
+    with workspace_shard(fields['workspace_id'], write=True):
+        file_record = File(**fields)
+        db.session.add(file_record)
+        db.session.flush()
+        return {
+            'id': file_record.id,
+            'filename': file_record.filename,
+            'original_filename': file_record.original_filename,
+            'file_size': file_record.file_size,
+            'file_type': file_record.file_type
+        }
+
 @api.route('/api/files/<int:file_id>/download', methods=['GET'])
 @jwt_required()
 def download_file(file_id):
@@ -139,7 +619,7 @@ def download_file(file_id):
         user_id = get_jwt_identity()
         
         # Get file record
-        file_record = File.query.get(file_id)
+        file_record = find_by_id(File, file_id)
         if not file_record:
             return jsonify({'error': 'File not found'}), 404
         
@@ -170,12 +650,14 @@ def get_tasks(workspace_id):
             return jsonify({'error': 'Access denied'}), 403
         
         # Get tasks
-        tasks = Task.query.filter_by(workspace_id=workspace_id).order_by(Task.created_at.desc()).all()
+        with workspace_shard(workspace_id):
+            tasks = Task.query.filter_by(workspace_id=workspace_id).order_by(Task.created_at.desc()).all()
         
+        users = _users_by_id([task.created_by for task in tasks] + [task.assigned_to for task in tasks])
         task_list = []
         for task in tasks:
-            creator = User.query.get(task.created_by)
-            assignee = User.query.get(task.assigned_to) if task.assigned_to else None
+            creator = users[task.created_by]
+            assignee = users.get(task.assigned_to) if task.assigned_to else None
             
             task_list.append({
                 'id': task.id,
@@ -223,31 +705,34 @@ def create_task(workspace_id):
             due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
         
         # Create task
-        task = Task(
-            workspace_id=workspace_id,
-            created_by=user_id,
-            assigned_to=data.get('assigned_to'),
-            title=data['title'],
-            description=data.get('description', ''),
-            priority=data.get('priority', 'medium'),
-            due_date=due_date
-        )
-        
-        db.session.add(task)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Task created successfully',
-            'task': {
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'status': task.status,
-                'priority': task.priority,
-                'due_date': task.due_date.isoformat() if task.due_date else None
-            }
-        }), 201
+        with workspace_shard(workspace_id, write=True):
+            task = Task(
+                workspace_id=workspace_id,
+                created_by=user_id,
+                assigned_to=data.get('assigned_to'),
+                title=data['title'],
+                description=data.get('description', ''),
+                priority=data.get('priority', 'medium'),
+                due_date=due_date
+            )
+            
+            db.session.add(task)
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Task created successfully',
+                'task': {
+                    'id': task.id,
+                    'title': task.title,
+                    'description': task.description,
+                    'status': task.status,
+                    'priority': task.priority,
+                    'due_date': task.due_date.isoformat() if task.due_date else None
+                }
+            }), 201
         
+    except WorkspaceMoving as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -258,7 +743,7 @@ def update_task(task_id):
         user_id = get_jwt_identity()
         
         # Get task
-        task = Task.query.get(task_id)
+        task = find_by_id(Task, task_id)
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
@@ -270,26 +755,27 @@ def update_task(task_id):
         data = request.get_json()
         
         # Update task fields
-        if 'title' in data:
-            task.title = data['title']
-        if 'description' in data:
-            task.description = data['description']
-        if 'status' in data:
-            task.status = data['status']
-        if 'priority' in data:
-            task.priority = data['priority']
-        if 'assigned_to' in data:
-            task.assigned_to = data['assigned_to']
+        changes = {field: data[field] for field in ['title', 'description', 'status', 'priority', 'assigned_to'] if field in data}
         if 'due_date' in data:
-            task.due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00')) if data['due_date'] else None
+            changes['due_date'] = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00')) if data['due_date'] else None
         
-        db.session.commit()
+        run_write(_update_task, task.workspace_id, task_id, changes)
         
         return jsonify({'message': 'Task updated successfully'}), 200
         
+    except (WorkspaceMoving, WriterBusy) as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _update_task(workspace_id, task_id, changes):
+    """Write unit for update_task"""
+    with workspace_shard(workspace_id, write=True):
+        task = Task.query.get(task_id)
+        for field, value in changes.items():
+            setattr(task, field, value)
+        db.session.flush()
+
 @api.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 @jwt_required()
 def delete_task(task_id):
@@ -297,7 +783,7 @@ def delete_task(task_id):
         user_id = get_jwt_identity()
         
         # Get task
-        task = Task.query.get(task_id)
+        task = find_by_id(Task, task_id)
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
@@ -310,60 +796,61 @@ def delete_task(task_id):
         if task.created_by != user_id and membership.role not in ['owner', 'admin']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        db.session.delete(task)
-        db.session.commit()
+        with workspace_shard(task.workspace_id, write=True):
+            db.session.delete(task)
+            db.session.commit()
         
         return jsonify({'message': 'Task deleted successfully'}), 200
         
+    except WorkspaceMoving as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Profile discovery for agencies
 @api.route('/api/students', methods=['GET'])
 @jwt_required()
+@external_required()
 def list_students():
     try:
-        current_id = get_jwt_identity()
-        me = User.query.get(current_id)
-        if me.role != 'external' and me.role != 'admin':
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        q = User.query.filter_by(role='student').all()
-        return jsonify([{
-            'id': u.id,
-            'first_name': u.first_name,
-            'last_name': u.last_name,
-            'email': u.email,
-            'domain': u.domain,
-            'skills': u.skills,
-            'experience_years': u.experience_years,
-            'portfolio_link': u.portfolio_link
-        } for u in q]), 200
+        return student_directory.listing().response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/students/<int:student_id>', methods=['GET'])
 @jwt_required()
+@external_required()
 def get_student(student_id):
     try:
-        current_id = get_jwt_identity()
-        me = User.query.get(current_id)
-        if me.role != 'external' and me.role != 'admin':
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        u = User.query.get(student_id)
-        if not u or u.role != 'student':
+        snapshot = student_directory.student(student_id)
+        if not snapshot:
             return jsonify({'error': 'Student not found'}), 404
-        return jsonify({
+        return snapshot.response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Typeahead search over users by name, username or email (typo tolerant)
+@api.route('/api/users/search', methods=['GET'])
+@jwt_required()
+def search_users_typeahead():
+    try:
+        q = (request.args.get('q') or '').strip()
+        if len(q) < 2:
+            return jsonify([]), 200
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        role = request.args.get('role')
+        if role and role not in ['student', 'admin', 'external']:
+            return jsonify({'error': 'Invalid role'}), 400
+        results = search_users(q, limit=limit, role=role)
+        return jsonify([{
             'id': u.id,
+            'username': u.username,
             'first_name': u.first_name,
             'last_name': u.last_name,
             'email': u.email,
-            'domain': u.domain,
-            'skills': u.skills,
-            'experience_years': u.experience_years,
-            'portfolio_link': u.portfolio_link,
-            'resume_link': u.resume_link,
-            'bio': u.bio
-        }), 200
+            'role': u.role,
+            'score': round(score, 3)
+        } for u, score in results]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -374,55 +861,144 @@ def switch_my_role():
     try:
         if os.getenv('ALLOW_ROLE_SWITCH', '1') != '1':
             return jsonify({'error': 'Role switching disabled'}), 403
-        uid = get_jwt_identity()
-        user = User.query.get(uid)
+        user = User.query.get(current_user.id)
         data = request.get_json() or {}
         new_role = data.get('role')
         if new_role not in ['student', 'external', 'admin']:
             return jsonify({'error': 'Invalid role'}), 400
         user.role = new_role
         db.session.commit()
+        student_directory.invalidate(user.id)
         return jsonify({'message': 'Role updated', 'role': user.role}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # Join Request flow
+# Upper bound on student ids accepted by one bulk request call
+MAX_BULK_REQUESTS = 500
+
+def _pending_request_student_ids(agency_id, student_ids, project_id, workspace_id):
+    """Students that already have a pending request from this agency for the same project/workspace"""
+    rows = db.session.query(JoinRequest.to_student_id).filter(
+        JoinRequest.to_student_id.in_(student_ids),
+        JoinRequest.status == 'pending',
+        JoinRequest.from_agency_id == agency_id,
+        JoinRequest.project_id == project_id,
+        JoinRequest.workspace_id == workspace_id
+    )
+    return {row.to_student_id for row in rows}
+
 @api.route('/api/requests', methods=['POST'])
 @jwt_required()
+@external_required('Only external agencies or admin can send requests')
 def create_request():
     try:
-        user_id = get_jwt_identity()
-        me = User.query.get(user_id)
-        if me.role != 'external' and me.role != 'admin':
-            return jsonify({'error': 'Only external agencies or admin can send requests'}), 403
+        me = current_user
         data = request.get_json()
+        if _pending_request_student_ids(me.id, [data['to_student_id']], data.get('project_id'), data.get('workspace_id')):
+            return jsonify({'error': 'A pending request already exists for this student'}), 409
         req = JoinRequest(
-            from_agency_id=user_id,
+            from_agency_id=me.id,
             to_student_id=data['to_student_id'],
             project_id=data.get('project_id'),
             workspace_id=data.get('workspace_id'),
             message=data.get('message', '')
         )
         db.session.add(req)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent call created the same pending request after our check
+            db.session.rollback()
+            return jsonify({'error': 'A pending request already exists for this student'}), 409
         return jsonify({'message': 'Request sent', 'id': req.id}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/requests/bulk', methods=['POST'])
+@jwt_required()
+@external_required('Only external agencies or admin can send requests')
+def create_requests_bulk():
+    try:
+        me = current_user
+        data = request.get_json() or {}
+        try:
+            student_ids = list(dict.fromkeys(int(sid) for sid in data.get('student_ids') or []))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'student_ids must be a list of integers'}), 400
+        if not student_ids:
+            return jsonify({'error': 'No students selected'}), 400
+        if len(student_ids) > MAX_BULK_REQUESTS:
+            return jsonify({'error': f'At most {MAX_BULK_REQUESTS} students per call'}), 400
+        project_id = data.get('project_id')
+        workspace_id = data.get('workspace_id')
+
+        valid_ids = {row.id for row in db.session.query(User.id).filter(User.id.in_(student_ids), User.role == 'student')}
+        while True:
+            pending_ids = _pending_request_student_ids(me.id, valid_ids, project_id, workspace_id) if valid_ids else set()
+            to_create = [sid for sid in student_ids if sid in valid_ids and sid not in pending_ids]
+            if not to_create:
+                break
+            now = datetime.utcnow()
+            try:
+                db.session.execute(JoinRequest.__table__.insert(), [{
+                    'from_agency_id': me.id,
+                    'to_student_id': sid,
+                    'project_id': project_id,
+                    'workspace_id': workspace_id,
+                    'message': data.get('message', ''),
+                    'status': 'pending',
+                    'pending_key': pending_request_key(me.id, sid, project_id, workspace_id),
+                    'created_at': now
+                } for sid in to_create])
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                # A concurrent batch created some of these first; re-read and insert the rest
+                if not _pending_request_student_ids(me.id, to_create, project_id, workspace_id):
+                    raise
+
+        return jsonify({
+            'message': f'Sent {len(to_create)} requests',
+            'created': to_create,
+            'skipped_pending': [sid for sid in student_ids if sid in pending_ids],
+            'invalid': [sid for sid in student_ids if sid not in valid_ids]
+        }), 201 if to_create else 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/api/requests', methods=['GET'])
 @jwt_required()
 def list_requests():
     try:
-        user_id = get_jwt_identity()
-        me = User.query.get(user_id)
+        me = current_user
+        # Callers see their own requests; admins may pass scope=all
         if me.role == 'student':
-            rs = JoinRequest.query.filter_by(to_student_id=user_id).all()
-        elif me.role in ['external', 'admin']:
-            # External/Admin see all join requests
-            rs = JoinRequest.query.order_by(JoinRequest.created_at.desc()).all()
+            q = JoinRequest.query.filter_by(to_student_id=me.id)
+        elif me.role == 'admin' and request.args.get('scope') == 'all':
+            q = JoinRequest.query
         else:
-            rs = []
+            q = JoinRequest.query.filter_by(from_agency_id=me.id)
+        status = request.args.get('status')
+        if status:
+            if status not in ['pending', 'accepted', 'rejected']:
+                return jsonify({'error': 'Invalid status'}), 400
+            q = q.filter_by(status=status)
+        project_id = request.args.get('project_id', type=int)
+        if project_id:
+            q = q.filter_by(project_id=project_id)
+        workspace_id = request.args.get('workspace_id', type=int)
+        if workspace_id:
+            q = q.filter_by(workspace_id=workspace_id)
+        try:
+            rs, next_cursor = keyset_page(q, JoinRequest.created_at, JoinRequest.id,
+                                          cursor=request.args.get('cursor'),
+                                          limit=page_size(request.args.get('limit', type=int)))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         def serialize(r):
             return {
                 'id': r.id,
@@ -434,7 +1010,7 @@ def list_requests():
                 'status': r.status,
                 'created_at': r.created_at.isoformat()
             }
-        return jsonify([serialize(r) for r in rs]), 200
+        return paginated_response([serialize(r) for r in rs], next_cursor), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -469,12 +1045,10 @@ def respond_request(req_id):
 # Projects and review
 @api.route('/api/projects', methods=['POST'])
 @jwt_required()
+@external_required('Only external agency or admin can create projects')
 def create_project():
     try:
-        uid = get_jwt_identity()
-        me = User.query.get(uid)
-        if me.role not in ['external', 'admin']:
-            return jsonify({'error': 'Only external agency or admin can create projects'}), 403
+        uid = current_user.id
         data = request.get_json()
         ws_id = data.get('workspace_id')
         if not ws_id:
@@ -490,22 +1064,53 @@ def create_project():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+PROJECT_STATUSES = ['open', 'in_progress', 'submitted', 'reviewed', 'rework', 'rejected', 'completed']
+
 @api.route('/api/projects', methods=['GET'])
 @jwt_required()
 def list_projects():
     try:
-        uid = get_jwt_identity()
-        me = User.query.get(uid)
-        projects = []
-        if me.role in ['external', 'admin']:
-            # External/Admin see all projects
-            projects = Project.query.order_by(Project.created_at.desc()).all()
-        elif me.role == 'student':
+        me = current_user
+        if me.role not in ['external', 'admin', 'student']:
+            return jsonify([]), 200
+
+        # Per-project rollups are correlated subqueries, so they are only
+        # evaluated for the rows on the requested page.
+        latest_sub = aliased(ProjectSubmission)
+        latest_sub_id = (select(func.max(ProjectSubmission.id))
+                         .where(ProjectSubmission.project_id == Project.id)
+                         .correlate(Project).scalar_subquery())
+        submission_count = (select(func.count(ProjectSubmission.id))
+                            .where(ProjectSubmission.project_id == Project.id)
+                            .correlate(Project).scalar_subquery())
+        latest_review_status = (select(ProjectReview.status)
+                                .where(ProjectReview.submission_id == latest_sub.id)
+                                .order_by(ProjectReview.id.desc()).limit(1)
+                                .correlate(latest_sub).scalar_subquery())
+        q = (db.session.query(Project, latest_sub,
+                              submission_count.label('submission_count'),
+                              latest_review_status.label('latest_review_status'))
+             .outerjoin(latest_sub, latest_sub.id == latest_sub_id))
+
+        if me.role == 'student':
             # Projects linked to workspaces where the student is a member
-            ws_ids = [m.workspace_id for m in Membership.query.filter_by(user_id=uid).all()]
-            if ws_ids:
-                projects = Project.query.filter(Project.workspace_id.in_(ws_ids)).order_by(Project.created_at.desc()).all()
-        def ser(p):
+            member_ws = select(Membership.workspace_id).where(Membership.user_id == me.id)
+            q = q.filter(Project.workspace_id.in_(member_ws))
+        status = request.args.get('status')
+        if status:
+            statuses = status.split(',')
+            if any(st not in PROJECT_STATUSES for st in statuses):
+                return jsonify({'error': 'Invalid status'}), 400
+            q = q.filter(Project.status.in_(statuses))
+        try:
+            rows, next_cursor = keyset_page(q, Project.created_at, Project.id,
+                                            cursor=request.args.get('cursor'),
+                                            limit=page_size(request.args.get('limit', type=int)),
+                                            row_key=lambda row: (row.Project.created_at, row.Project.id))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        def ser(row):
+            p, sub = row.Project, row[1]
             return {
                 'id': p.id,
                 'title': p.title,
@@ -513,20 +1118,26 @@ def list_projects():
                 'created_by': p.created_by,
                 'workspace_id': p.workspace_id,
                 'status': p.status,
-                'created_at': p.created_at.isoformat()
+                'created_at': p.created_at.isoformat(),
+                'submission_count': row.submission_count,
+                'latest_submission': {
+                    'id': sub.id,
+                    'student_id': sub.student_id,
+                    'content_url': sub.content_url,
+                    'created_at': sub.created_at.isoformat()
+                } if sub else None,
+                'latest_review_status': row.latest_review_status
             }
-        return jsonify([ser(p) for p in projects]), 200
+        return paginated_response([ser(row) for row in rows], next_cursor), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/api/projects/<int:project_id>/submit', methods=['POST'])
 @jwt_required()
+@student_required('Only students can submit')
 def submit_project(project_id):
     try:
-        uid = get_jwt_identity()
-        me = User.query.get(uid)
-        if me.role != 'student':
-            return jsonify({'error': 'Only students can submit'}), 403
+        uid = current_user.id
         data = request.get_json()
         sub = ProjectSubmission(project_id=project_id, student_id=uid, content_url=data.get('content_url'), notes=data.get('notes',''))
         db.session.add(sub)
@@ -540,12 +1151,10 @@ def submit_project(project_id):
 
 @api.route('/api/submissions/<int:submission_id>/review', methods=['POST'])
 @jwt_required()
+@external_required('Only external agency or admin can review')
 def review_submission(submission_id):
     try:
-        uid = get_jwt_identity()
-        me = User.query.get(uid)
-        if me.role not in ['external', 'admin']:
-            return jsonify({'error': 'Only external agency or admin can review'}), 403
+        uid = current_user.id
         data = request.get_json()
         status = data.get('status', 'approved')  # approved | rework | rejected
         if status not in ['approved', 'rework', 'rejected']:
@@ -563,17 +1172,49 @@ def review_submission(submission_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/review-queue', methods=['GET'])
+@jwt_required()
+@external_required('Only external agency or admin can review')
+def review_queue():
+    try:
+        me = current_user
+        # Submissions with no review yet, oldest first
+        reviewed = select(ProjectReview.id).where(ProjectReview.submission_id == ProjectSubmission.id)
+        q = (db.session.query(ProjectSubmission, Project.title, User.first_name, User.last_name)
+             .join(Project, Project.id == ProjectSubmission.project_id)
+             .join(User, User.id == ProjectSubmission.student_id)
+             .filter(~reviewed.exists()))
+        if not (me.role == 'admin' and request.args.get('scope') == 'all'):
+            q = q.filter(Project.created_by == me.id)
+        project_id = request.args.get('project_id', type=int)
+        if project_id:
+            q = q.filter(ProjectSubmission.project_id == project_id)
+        try:
+            rows, next_cursor = keyset_page(q, ProjectSubmission.created_at, ProjectSubmission.id,
+                                            cursor=request.args.get('cursor'),
+                                            limit=page_size(request.args.get('limit', type=int)),
+                                            descending=False,
+                                            row_key=lambda row: (row.ProjectSubmission.created_at, row.ProjectSubmission.id))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return paginated_response([{
+            'id': row.ProjectSubmission.id,
+            'project': {'id': row.ProjectSubmission.project_id, 'title': row.title},
+            'student': {'id': row.ProjectSubmission.student_id, 'name': f"{row.first_name} {row.last_name}"},
+            'content_url': row.ProjectSubmission.content_url,
+            'notes': row.ProjectSubmission.notes,
+            'created_at': row.ProjectSubmission.created_at.isoformat()
+        } for row in rows], next_cursor), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Student selection and workspace invitation
 @api.route('/api/workspaces/<int:workspace_id>/invite-students', methods=['POST'])
 @jwt_required()
+@external_required()
 def invite_students_to_workspace(workspace_id):
     try:
-        user_id = get_jwt_identity()
-        current_user = User.query.get(user_id)
-        
-        # Only external agencies and admins can invite students
-        if current_user.role not in ['external', 'admin']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
+        user_id = current_user.id
         
         data = request.get_json()
         student_ids = data.get('student_ids', [])
@@ -591,33 +1232,38 @@ def invite_students_to_workspace(workspace_id):
         if not membership or membership.role not in ['owner', 'admin']:
             return jsonify({'error': 'Insufficient permissions for this workspace'}), 403
         
+        try:
+            student_ids = list(dict.fromkeys(int(sid) for sid in student_ids))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'student_ids must be a list of integers'}), 400
+        
+        inviter_id = current_user.id
+        workspace_name = workspace.name
+        total = len(student_ids)
+        
+        # Large cohorts can stream one NDJSON progress line per chunk
+        if request.args.get('stream') == '1':
+            def generate():
+                invited_count = 0
+                processed = 0
+                try:
+                    for chunk, invited in _invite_student_chunks(workspace_id, inviter_id, student_ids, workspace_name):
+                        processed += len(chunk)
+                        invited_count += len(invited)
+                        yield json.dumps({'processed': processed, 'total': total, 'invited_students': invited}) + '\n'
+                except Exception as e:
+                    # The 201 is already sent; earlier chunks are committed, so say where it stopped
+                    db.session.rollback()
+                    yield json.dumps({'error': str(e), 'processed': processed, 'total': total}) + '\n'
+                    return
+                yield json.dumps({'done': True, 'message': f'Invited {invited_count} students'}) + '\n'
+            return Response(stream_with_context(generate()), status=201, mimetype='application/x-ndjson')
+        
+        # Without progress lines to say how far it got, all chunks commit together or not at all
         invited_students = []
-        for student_id in student_ids:
-            # Check if student exists and is actually a student
-            student = User.query.get(student_id)
-            if not student or student.role != 'student':
-                continue
-            
-            # Check if already invited or member
-            existing = Membership.query.filter_by(user_id=student_id, workspace_id=workspace_id).first()
-            if existing:
-                continue
-            
-            # Create invitation
-            invitation = Membership(
-                user_id=student_id,
-                workspace_id=workspace_id,
-                role='member',
-                status='invited',
-                invited_by=user_id
-            )
-            db.session.add(invitation)
-            invited_students.append({
-                'id': student.id,
-                'name': f"{student.first_name} {student.last_name}",
-                'email': student.email
-            })
-        
+        for _, invited in _invite_student_chunks(workspace_id, inviter_id, student_ids, workspace_name,
+                                                 commit=False):
+            invited_students.extend(invited)
         db.session.commit()
         
         return jsonify({
@@ -629,12 +1275,58 @@ def invite_students_to_workspace(workspace_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Student ids resolved per round trip when inviting a cohort
+INVITE_CHUNK_SIZE = 500
+
+def _invitation_email(student, workspace_name):
+    body = f"""
+    Hi {student['name']},
+    
+    You have been invited to join the workspace "{workspace_name}" on Global Collaboration Hub.
+    
+    Sign in to accept or decline: {current_app.config['FRONTEND_URL']}/workspace-invitations.html
+    """
+    return student['email'], f"Invitation to {workspace_name}", body
+
+def _invite_student_chunks(workspace_id, inviter_id, student_ids, workspace_name=None, commit=True):
+    """Invite students chunk by chunk, yielding (chunk, invited_students).
+
+    Each chunk costs two set queries (students, existing memberships) and
+    one batched INSERT. With commit=True each chunk is committed on its own
+    so very large cohorts never hold a long write transaction; otherwise
+    the caller commits once at the end.
+    """
+    for start in range(0, len(student_ids), INVITE_CHUNK_SIZE):
+        chunk = student_ids[start:start + INVITE_CHUNK_SIZE]
+        students = User.query.filter(User.id.in_(chunk), User.role == 'student').all()
+        existing = {row.user_id for row in db.session.query(Membership.user_id).filter(
+            Membership.workspace_id == workspace_id, Membership.user_id.in_(chunk))}
+        invited = [{
+            'id': s.id,
+            'name': f"{s.first_name} {s.last_name}",
+            'email': s.email
+        } for s in students if s.id not in existing]
+        if invited:
+            now = datetime.utcnow()
+            db.session.execute(Membership.__table__.insert(), [{
+                'user_id': s['id'],
+                'workspace_id': workspace_id,
+                'role': 'member',
+                'status': 'invited',
+                'invited_by': inviter_id,
+                'invited_at': now
+            } for s in invited])
+            if workspace_name and current_app.config.get('MAIL_SEND_INVITATIONS'):
+                enqueue_emails([_invitation_email(s, workspace_name) for s in invited])
+            if commit:
+                db.session.commit()
+        yield chunk, invited
+
 @api.route('/api/workspaces/<int:workspace_id>/invitations', methods=['GET'])
 @jwt_required()
 def get_workspace_invitations(workspace_id):
     try:
         user_id = get_jwt_identity()
-        current_user = User.query.get(user_id)
         
         # Check if user is accepted member of workspace
         membership = Membership.query.filter_by(user_id=user_id, workspace_id=workspace_id, status='accepted').first()
@@ -647,7 +1339,7 @@ def get_workspace_invitations(workspace_id):
         invitation_list = []
         for invitation in invitations:
             student = User.query.get(invitation.user_id)
-            inviter = User.query.get(invitation.invited_by)
+            inviter = User.query.get(invitation.invited_by) if invitation.invited_by else None
             invitation_list.append({
                 'id': invitation.id,
                 'student': {
@@ -658,7 +1350,7 @@ def get_workspace_invitations(workspace_id):
                 'invited_by': {
                     'id': inviter.id,
                     'name': f"{inviter.first_name} {inviter.last_name}"
-                },
+                } if inviter else None,
                 'invited_at': invitation.invited_at.isoformat()
             })
         
@@ -680,7 +1372,7 @@ def get_my_invitations():
         invitation_list = []
         for invitation in invitations:
             workspace = Workspace.query.get(invitation.workspace_id)
-            inviter = User.query.get(invitation.invited_by)
+            inviter = User.query.get(invitation.invited_by) if invitation.invited_by else None
             invitation_list.append({
                 'id': invitation.id,
                 'workspace': {
@@ -691,7 +1383,7 @@ def get_my_invitations():
                 'invited_by': {
                     'id': inviter.id,
                     'name': f"{inviter.first_name} {inviter.last_name}"
-                },
+                } if inviter else None,
                 'invited_at': invitation.invited_at.isoformat()
             })
         
@@ -843,3 +1535,33 @@ def add_workspace_member(workspace_id):
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# Query counts and timings of recent requests (QUERY_STATS_ENABLED)
+@api.route('/api/debug/queries', methods=['GET'])
+@debug_required
+def debug_queries():
+    if not current_app.config.get('QUERY_STATS_ENABLED'):
+        return jsonify({'error': 'Query stats are disabled'}), 404
+    if request.args.get('reset') == '1':
+        query_log.clear()
+        return jsonify({'recent': [], 'endpoints': {}}), 200
+    return jsonify(query_log.snapshot()), 200
+
+
+# On-demand and continuous profiles (PROFILER_ENABLED), as collapsed stacks for flamegraph tools
+@api.route('/api/debug/profiles', methods=['GET'])
+@debug_required
+def list_profiles():
+    store = current_app.extensions.get('profile_store')
+    if store is None:
+        return jsonify({'error': 'Profiler is disabled'}), 404
+    return jsonify(store.list()), 200
+
+@api.route('/api/debug/profiles/<name>', methods=['GET'])
+@debug_required
+def get_profile_file(name):
+    store = current_app.extensions.get('profile_store')
+    path = store.path(name) if store is not None else None
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
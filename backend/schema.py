@@ -0,0 +1,88 @@
+import os
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from database import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Head of migrations/versions; bump it together with every new migration
+SCHEMA_REVISION = '0005_pending_request_key'
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+def current_revision():
+    """Revision stamped in alembic_version, or None for an unmigrated database"""
+    try:
+        return db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return None
+
+# flask CLI commands that must work on a database whose schema is behind
+SCHEMA_COMMANDS = ('db', 'shards')
+
+def check_schema(app):
+    """Compare the database stamp with SCHEMA_REVISION (one query, no DDL)"""
+    if app.config.get('SCHEMA_CHECK', 'strict') == 'off':
+        return
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None and isinstance(ctx.command, click.Group):
+        # The flask CLI is loading the app to look up one of app.cli's commands;
+        # check once the name is known, so `flask db upgrade` can fix the schema
+        lookup = app.cli.get_command
+
+        def get_command(ctx, name):
+            if name not in SCHEMA_COMMANDS:
+                _compare_revision(app)
+            return lookup(ctx, name)
+
+        app.cli.get_command = get_command
+        return
+    # Everything else, `flask run` included, gets the check straight away
+    _compare_revision(app)
+
+def _compare_revision(app):
+    mode = app.config.get('SCHEMA_CHECK', 'strict')
+    with app.app_context():
+        revision = current_revision()
+    if revision == SCHEMA_REVISION:
+        return
+    message = (f"Database schema is at {revision or 'no revision'}, expected {SCHEMA_REVISION}; "
+               f"run `flask --app app db upgrade` in backend/")
+    if mode == 'strict':
+        raise SchemaOutOfDate(message)
+    app.logger.warning(message)
+
+class MigrateGroup(click.Group):
+    """`flask db` that only imports Flask-Migrate/Alembic when a db command runs"""
+
+    def _commands(self):
+        from flask import current_app
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_group
+        if 'migrate' not in current_app.extensions:
+            Migrate(current_app, db, directory=MIGRATIONS_DIR,
+                    render_as_batch=current_app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'))
+        return db_group
+
+    @with_appcontext
+    def list_commands(self, ctx):
+        return self._commands().list_commands(ctx)
+
+    @with_appcontext
+    def get_command(self, ctx, name):
+        return self._commands().get_command(ctx, name)
+
+migrate_cli = MigrateGroup('db', help='Apply and manage database migrations.')
+
+def upgrade(app, revision='head'):
+    """Apply migrations programmatically (setup scripts and tests)"""
+    from flask_migrate import Migrate, upgrade as alembic_upgrade
+    with app.app_context():
+        if 'migrate' not in app.extensions:
+            Migrate(app, db, directory=MIGRATIONS_DIR,
+                    render_as_batch=app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'))
+        alembic_upgrade(directory=MIGRATIONS_DIR, revision=revision)
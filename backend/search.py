@@ -0,0 +1,117 @@
+import math
+import re
+from sqlalchemy import event, func, inspect, select
+from database import db, stream_rows, User, UserTrigram
+
+# Fields indexed for fuzzy user lookup
+SEARCH_FIELDS = ('first_name', 'last_name', 'username', 'email')
+
+# Minimum trigram similarity (0..1) for a user to be returned
+SIMILARITY_THRESHOLD = 0.3
+
+# Letters and digits in any script; underscores separate words like other punctuation
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+def trigrams(text):
+    """Return the set of padded trigrams for text.
+
+    Like pg_trgm, but words get one leading space instead of two: the
+    '  x' gram only says which letter a word starts with (' xy' already
+    does), and it is shared by so many users that it dominated the cost
+    of every search.
+    """
+    grams = set()
+    for word in _WORD_RE.findall((text or '').casefold()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+def field_text(user, field):
+    """Indexed text of one field. Only the local part of an email is used: a domain's
+    trigrams are shared by every user on it, so they match many users and tell none apart"""
+    value = getattr(user, field) or ''
+    return value.rsplit('@', 1)[0] if field == 'email' else value
+
+def user_trigrams(user):
+    grams = set()
+    for field in SEARCH_FIELDS:
+        grams |= trigrams(field_text(user, field))
+    return grams
+
+def similarity(query_grams, text):
+    grams = trigrams(text)
+    if not query_grams or not grams:
+        return 0.0
+    shared = len(query_grams & grams)
+    return shared / (len(query_grams) + len(grams) - shared)
+
+def score_user(query_grams, user):
+    """Best similarity of the query against any indexed field or the full name"""
+    candidates = [field_text(user, field) for field in SEARCH_FIELDS]
+    candidates.append(f"{user.first_name} {user.last_name}")
+    return max(similarity(query_grams, text) for text in candidates)
+
+def _write_trigrams(connection, user_id, grams):
+    table = UserTrigram.__table__
+    connection.execute(table.delete().where(table.c.user_id == user_id))
+    if grams:
+        connection.execute(table.insert(), [{'trigram': g, 'user_id': user_id} for g in grams])
+
+@event.listens_for(User, 'after_insert')
+def _index_new_user(mapper, connection, target):
+    _write_trigrams(connection, target.id, user_trigrams(target))
+
+@event.listens_for(User, 'after_update')
+def _reindex_user(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS):
+        _write_trigrams(connection, target.id, user_trigrams(target))
+
+def rebuild_user_trigrams():
+    """Rebuild the trigram index for all users (used to backfill existing databases)"""
+    table = UserTrigram.__table__
+    db.session.execute(table.delete())
+    rows = []
+    columns = [User.id] + [getattr(User, field) for field in SEARCH_FIELDS]
+    for user in stream_rows(select(*columns)):
+        rows.extend({'trigram': g, 'user_id': user.id} for g in user_trigrams(user))
+        if len(rows) >= 5000:
+            db.session.execute(table.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+def search_users(query, limit=10, role=None, threshold=SIMILARITY_THRESHOLD):
+    """Return up to limit (user, score) pairs ranked by trigram similarity to query"""
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+
+    # Users below the threshold cannot share fewer than threshold * |query| trigrams,
+    # so prune them in the index scan before loading any user rows.
+    # Inactive users and other roles are filtered here, before the LIMIT, so they
+    # cannot crowd matching users out of the candidate list. The join runs once per
+    # grouped user rather than once per matching trigram row.
+    min_hits = max(1, math.ceil(len(query_grams) * threshold))
+    hits = func.count(UserTrigram.trigram).label('hits')
+    grouped = (select(UserTrigram.user_id, hits)
+               .where(UserTrigram.trigram.in_(query_grams))
+               .group_by(UserTrigram.user_id)
+               .having(hits >= min_hits)
+               .subquery())
+    candidates = (db.session.query(grouped.c.user_id)
+                  .join(User, User.id == grouped.c.user_id)
+                  .filter(User.is_active.isnot(False)))
+    if role:
+        candidates = candidates.filter(User.role == role)
+    candidate_ids = [row.user_id for row in candidates.order_by(grouped.c.hits.desc()).limit(limit * 5)]
+    if not candidate_ids:
+        return []
+
+    users = User.query.filter(User.id.in_(candidate_ids))
+    ranked = [(u, score_user(query_grams, u)) for u in users]
+    ranked = [pair for pair in ranked if pair[1] >= threshold]
+    ranked.sort(key=lambda pair: (-pair[1], pair[0].id))
+    return ranked[:limit]
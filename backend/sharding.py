@@ -0,0 +1,251 @@
+import threading
+import time
+from contextlib import contextmanager
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, update
+from sqlalchemy.schema import CreateIndex, CreateTable
+from werkzeug.local import LocalProxy
+
+# Workspace-scoped tables that live on the workspace's shard; everything else is global
+SHARDED_TABLES = ('messages', 'files', 'tasks')
+# Workspaces without a workspace_shards row (e.g. created before sharding) stay here
+DEFAULT_SHARD = 'default'
+
+_UNSET = object()
+
+class ShardingError(RuntimeError):
+    pass
+
+class WorkspaceMoving(RuntimeError):
+    """Raised for writes to a workspace while `flask shards move` copies it"""
+
+def shard_binds(shards):
+    """SQLALCHEMY_BINDS entries for DATABASE_SHARDS"""
+    if DEFAULT_SHARD in shards:
+        raise ValueError(f"'{DEFAULT_SHARD}' is the global database and cannot be a shard name")
+    return {bind_key(name): url for name, url in shards.items()}
+
+def bind_key(shard):
+    return None if shard == DEFAULT_SHARD else f'shard_{shard}'
+
+def sharding_enabled():
+    return bool(current_app.config.get('DATABASE_SHARDS'))
+
+def current_bind_key():
+    """Bind key set by workspace_shard(), or _UNSET outside one"""
+    return g.get('_db_shard', _UNSET)
+
+def is_unset(key):
+    return key is _UNSET
+
+class ShardMap:
+    """workspace id -> (shard, state) from the global workspace_shards table.
+
+    Entries are cached for SHARD_MAP_TTL seconds; `flask shards move` waits
+    that long after each change so every worker has seen it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def lookup(self, workspace_id):
+        entry = self._entries.get(workspace_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        from database import db, WorkspaceShard
+        row = db.session.execute(select(WorkspaceShard.shard, WorkspaceShard.state)
+                                 .where(WorkspaceShard.workspace_id == workspace_id)).first()
+        value = (row.shard, row.state) if row else (DEFAULT_SHARD, 'active')
+        with self._lock:
+            if len(self._entries) > 100000:
+                self._entries.clear()
+            self._entries[workspace_id] = (time.monotonic() + current_app.config.get('SHARD_MAP_TTL', 5), value)
+        return value
+
+    def assign(self, workspace_id):
+        """Place a new workspace on a shard; call before committing the workspace"""
+        from database import db, WorkspaceShard
+        names = sorted(current_app.config['DATABASE_SHARDS'])
+        shard = names[workspace_id % len(names)]
+        db.session.add(WorkspaceShard(workspace_id=workspace_id, shard=shard, state='active'))
+        return shard
+
+    def invalidate(self, workspace_id=None):
+        with self._lock:
+            if workspace_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(workspace_id, None)
+
+# One map per app instance; see create_app()
+shard_map = LocalProxy(lambda: current_app.extensions['shard_map'])
+
+@contextmanager
+def workspace_shard(workspace_id, write=False):
+    """Route messages/files/tasks statements in the block to the workspace's shard"""
+    if not sharding_enabled():
+        yield
+        return
+    shard, state = shard_map.lookup(workspace_id)
+    if write and state == 'moving':
+        raise WorkspaceMoving('Workspace is being moved to another database, try again shortly')
+    previous = g.get('_db_shard', _UNSET)
+    g._db_shard = bind_key(shard)
+    try:
+        yield
+    finally:
+        if previous is _UNSET:
+            g.pop('_db_shard', None)
+        else:
+            g._db_shard = previous
+
+def ensure_writable(workspace_id):
+    with workspace_shard(workspace_id, write=True):
+        pass
+
+def find_by_id(model, object_id):
+    """Load a sharded row by primary key without knowing its workspace (asks each shard)"""
+    from database import db
+    if not sharding_enabled():
+        return db.session.get(model, object_id)
+    previous = g.get('_db_shard', _UNSET)
+    try:
+        for shard in [DEFAULT_SHARD] + sorted(current_app.config['DATABASE_SHARDS']):
+            g._db_shard = bind_key(shard)
+            obj = db.session.get(model, object_id)
+            if obj is not None:
+                return obj
+        return None
+    finally:
+        if previous is _UNSET:
+            g.pop('_db_shard', None)
+        else:
+            g._db_shard = previous
+
+class IdAllocator:
+    """Hands out ids for sharded rows in blocks reserved from the global id_allocations table.
+
+    Ids stay unique across shards (so by-id routes can find a row anywhere)
+    and a row keeps its id when its workspace moves. One global write per
+    SHARD_ID_BLOCK inserts per worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}
+
+    def next_id(self, table_name):
+        with self._lock:
+            start, end = self._blocks.get(table_name, (0, 0))
+            if start >= end:
+                start, end = self._reserve(table_name)
+            self._blocks[table_name] = (start + 1, end)
+            return start
+
+    def _reserve(self, table_name):
+        from database import db, IdAllocation
+        size = current_app.config.get('SHARD_ID_BLOCK', 1000)
+        table = db.metadata.tables[table_name]
+        with db.engines[None].begin() as conn:
+            # Ids written before sharding was enabled live in the global table
+            floor = conn.execute(select(func.coalesce(func.max(table.c.id), 0) + 1)).scalar()
+            conn.execute(update(IdAllocation).where(IdAllocation.name == table_name)
+                         .values(next_id=IdAllocation.next_id + size))
+            end = conn.execute(select(IdAllocation.next_id).where(IdAllocation.name == table_name)).scalar()
+            start = end - size
+            if start < floor:
+                start, end = floor, floor + size
+                conn.execute(update(IdAllocation).where(IdAllocation.name == table_name).values(next_id=end))
+        return start, end
+
+# One allocator per app instance; see create_app()
+id_allocator = LocalProxy(lambda: current_app.extensions['id_allocator'])
+
+def assign_id(mapper, connection, target):
+    """before_insert hook for sharded models"""
+    if target.id is None and sharding_enabled():
+        target.id = id_allocator.next_id(mapper.local_table.name)
+
+def _shard_engine(db, shard):
+    return db.engines[bind_key(shard)]
+
+def _sharded_tables(db):
+    return [db.metadata.tables[name] for name in SHARDED_TABLES]
+
+shards_cli = click.Group('shards', help='Create shard databases and move workspaces between them.')
+
+@shards_cli.command('init')
+@with_appcontext
+def init_shards():
+    """Create the sharded tables in every shard database"""
+    from database import db
+    for shard in sorted(current_app.config.get('DATABASE_SHARDS') or {}):
+        engine = _shard_engine(db, shard)
+        with engine.begin() as conn:
+            for table in _sharded_tables(db):
+                if engine.dialect.has_table(conn, table.name):
+                    continue
+                # users and workspaces live in the global database, so no foreign keys here
+                conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index))
+        click.echo(f"{shard}: ok")
+
+@shards_cli.command('move')
+@click.argument('workspace_id', type=int)
+@click.argument('target')
+@click.option('--grace', default=5.0, help='Extra seconds to wait for in-flight writes.')
+@with_appcontext
+def move_workspace(workspace_id, target, grace):
+    """Move a workspace's messages, files and tasks to TARGET shard"""
+    from database import db, WorkspaceShard
+    shards = [DEFAULT_SHARD] + sorted(current_app.config.get('DATABASE_SHARDS') or {})
+    if target not in shards:
+        raise click.BadParameter(f"unknown shard {target!r}; expected one of {', '.join(shards)}")
+    shard_map.invalidate(workspace_id)
+    source, _ = shard_map.lookup(workspace_id)
+    if source == target:
+        click.echo(f"workspace {workspace_id} is already on {target}")
+        return
+    settle = current_app.config.get('SHARD_MAP_TTL', 5) + grace
+
+    _set_placement(db, WorkspaceShard, workspace_id, source, 'moving')
+    click.echo(f"workspace {workspace_id}: writes paused, waiting {settle:.0f}s for workers to notice")
+    time.sleep(settle)
+
+    src, dst = _shard_engine(db, source), _shard_engine(db, target)
+    with dst.begin() as dconn:
+        for table in _sharded_tables(db):
+            where = table.c.workspace_id == workspace_id
+            # Leftovers of an interrupted earlier move
+            dconn.execute(table.delete().where(where))
+            copied = 0
+            with src.connect() as sconn:
+                result = sconn.execution_options(stream_results=True).execute(select(table).where(where))
+                for rows in result.partitions(1000):
+                    dconn.execute(table.insert(), [dict(row._mapping) for row in rows])
+                    copied += len(rows)
+                expected = sconn.execute(select(func.count()).select_from(table).where(where)).scalar()
+            if copied != expected:
+                raise click.ClickException(f"{table.name}: copied {copied} rows, source has {expected}")
+            click.echo(f"  {table.name}: {copied} rows copied")
+
+    _set_placement(db, WorkspaceShard, workspace_id, target, 'active')
+    click.echo(f"workspace {workspace_id}: now on {target}, waiting {settle:.0f}s before cleaning up {source}")
+    time.sleep(settle)
+    with src.begin() as sconn:
+        for table in _sharded_tables(db):
+            sconn.execute(table.delete().where(table.c.workspace_id == workspace_id))
+    click.echo(f"workspace {workspace_id}: moved {source} -> {target}")
+
+def _set_placement(db, WorkspaceShard, workspace_id, shard, state):
+    row = db.session.get(WorkspaceShard, workspace_id)
+    if row is None:
+        db.session.add(WorkspaceShard(workspace_id=workspace_id, shard=shard, state=state))
+    else:
+        row.shard, row.state = shard, state
+    db.session.commit()
+    shard_map.invalidate(workspace_id)
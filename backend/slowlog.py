@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+
+# "IN (?, ?, ?)" with any number of placeholders is one statement
+_IN_LIST_RE = re.compile(r'\((?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))+\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+def normalize(statement):
+    """Statement text used to group repeats of one query"""
+    return _IN_LIST_RE.sub('(...)', _WHITESPACE_RE.sub(' ', statement).strip())
+
+def parameter_shape(parameters, executemany=False):
+    """Types of the bound parameters, never their values"""
+    if executemany:
+        rows = list(parameters)
+        return {'rows': len(rows), 'row': parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _type_name(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_type_name(value) for value in parameters]
+    return _type_name(parameters)
+
+def _type_name(value):
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}[{len(value)}]'
+    return type(value).__name__
+
+def origin():
+    """Route or Socket.IO event that issued the statement, else the thread name"""
+    if has_request_context():
+        event_info = getattr(request, 'event', None)
+        if event_info is not None:
+            return f"socket {event_info['message']}"
+        return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    return f"thread {threading.current_thread().name}"
+
+def explain(dbapi_connection, dialect, statement, parameters):
+    """Query plan rows for statement, as strings"""
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [' | '.join('' if col is None else str(col) for col in row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_MS, written as JSON lines to a rotating file.
+
+    The first sighting of a statement in each SLOW_QUERY_WINDOW seconds is
+    written in full with its EXPLAIN output; repeats in the window are only
+    counted, and a summary line per repeated statement is written when the
+    window closes. The log grows with distinct slow statements, not with
+    traffic.
+    """
+
+    max_statements = 1000
+
+    def __init__(self, path, threshold_ms, window=60, max_bytes=10 * 1024 * 1024, backups=5):
+        self.threshold = threshold_ms / 1000
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._window_start = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8',
+                                            delay=True)
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def _write(self, record):
+        self._handler.handle(logging.makeLogRecord({'msg': json.dumps(record, default=str)}))
+
+    def record(self, conn, statement, parameters, elapsed, context, executemany):
+        key = normalize(statement)
+        route = origin()
+        with self._lock:
+            self._roll_window()
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry['count'] += 1
+                entry['total_ms'] += elapsed * 1000
+                entry['max_ms'] = max(entry['max_ms'], elapsed * 1000)
+                entry['routes'][route] = entry['routes'].get(route, 0) + 1
+                return
+            if len(self._pending) >= self.max_statements:
+                self._flush()
+            self._pending[key] = {'count': 1, 'total_ms': elapsed * 1000, 'max_ms': elapsed * 1000,
+                                  'routes': {route: 1}}
+        self._write({
+            'event': 'slow_query',
+            'at': time.time(),
+            'ms': round(elapsed * 1000, 3),
+            'route': route,
+            'bind': conn.engine.url.render_as_string(hide_password=True),
+            'sql': key,
+            'parameters': parameter_shape(parameters, executemany),
+            'plan': self._plan(conn, statement, parameters, context, executemany),
+        })
+
+    def _plan(self, conn, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        if context is not None and context.execution_options.get('stream_results'):
+            # The connection is still busy with the streamed result
+            return None
+        try:
+            return explain(conn.connection.dbapi_connection, conn.dialect.name, statement, parameters)
+        except Exception as e:
+            return [f'EXPLAIN failed: {e}']
+
+    def _roll_window(self):
+        if time.time() - self._window_start >= self.window:
+            self._flush()
+
+    def _flush(self):
+        now = time.time()
+        for sql, entry in self._pending.items():
+            if entry['count'] > 1:
+                self._write({
+                    'event': 'slow_query_summary',
+                    'from': self._window_start,
+                    'to': now,
+                    'sql': sql,
+                    'count': entry['count'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'max_ms': round(entry['max_ms'], 3),
+                    'routes': entry['routes'],
+                })
+        self._pending = {}
+        self._window_start = now
+
+    def flush(self):
+        """Close the current window if it has run its course (maintenance job)"""
+        with self._lock:
+            self._roll_window()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+        self._handler.close()
+
+    def instrument(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['slow_query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('slow_query_started')
+        if elapsed >= self.threshold:
+            self.record(conn, statement, parameters, elapsed, context, executemany)
+
+def init_slow_query_log(app, engines):
+    config = app.config
+    log = SlowQueryLog(config['SLOW_QUERY_LOG'], config['SLOW_QUERY_MS'], config.get('SLOW_QUERY_WINDOW', 60),
+                       config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024), config.get('SLOW_QUERY_LOG_BACKUPS', 5))
+    for engine in engines.values():
+        log.instrument(engine)
+    app.extensions['slow_query_log'] = log
+    return log
+
+def flush_slow_queries():
+    """Maintenance job: write summaries of windows that ended without further slow queries"""
+    log = current_app.extensions.get('slow_query_log')
+    if log is not None:
+        log.flush()
@@ -0,0 +1,92 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from flask import current_app
+from database import db
+
+class WriterBusy(RuntimeError):
+    """Raised when a queued write was cancelled before the writer reached it"""
+
+class SingleWriter:
+    """Optional dedicated thread that runs write units of work one at a time.
+
+    SQLite allows a single writer; funnelling hot write paths through one
+    thread turns lock contention ("database is locked") into an ordinary
+    queue. A unit of work is a function that changes db.session and
+    returns plain data (not ORM objects, which belong to the writer's
+    session); the writer commits after each unit. Reads keep using the
+    normal pooled connections. Each app gets its own writer (see
+    init_single_writer), so a unit of work always commits to the database of
+    the app that queued it.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self._thread is not None
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(app,), name='db-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread = None
+
+    def _run(self, app):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            fn, args, kwargs, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with app.app_context():
+                try:
+                    result = fn(*args, **kwargs)
+                    db.session.commit()
+                except BaseException as e:
+                    db.session.rollback()
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn as a committed unit of work and return its result"""
+        if self._thread is None or threading.current_thread() is self._thread:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+            return result
+        # End the caller's read transaction so it cannot hold locks the writer needs
+        db.session.commit()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        try:
+            return future.result(timeout=current_app.config.get('DB_WRITE_TIMEOUT', 30))
+        except FutureTimeout:
+            # Still queued: drop it, so a caller told "failed" never sees the write appear later
+            if future.cancel():
+                raise WriterBusy('Too many writes queued, try again shortly')
+            # Already running: it will commit or fail on its own, so report that outcome
+            return future.result()
+
+def init_single_writer(app):
+    """Start a writer thread for app; run_write uses it for requests to that app"""
+    writer = app.extensions['single_writer'] = SingleWriter()
+    writer.start(app)
+    return writer
+
+def run_write(fn, *args, **kwargs):
+    """Run fn as a committed unit of work, on the current app's writer thread if it has one"""
+    writer = current_app.extensions.get('single_writer')
+    if writer is None:
+        result = fn(*args, **kwargs)
+        db.session.commit()
+        return result
+    return writer.run(fn, *args, **kwargs)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Metrics Overhead Benchmark
+Times an authenticated list route (JWT, membership and SQL, like most of the
+API) through the test client on two apps that differ only in
+METRICS_ENABLED, in paired rounds so drift hits both equally. That comparison
+swings by a few percent from run to run, so the pass/fail check times
+the per-request instrumentation itself (request hooks plus a pool checkout)
+and compares it with the route's latency. Exits non-zero when that exceeds
+--max-overhead percent.
+
+Usage: python benchmarks/metrics_overhead.py [--rounds 40] [--requests 100] [--max-overhead 2]
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app import create_app
+from metrics import _finish_request, _start_request
+from schema import upgrade
+
+_TMP = tempfile.mkdtemp()
+
+def make_app(metrics):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_TMP, 'metrics.db')}",
+        'METRICS_ENABLED': metrics,
+        'MAIL_WORKER_ENABLED': False,
+        'MAINTENANCE_ENABLED': False,
+        'REALTIME_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'SCHEMA_CHECK': 'off',
+    })
+    upgrade(app)
+    return app
+
+def signup(app, username):
+    r = app.test_client().post('/api/signup', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'password123',
+        'first_name': 'Bench', 'last_name': 'Mark', 'role': 'external'})
+    headers = {'Authorization': f"Bearer {r.json['access_token']}"}
+    for i in range(5):
+        app.test_client().post('/api/workspaces', json={'name': f'ws {i}'}, headers=headers)
+    return headers
+
+def timed_round(client, headers, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/workspaces', headers=headers)
+    return (time.perf_counter() - start) / requests
+
+def hook_cost(app, headers, calls=20000):
+    """Seconds per request spent in the metrics hooks and pool listener"""
+    registry = app.extensions['metrics']
+    response = app.response_class(status=200)
+    with app.test_request_context('/api/workspaces', headers=headers):
+        start = time.perf_counter()
+        for _ in range(calls):
+            _start_request()
+            registry.pool_checkouts.inc(('default',))
+            _finish_request(response)
+        return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=40)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--max-overhead', type=float, default=2.0, help='percent')
+    args = parser.parse_args()
+
+    apps = {False: make_app(False), True: make_app(True)}
+    headers = signup(apps[False], 'bench')
+    clients = {enabled: app.test_client() for enabled, app in apps.items()}
+    for enabled in apps:
+        timed_round(clients[enabled], headers, 50)  # warm caches and pools
+
+    off, ratios = [], []
+    for i in range(args.rounds):
+        gc.collect()
+        times = {}
+        for enabled in ((False, True) if i % 2 == 0 else (True, False)):
+            times[enabled] = timed_round(clients[enabled], headers, args.requests)
+        off.append(times[False])
+        ratios.append(times[True] / times[False])
+    baseline = statistics.median(off)
+    cost = hook_cost(apps[True], headers)
+    overhead = cost / baseline * 100
+
+    print(f"GET /api/workspaces, {args.rounds} paired rounds x {args.requests} requests:")
+    print(f"  metrics off:            {baseline * 1e6:8.1f} us/request (median)")
+    print(f"  metrics on / off:       {(statistics.median(ratios) - 1) * 100:+8.2f}% (median of paired rounds)")
+    print(f"  instrumentation itself: {cost * 1e6:8.2f} us/request ({overhead:.2f}% of the request)")
+    if overhead > args.max_overhead:
+        print(f"❌ overhead exceeds {args.max_overhead:.1f}%")
+        sys.exit(1)
+    print(f"✅ overhead within {args.max_overhead:.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+User Search Latency Benchmark
+Seeds a large user table with generated names (about a thousand surnames,
+no first name or surname root on more than ~2% of users, like a real
+population), builds the trigram index and
+times search_users() for typeahead prefixes, typos and full names, with and
+without a role filter. Exits non-zero when the p95 latency exceeds
+--budget-ms (one keystroke).
+
+Usage: python benchmarks/search_latency.py [--users 25000] [--queries 300] [--budget-ms 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app import create_app
+from database import db, User
+from schema import upgrade
+from search import rebuild_user_trigrams, search_users
+
+_TMP = tempfile.mkdtemp()
+
+FIRST = ['James', 'Maria', 'Wei', 'Aisha', 'Łukasz', 'Zoë', 'Mohammed', 'Olga', 'Carlos', 'Priya', 'Kenji', 'Fatima',
+         'Liam', 'Sofia', 'Noah', 'Amara', 'Mateo', 'Ingrid', 'Rahul', 'Chloé', 'Emma', 'Oliver', 'Yuki', 'Hana',
+         'Diego', 'Lucía', 'Arjun', 'Ananya', 'Kwame', 'Ngozi', 'Elif', 'Emre', 'Sven', 'Astrid', 'Pierre', 'Amélie',
+         'Giulia', 'Marco', 'Tomasz', 'Zofia', 'Dmitri', 'Anastasia', 'Omar', 'Layla', 'Hiroshi', 'Sakura', 'Ethan',
+         'Ava', 'Lucas', 'Isabella', 'Jonas', 'Freya', 'Rohan', 'Meera', 'Tariq', 'Zainab', 'Felipe', 'Camila',
+         'Minh', 'Linh', 'Jae', 'Seo-yeon', 'Bjorn', 'Sigrid', 'Pablo', 'Valentina', 'Kofi', 'Adwoa', 'Nikolai', 'Irina']
+# Surnames are built from roots and endings so the table has about a thousand distinct ones
+SURNAME_ROOTS = ['Smith', 'Garc', 'Chen', 'Okaf', 'Wójc', 'Müll', 'Hadd', 'Ivan', 'Silv', 'Sharm', 'Tanak', 'Nguy',
+                 'John', 'Ross', 'Kowal', 'Dub', 'Ander', 'Pat', 'Kim', 'Mor', 'Berg', 'Lind', 'Fitz', 'Mac',
+                 'Oconn', 'Brenn', 'Yam', 'Mats', 'Fern', 'Rodr', 'Alv', 'Bakr', 'Naz', 'Hoff', 'Schm', 'Wagn',
+                 'Beck', 'Kuz', 'Pavl', 'Wright', 'Hughes', 'Ward', 'Coll', 'Rey', 'Cast', 'Volk', 'Zhan', 'Liu']
+SURNAME_ENDINGS = ['', 'son', 'sen', 'ez', 'ova', 'ski', 'er', 'ini', 'ian', 'ura', 'ström', 'ley', 'ford',
+                   'ton', 'well', 'ek', 'ić', 'escu', 'oglu', 'ane']
+ROLES = ['student'] * 8 + ['external', 'admin']
+
+def make_app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_TMP, 'search.db')}",
+        'MAIL_WORKER_ENABLED': False,
+        'MAINTENANCE_ENABLED': False,
+        'REALTIME_ENABLED': False,
+        'QUERY_STATS_ENABLED': False,
+        'METRICS_ENABLED': False,
+        'SLOW_QUERY_LOG_ENABLED': False,
+        'SCHEMA_CHECK': 'off',
+    })
+    upgrade(app)
+    return app
+
+def random_name(rng):
+    return rng.choice(FIRST), rng.choice(SURNAME_ROOTS) + rng.choice(SURNAME_ENDINGS)
+
+def seed(count, rng):
+    rows = []
+    for i in range(count):
+        first, last = random_name(rng)
+        username = f"{first[:3].lower()}{last[:4].lower()}{i}"
+        rows.append({'username': username, 'email': f"{username}@example.com", 'password_hash': 'x',
+                     'first_name': first, 'last_name': last, 'role': rng.choice(ROLES), 'is_active': True})
+        if len(rows) == 5000:
+            db.session.execute(User.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(User.__table__.insert(), rows)
+    db.session.commit()
+    rebuild_user_trigrams()
+
+def typo(word, rng):
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:]
+
+def queries(count, rng):
+    out = []
+    for _ in range(count):
+        first, last = random_name(rng)
+        out.append(rng.choice([first[:4], last[:5], typo(last, rng), f"{first} {last}", typo(first, rng)]))
+    return out
+
+def p95(samples):
+    return statistics.quantiles(samples, n=20)[-1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=25000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--budget-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed(args.users, rng)
+        print(f"Seeded {args.users} users and their trigrams in {time.perf_counter() - start:.1f}s")
+
+        sample = queries(args.queries, rng)
+        for q in sample[:20]:
+            search_users(q)  # warm the page cache
+        worst = 0.0
+        for role in (None, 'student', 'admin'):
+            timings = []
+            for q in sample:
+                start = time.perf_counter()
+                search_users(q, limit=10, role=role)
+                timings.append((time.perf_counter() - start) * 1000)
+            worst = max(worst, p95(timings))
+            print(f"  role={role or 'any':8} p50 {statistics.median(timings):6.2f} ms   "
+                  f"p95 {p95(timings):6.2f} ms   max {max(timings):6.2f} ms")
+
+    if worst > args.budget_ms:
+        print(f"❌ p95 {worst:.2f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print(f"✅ p95 within the {args.budget_ms:.0f} ms budget")
+
+if __name__ == "__main__":
+    main()
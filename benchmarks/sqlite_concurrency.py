@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Benchmark
+Measures concurrent read/write throughput on a file database with stock
+settings and with the tuning profile from backend/config.py.
+
+Usage: python benchmarks/sqlite_concurrency.py [--seconds 5] [--readers 4] [--writers 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import Config
+from database import apply_sqlite_pragmas
+
+def run(label, pragmas, seconds, readers, writers):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f"sqlite:///{path}", pool_size=readers + writers, max_overflow=0)
+    apply_sqlite_pragmas(engine, pragmas)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, workspace_id INT, content TEXT, created_at REAL)"))
+        conn.execute(text("CREATE INDEX idx_messages_workspace_created ON messages (workspace_id, created_at)"))
+        conn.execute(text("INSERT INTO messages (workspace_id, content, created_at) VALUES (:w, 'seed', :t)"),
+                     [{'w': i % 20, 't': time.time()} for i in range(5000)])
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def reader(n):
+        done = 0
+        while time.monotonic() < stop:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT * FROM messages WHERE workspace_id = :w ORDER BY created_at DESC LIMIT 50"),
+                             {'w': n % 20}).fetchall()
+            done += 1
+        with lock:
+            counts['reads'] += done
+
+    def writer(n):
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO messages (workspace_id, content, created_at) VALUES (:w, 'hello', :t)"),
+                                 {'w': n % 20, 't': time.time()})
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    print(f"{label:8} reads/s: {counts['reads'] / seconds:9.1f}   writes/s: {counts['writes'] / seconds:8.1f}   lock errors: {counts['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s per run")
+    run('stock', {}, args.seconds, args.readers, args.writers)
+    run('tuned', Config.SQLITE_PRAGMAS, args.seconds, args.readers, args.writers)
+
+if __name__ == "__main__":
+    main()
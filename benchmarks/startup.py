@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Compares the schema work a worker used to do on every boot (create_all, an
+index existence check per index, the PRAGMA column diff and the trigram
+backfill probe) with the schema version stamp check, then times importing
+backend/app.py and building an app with create_app() in fresh interpreters,
+with and without Socket.IO. Exits non-zero when a cold create_app() exceeds
+--budget-ms or when modules meant to load lazily are imported at startup.
+
+Usage: python benchmarks/startup.py [--runs 10] [--budget-ms 1500]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, BACKEND_DIR)
+
+_TMP = tempfile.mkdtemp()
+DATABASE_URL = f"sqlite:///{os.path.join(_TMP, 'startup.db')}"
+
+# Modules that must not be imported just by starting a worker
+LAZY_MODULES = ('smtplib', 'multiprocessing', 'alembic', 'flask_migrate')
+# ...and, with REALTIME_ENABLED=0, not Socket.IO either
+REALTIME_MODULES = ('flask_socketio', 'socketio', 'engineio')
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': (imported - start) * 1000, 'create': (created - imported) * 1000,
+                  'modules': sorted(sys.modules)}))
+"""
+
+from sqlalchemy import text
+
+def legacy_startup(db, User, UserTrigram):
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    db.session.execute(text("PRAGMA table_info('users');")).fetchall()
+    db.session.execute(text("PRAGMA table_info('password_resets');")).fetchall()
+    UserTrigram.query.first()
+    User.query.first()
+
+def timed(fn, runs, engine):
+    best = float('inf')
+    for _ in range(runs):
+        # A new worker starts with an empty pool
+        engine.dispose()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def cold_start(runs, realtime):
+    env = dict(os.environ, DATABASE_URL=DATABASE_URL, MAIL_WORKER_ENABLED='0', MAINTENANCE_ENABLED='0',
+               REALTIME_ENABLED='1' if realtime else '0')
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', COLD_START], cwd=BACKEND_DIR, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(results, key=lambda r: r['import'] + r['create'])
+    return best['import'], best['create'], set(best['modules'])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=1500)
+    args = parser.parse_args()
+
+    from app import create_app
+    from database import db, User, UserTrigram
+    from schema import check_schema, upgrade
+    app = create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL, 'MAIL_WORKER_ENABLED': False,
+                      'MAINTENANCE_ENABLED': False, 'REALTIME_ENABLED': False, 'SCHEMA_CHECK': 'off'})
+    upgrade(app)
+    app.config['SCHEMA_CHECK'] = 'strict'
+
+    with app.app_context():
+        engine = db.engine
+        legacy = timed(lambda: legacy_startup(db, User, UserTrigram), args.runs, engine)
+        db.session.remove()
+    stamp = timed(lambda: check_schema(app), args.runs, engine)
+    print(f"schema work per boot (best of {args.runs}):")
+    print(f"  create_all + migration probes: {legacy:8.2f} ms")
+    print(f"  schema stamp check:            {stamp:8.2f} ms")
+
+    failures = []
+    print(f"cold start in a fresh interpreter (best of {args.runs}):")
+    for realtime in (False, True):
+        imported, created, modules = cold_start(args.runs, realtime)
+        label = 'realtime on ' if realtime else 'realtime off'
+        print(f"  {label}  import app: {imported:7.1f} ms   create_app(): {created:7.1f} ms")
+        if imported + created > args.budget_ms:
+            failures.append(f"{label}: {imported + created:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        eager = [m for m in LAZY_MODULES + (() if realtime else REALTIME_MODULES) if m in modules]
+        if eager:
+            failures.append(f"{label}: imported at startup: {', '.join(eager)}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Shared test setup
+The make_app fixture builds an app with create_app() on a scratch SQLite
+file in the test's own directory and migrates it. Background workers,
+Socket.IO, rate limits and the password worker pool are off, and password
+hashing is cheap, unless a test overrides them; any worker an app started
+is stopped once the test ends.
+
+The test modules also run as scripts (python test_x.py); their __main__
+blocks pass app_factory() where pytest would inject the fixture.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from app import create_app
+from schema import upgrade
+
+TEST_CONFIG = {
+    'MAIL_WORKER_ENABLED': False,
+    'MAINTENANCE_ENABLED': False,
+    'REALTIME_ENABLED': False,
+    'RATELIMIT_ENABLED': False,
+    'PASSWORD_HASH_WORKERS': 0,
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'SCHEMA_CHECK': 'off',
+}
+
+WORKERS = ('mail_worker', 'maintenance_worker', 'single_writer', 'continuous_profiler')
+
+def app_factory(directory=None):
+    """Return make_app(name='app.db', migrate=True, **overrides), building apps under directory.
+
+    make_app.directory is that directory (a fresh temporary one by default)
+    and make_app.apps lists the apps built so far.
+    """
+    directory = directory or tempfile.mkdtemp()
+
+    def make_app(name='app.db', migrate=True, **overrides):
+        config = dict(TEST_CONFIG, SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, name)}")
+        config.update(overrides)
+        app = create_app(config)
+        if migrate:
+            upgrade(app)
+        make_app.apps.append(app)
+        return app
+
+    make_app.directory = directory
+    make_app.apps = []
+    return make_app
+
+def stop_workers(apps):
+    for app in apps:
+        for name in WORKERS:
+            if name in app.extensions:
+                app.extensions[name].stop()
+
+@pytest.fixture
+def make_app(tmp_path):
+    factory = app_factory(str(tmp_path))
+    yield factory
+    stop_workers(factory.apps)
@@ -1,7 +1,7 @@
 -- Global Collaboration Hub Database Schema
 -- MySQL Database Schema
 
-CREATE DATABASE IF NOT EXISTS global_collab_hub;
+CREATE DATABASE IF NOT EXISTS global_collab_hub CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
 USE global_collab_hub;
 
 -- Users table
@@ -12,8 +12,14 @@ CREATE TABLE users (
     password_hash VARCHAR(255) NOT NULL,
     first_name VARCHAR(50) NOT NULL,
     last_name VARCHAR(50) NOT NULL,
+    role ENUM('student', 'admin', 'external') NOT NULL DEFAULT 'student',
     profile_picture VARCHAR(255),
     bio TEXT,
+    domain VARCHAR(120),
+    skills TEXT,
+    experience_years INT,
+    portfolio_link VARCHAR(255),
+    resume_link VARCHAR(255),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     is_active BOOLEAN DEFAULT TRUE
@@ -37,9 +43,13 @@ CREATE TABLE memberships (
     user_id INT NOT NULL,
     workspace_id INT NOT NULL,
     role ENUM('owner', 'admin', 'member') DEFAULT 'member',
-    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status ENUM('invited', 'accepted', 'declined') DEFAULT 'invited',
+    invited_by INT,
+    invited_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    joined_at TIMESTAMP NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (workspace_id) REFERENCES workspaces(id) ON DELETE CASCADE,
+    FOREIGN KEY (invited_by) REFERENCES users(id) ON DELETE SET NULL,
     UNIQUE KEY unique_membership (user_id, workspace_id)
 );
 
@@ -92,25 +102,25 @@ CREATE TABLE tasks (
     FOREIGN KEY (assigned_to) REFERENCES users(id) ON DELETE SET NULL
 );
 
--- Indexes for better performance
-CREATE INDEX idx_messages_workspace ON messages(workspace_id);
+-- Indexes for better performance (kept in sync with the __table_args__ in backend/database.py;
+-- users.email/username and memberships(user_id, workspace_id) are indexed by their UNIQUE keys)
+CREATE INDEX idx_messages_workspace_created ON messages(workspace_id, created_at);
 CREATE INDEX idx_messages_user ON messages(user_id);
 CREATE INDEX idx_messages_created_at ON messages(created_at);
-CREATE INDEX idx_messages_workspace_created ON messages(workspace_id, created_at);
-CREATE INDEX idx_files_workspace ON files(workspace_id);
+CREATE INDEX idx_files_workspace_created ON files(workspace_id, created_at);
 CREATE INDEX idx_files_uploaded_by ON files(uploaded_by);
 CREATE INDEX idx_files_created_at ON files(created_at);
-CREATE INDEX idx_tasks_workspace ON tasks(workspace_id);
+CREATE INDEX idx_tasks_workspace_created ON tasks(workspace_id, created_at);
 CREATE INDEX idx_tasks_assigned_to ON tasks(assigned_to);
+CREATE INDEX idx_tasks_created_by ON tasks(created_by);
 CREATE INDEX idx_tasks_status ON tasks(status);
 CREATE INDEX idx_tasks_priority ON tasks(priority);
 CREATE INDEX idx_tasks_due_date ON tasks(due_date);
-CREATE INDEX idx_memberships_user ON memberships(user_id);
-CREATE INDEX idx_memberships_workspace ON memberships(workspace_id);
+CREATE INDEX idx_memberships_user_status ON memberships(user_id, status);
+CREATE INDEX idx_memberships_workspace_status ON memberships(workspace_id, status);
 CREATE INDEX idx_memberships_role ON memberships(role);
-CREATE INDEX idx_users_email ON users(email);
-CREATE INDEX idx_users_username ON users(username);
+CREATE INDEX idx_memberships_invited_by ON memberships(invited_by);
 CREATE INDEX idx_users_active ON users(is_active);
+CREATE INDEX idx_users_role ON users(role);
 CREATE INDEX idx_workspaces_created_by ON workspaces(created_by);
 CREATE INDEX idx_workspaces_active ON workspaces(is_active);
-
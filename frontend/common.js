@@ -36,6 +36,21 @@ function requireAuth(redirectTo = 'login.html') {
     return token;
 }
 
+// Fetch every page of a keyset-paginated list route by following its X-Next-Cursor header.
+// Returns { ok: true, items } or, when a page fails, { ok: false, res } with that response.
+async function fetchAllPages(url, options = {}) {
+    const items = [];
+    let cursor = null;
+    do {
+        const sep = url.includes('?') ? '&' : '?';
+        const res = await fetch(cursor ? `${url}${sep}cursor=${encodeURIComponent(cursor)}` : url, options);
+        if (!res.ok) return { ok: false, res };
+        items.push(...await res.json());
+        cursor = res.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return { ok: true, items };
+}
+
 function go(path) {
     window.location.href = path;
 }
@@ -49,6 +49,8 @@ def start_backend():
     env = os.environ.copy()
     # Ensure we run from backend directory
     cwd = BACKEND_DIR
+    # Bring the schema up to date; the app itself only checks the version stamp
+    subprocess.check_call([venv_python_path(), '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=cwd)
     return subprocess.Popen([venv_python_path(), 'app.py'], cwd=cwd)
 
 def start_frontend_server():
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Backend Server Runner
-This script starts the Flask backend server with proper configuration.
+This script applies pending database migrations and starts the Flask
+backend server with proper configuration.
 """
 
 import os
@@ -35,6 +36,8 @@ def main():
     print("-" * 50)
     
     try:
+        # Bring the schema up to date; the app itself only checks the version stamp
+        subprocess.run([python_cmd, "-m", "flask", "--app", "app", "db", "upgrade"], check=True)
         # Start the Flask application
         subprocess.run([python_cmd, "app.py"], check=True)
     except KeyboardInterrupt:
@@ -168,6 +168,7 @@ def main():
         print("   venv\\Scripts\\activate")
     else:
         print("   source venv/bin/activate")
+    print("   flask --app app db upgrade")
     print("   python app.py")
     print("3. Open frontend/index.html in your web browser")
     print("\nFor more information, see README.md")
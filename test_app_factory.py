@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+App Factory Test
+Builds independent app instances with create_app() and checks that heavy
+modules stay unimported until they are needed, and that each instance has
+its own background workers, Socket.IO server and rate limit buckets.
+
+Run with: python -m pytest test_app_factory.py   (or python test_app_factory.py)
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from conftest import app_factory
+from database import OutboundEmail
+from ratelimit import MemoryBackend, SQLiteBackend
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+def test_instances_are_independent(make_app):
+    first = make_app('first.db', REALTIME_ENABLED=False)
+    second = make_app('second.db', REALTIME_ENABLED=True)
+    assert 'socketio' not in first.extensions
+    assert 'socketio' in second.extensions
+
+    signup = {'username': 'ada', 'email': 'ada@example.com', 'password': 'password123',
+              'first_name': 'Ada', 'last_name': 'Lovelace'}
+    assert first.test_client().post('/api/signup', json=signup).status_code == 201
+    # Same user again, but in the second app's database
+    assert second.test_client().post('/api/signup', json=signup).status_code == 201
+    assert first.test_client().get('/api/health').status_code == 200
+
+def test_workers_and_limiters_are_per_app(make_app):
+    common = {'REALTIME_ENABLED': True, 'MAIL_WORKER_ENABLED': True, 'MAINTENANCE_ENABLED': True,
+              'RATELIMIT_ENABLED': True, 'MAIL_SERVER': '', 'MAIL_POLL_INTERVAL': 60}
+    first = make_app('workers_first.db', RATELIMITS={'login': '2/60'}, RATELIMIT_STORAGE_URL='memory://', **common)
+    second = make_app('workers_second.db', RATELIMITS={'login': '1/60'},
+                      RATELIMIT_STORAGE_URL=f"sqlite:///{os.path.join(make_app.directory, 'buckets.db')}", **common)
+    for name in ('mail_worker', 'maintenance_worker', 'rate_limiter', 'socketio'):
+        assert first.extensions[name] is not second.extensions[name], name
+
+    # Each app fills its own buckets, in its own storage, with its own limits
+    login = {'email': 'nobody@example.com', 'password': 'password123'}
+    statuses = lambda app, n: [app.test_client().post('/api/login', json=login).status_code for _ in range(n)]
+    assert statuses(first, 3) == [401, 401, 429]
+    assert statuses(second, 2) == [401, 429]
+    assert isinstance(first.extensions['rate_limiter']._backend, MemoryBackend)
+    assert isinstance(second.extensions['rate_limiter']._backend, SQLiteBackend)
+
+    # Committing an email in the second app wakes the second app's worker, which sends it
+    # well before its 60 s poll; the first app's queue stays empty
+    signup = {'username': 'mel', 'email': 'mel@example.com', 'password': 'password123',
+              'first_name': 'Mel', 'last_name': 'Worker'}
+    client = second.test_client()
+    assert client.post('/api/signup', json=signup).status_code == 201
+    assert client.post('/api/forgot-password', json={'email': 'mel@example.com'}).status_code == 200
+    deadline = time.monotonic() + 5
+    with second.app_context():
+        while OutboundEmail.query.one().status != 'sent':
+            assert time.monotonic() < deadline, 'second app worker was not woken'
+            time.sleep(0.05)
+    with first.app_context():
+        assert OutboundEmail.query.count() == 0
+
+def test_heavy_modules_load_lazily():
+    script = ("import sys, app; app.create_app({'SCHEMA_CHECK': 'off', 'REALTIME_ENABLED': False, "
+              "'MAIL_WORKER_ENABLED': False, 'MAINTENANCE_ENABLED': False}); "
+              "print(' '.join(m for m in ('smtplib', 'multiprocessing', 'alembic', 'flask_socketio') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, check=True,
+                         capture_output=True, text=True).stdout.strip()
+    assert out == '', f"imported at startup: {out}"
+
+if __name__ == "__main__":
+    test_instances_are_independent(app_factory())
+    test_workers_and_limiters_are_per_app(app_factory())
+    test_heavy_modules_load_lazily()
+    print("✅ create_app() builds independent, lazily initialized apps")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bulk Join Request Test
+Sends one POST /api/requests/bulk batch that mixes repeated ids, unknown
+ids and non-students with real students, and checks each student gets
+exactly one request, written by a single multi-row INSERT. A repeated
+batch only reports the pending requests (200, nothing created), and
+malformed batches are 400s. A batch that loses a race with a concurrent
+one is held to one pending request per student by the pending_key unique
+index, and answering a request frees its student for a new one.
+
+Run with: python -m pytest test_bulk_requests.py   (or python test_bulk_requests.py)
+"""
+
+from conftest import app_factory
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+import routes
+from database import db, JoinRequest
+from routes import MAX_BULK_REQUESTS
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Bulk', 'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def test_bulk_batch_with_duplicates_and_invalid_ids(make_app):
+    app = make_app('batch.db')
+    client = app.test_client()
+    s1, s2, s3 = (signup(client, name, 'student')[0] for name in ('sid', 'sue', 'sam'))
+    other_agency, _ = signup(client, 'rival', 'external')
+    _, agency = signup(client, 'agency', 'external')
+
+    inserts = []
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO join_requests'):
+                inserts.append(len(parameters) if executemany else 1)
+
+    batch = [s1, s1, s2, 99999, other_agency, s3, s2]
+    r = client.post('/api/requests/bulk', json={'student_ids': batch, 'project_id': 7}, headers=agency)
+    assert r.status_code == 201, r.json
+    assert r.json['created'] == [s1, s2, s3]
+    assert r.json['invalid'] == [99999, other_agency]
+    assert r.json['skipped_pending'] == []
+    assert inserts == [3]
+    with app.app_context():
+        assert sorted(j.to_student_id for j in JoinRequest.query) == [s1, s2, s3]
+
+    # The same batch again only finds pending requests; another project is a new request
+    r = client.post('/api/requests/bulk', json={'student_ids': batch, 'project_id': 7}, headers=agency)
+    assert r.status_code == 200
+    assert r.json['created'] == [] and r.json['skipped_pending'] == [s1, s2, s3]
+    r = client.post('/api/requests/bulk', json={'student_ids': [s1, s1], 'project_id': 8}, headers=agency)
+    assert r.json['created'] == [s1]
+    assert inserts == [3, 1]
+    # Ids given as strings are the same students
+    r = client.post('/api/requests/bulk', json={'student_ids': [str(s2)], 'project_id': 8}, headers=agency)
+    assert r.json['created'] == [s2]
+
+def test_bulk_rejects_malformed_batches(make_app):
+    app = make_app('malformed.db')
+    client = app.test_client()
+    _, agency = signup(client, 'agency', 'external')
+    _, student = signup(client, 'stu', 'student')
+    post = lambda ids, headers=agency: client.post('/api/requests/bulk', json={'student_ids': ids}, headers=headers)
+    assert post([]).status_code == 400
+    assert post(['abc']).status_code == 400
+    assert post([[1]]).status_code == 400
+    assert post(list(range(1, MAX_BULK_REQUESTS + 2))).status_code == 400
+    assert post([1], headers=student).status_code == 403
+    with app.app_context():
+        assert JoinRequest.query.count() == 0
+
+def test_racing_batches_create_one_request_per_student(make_app):
+    app = make_app('race.db')
+    client = app.test_client()
+    s1, s2, s3 = (signup(client, name, 'student')[0] for name in ('ann', 'bob', 'cat'))
+    agency_id, agency = signup(client, 'agency', 'external')
+    # The other batch already created s1's request...
+    assert client.post('/api/requests/bulk', json={'student_ids': [s1], 'workspace_id': 3},
+                       headers=agency).status_code == 201
+
+    # ...but this one read the pending requests before that commit
+    original = routes._pending_request_student_ids
+    calls = []
+
+    def stale_first_read(*args):
+        calls.append(1)
+        return set() if len(calls) == 1 else original(*args)
+
+    routes._pending_request_student_ids = stale_first_read
+    try:
+        r = client.post('/api/requests/bulk', json={'student_ids': [s1, s2, s3], 'workspace_id': 3},
+                        headers=agency)
+    finally:
+        routes._pending_request_student_ids = original
+    assert r.status_code == 201, r.json
+    assert r.json['created'] == [s2, s3] and r.json['skipped_pending'] == [s1]
+    with app.app_context():
+        assert sorted(j.to_student_id for j in JoinRequest.query) == [s1, s2, s3]
+
+        # The index itself refuses a second pending request for the same student and workspace
+        db.session.add(JoinRequest(from_agency_id=agency_id, to_student_id=s1, workspace_id=3))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        else:
+            raise AssertionError('duplicate pending request was stored')
+
+        # Answered requests release the key; the student can be asked again
+        db.session.query(JoinRequest).filter_by(to_student_id=s1).one().status = 'rejected'
+        db.session.commit()
+        assert JoinRequest.query.filter_by(to_student_id=s1).one().pending_key is None
+    r = client.post('/api/requests', json={'to_student_id': s1, 'workspace_id': 3}, headers=agency)
+    assert r.status_code == 201, r.json
+    r = client.post('/api/requests', json={'to_student_id': s1, 'workspace_id': 3}, headers=agency)
+    assert r.status_code == 409
+
+if __name__ == "__main__":
+    test_bulk_batch_with_duplicates_and_invalid_ids(app_factory())
+    test_bulk_rejects_malformed_batches(app_factory())
+    test_racing_batches_create_one_request_per_student(app_factory())
+    print("✅ Bulk join requests insert each valid student once, in one statement")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Identity Cache Test
+Runs with a long IDENTITY_CACHE_TTL and checks the cached current user is
+reused without a query, yet dropped as soon as a change to the user
+commits: a role switch takes effect on the next request, a renamed user
+is served the new name, and a deactivated user's token stops working and
+their chat messages are refused without being stored. A rolled back
+change keeps the cached entry.
+
+Run with: python -m pytest test_identity_cache.py   (or python test_identity_cache.py)
+"""
+
+from conftest import app_factory
+from sqlalchemy import event
+from auth import load_identity
+from database import db, Message, User
+
+CACHE = {'IDENTITY_CACHE_TTL': 300}
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Cache', 'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def user_lookups(app):
+    counter = {'n': 0}
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count(conn, cursor, statement, *args):
+            if statement.startswith('SELECT users.') and 'WHERE users.id = ?' in statement:
+                counter['n'] += 1
+    return counter
+
+def cached(app, user_id):
+    return app.extensions['identity_cache'].get(str(user_id))
+
+def test_role_switch_and_rename_drop_cached_identity(make_app):
+    app = make_app('role.db', **CACHE)
+    client = app.test_client()
+    user_id, headers = signup(client, 'agent', 'external')
+    lookups = user_lookups(app)
+
+    assert client.get('/api/students', headers=headers).status_code == 200
+    assert cached(app, user_id).role == 'external'
+    before = lookups['n']
+    assert before > 0
+    assert client.get('/api/students', headers=headers).status_code == 200
+    assert lookups['n'] == before  # served from the cache
+
+    assert client.put('/api/me/role', json={'role': 'student'}, headers=headers).status_code == 200
+    assert cached(app, user_id) is None
+    assert client.get('/api/students', headers=headers).status_code == 403
+    assert cached(app, user_id).role == 'student'
+
+    assert client.put('/api/profile', json={'first_name': 'Renamed'}, headers=headers).status_code == 200
+    assert cached(app, user_id) is None
+    with app.app_context():
+        assert load_identity(user_id).first_name == 'Renamed'
+
+    # A bio is not part of the cached identity, so the entry stays
+    assert client.put('/api/profile', json={'bio': 'hi'}, headers=headers).status_code == 200
+    assert cached(app, user_id) is not None
+
+def test_deactivation_and_rollback(make_app):
+    app = make_app('deactivate.db', **CACHE)
+    client = app.test_client()
+    user_id, headers = signup(client, 'leaving', 'external')
+    assert client.get('/api/workspaces', headers=headers).status_code == 200
+    entry = cached(app, user_id)
+    assert entry is not None
+
+    # A change that is rolled back leaves the cache alone
+    with app.app_context():
+        db.session.get(User, user_id).role = 'admin'
+        db.session.flush()
+        db.session.rollback()
+    assert cached(app, user_id) is entry
+
+    # Deactivated outside any route (an admin script): the next request is refused
+    with app.app_context():
+        db.session.get(User, user_id).is_active = False
+        db.session.commit()
+    assert cached(app, user_id) is None
+    assert client.get('/api/workspaces', headers=headers).status_code == 401
+
+def test_deactivated_user_cannot_post(make_app):
+    app = make_app('chat.db', REALTIME_ENABLED=True, **CACHE)
+    client = app.test_client()
+    user_id, headers = signup(client, 'chatty', 'external')
+    ws = client.post('/api/workspaces', json={'name': 'Chat'}, headers=headers).json['workspace']['id']
+    sock = app.extensions['socketio'].test_client(app)
+    sock.emit('join_workspace', {'workspace_id': ws, 'user_id': user_id})
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': user_id, 'content': 'before'})
+    assert [e['name'] for e in sock.get_received()] == ['status', 'new_message']
+
+    with app.app_context():
+        db.session.get(User, user_id).is_active = False
+        db.session.commit()
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': user_id, 'content': 'after'})
+    sock.emit('join_workspace', {'workspace_id': ws, 'user_id': user_id})
+    assert [(e['name'], e['args'][0]) for e in sock.get_received()] == [
+        ('error', {'msg': 'Access denied'}), ('error', {'msg': 'Access denied'})]
+    with app.app_context():
+        assert [m.content for m in Message.query] == ['before']
+
+if __name__ == "__main__":
+    test_role_switch_and_rename_drop_cached_identity(app_factory())
+    test_deactivation_and_rollback(app_factory())
+    test_deactivated_user_cannot_post(app_factory())
+    print("✅ Cached identities are dropped when the user changes")
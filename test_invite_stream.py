@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Invitation Streaming Test
+Invites a cohort through POST /api/workspaces/<id>/invite-students?stream=1
+with a small chunk size and checks the NDJSON progress lines land on the
+chunk boundaries, repeated ids, non-students and existing members are
+skipped, and a chunk that fails ends the stream with an error line saying
+how far it got, with the earlier chunks committed. Without stream=1 the
+chunks commit together, so a failure leaves nothing behind.
+
+Run with: python -m pytest test_invite_stream.py   (or python test_invite_stream.py)
+"""
+
+import json
+
+from conftest import app_factory
+from sqlalchemy import event
+import routes
+from database import db, Membership
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Cohort', 'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def setup(app, students):
+    client = app.test_client()
+    ids = [signup(client, f'student{i}', 'student')[0] for i in range(students)]
+    outsider, _ = signup(client, 'outsider', 'external')
+    _, agency = signup(client, 'agency', 'external')
+    ws = client.post('/api/workspaces', json={'name': 'Cohort'}, headers=agency).json['workspace']['id']
+    return client, agency, ws, ids, outsider
+
+def invite(client, headers, ws, student_ids):
+    r = client.post(f'/api/workspaces/{ws}/invite-students?stream=1', json={'student_ids': student_ids},
+                    headers=headers)
+    assert r.status_code == 201 and r.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+
+def invited_ids(app, ws):
+    with app.app_context():
+        return sorted(m.user_id for m in Membership.query.filter_by(workspace_id=ws, status='invited'))
+
+def test_progress_lines_follow_chunks(make_app):
+    original = routes.INVITE_CHUNK_SIZE
+    routes.INVITE_CHUNK_SIZE = 2
+    try:
+        app = make_app('chunks.db')
+        client, agency, ws, ids, outsider = setup(app, 5)
+        with app.app_context():
+            db.session.add(Membership(user_id=ids[2], workspace_id=ws, role='member', status='accepted'))
+            db.session.commit()
+
+        # Seven ids, six distinct: three chunks of two
+        lines = invite(client, agency, ws, ids + [outsider, ids[0]])
+        assert [line.get('processed') for line in lines[:-1]] == [2, 4, 6]
+        assert all(line['total'] == 6 for line in lines[:-1])
+        assert [[s['id'] for s in line['invited_students']] for line in lines[:-1]] == [
+            ids[0:2], [ids[3]], [ids[4]]]
+        assert lines[-1] == {'done': True, 'message': 'Invited 4 students'}
+        assert invited_ids(app, ws) == sorted([ids[0], ids[1], ids[3], ids[4]])
+
+        # Exactly one chunk, and nothing left to invite the second time
+        lines = invite(client, agency, ws, ids[:2])
+        assert lines == [{'processed': 2, 'total': 2, 'invited_students': []},
+                         {'done': True, 'message': 'Invited 0 students'}]
+    finally:
+        routes.INVITE_CHUNK_SIZE = original
+
+def test_failed_chunk_ends_stream_with_error(make_app):
+    original = routes.INVITE_CHUNK_SIZE
+    routes.INVITE_CHUNK_SIZE = 2
+    try:
+        app = make_app('failure.db')
+        client, agency, ws, ids, _ = setup(app, 5)
+        inserts = []
+
+        def fail_second_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO memberships'):
+                inserts.append(1)
+                if len(inserts) == 2:
+                    raise RuntimeError('disk full')
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', fail_second_insert)
+        try:
+            lines = invite(client, agency, ws, ids)
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', fail_second_insert)
+
+        assert lines[0]['processed'] == 2
+        assert lines[-1] == {'error': 'disk full', 'processed': 2, 'total': 5}
+        assert not any(line.get('done') for line in lines)
+        # The first chunk was committed before the failure; nothing after it was
+        assert invited_ids(app, ws) == sorted(ids[:2])
+
+        # Re-sending the whole cohort picks up where it stopped
+        lines = invite(client, agency, ws, ids)
+        assert lines[-1] == {'done': True, 'message': 'Invited 3 students'}
+        assert invited_ids(app, ws) == sorted(ids)
+    finally:
+        routes.INVITE_CHUNK_SIZE = original
+
+def test_plain_request_is_all_or_nothing(make_app):
+    original = routes.INVITE_CHUNK_SIZE
+    routes.INVITE_CHUNK_SIZE = 2
+    try:
+        app = make_app('plain.db')
+        client, agency, ws, ids, _ = setup(app, 5)
+        inserts = []
+
+        def fail_second_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO memberships'):
+                inserts.append(1)
+                if len(inserts) == 2:
+                    raise RuntimeError('disk full')
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', fail_second_insert)
+        try:
+            r = client.post(f'/api/workspaces/{ws}/invite-students', json={'student_ids': ids}, headers=agency)
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', fail_second_insert)
+        assert r.status_code == 500 and r.json == {'error': 'disk full'}
+        assert invited_ids(app, ws) == []
+
+        r = client.post(f'/api/workspaces/{ws}/invite-students', json={'student_ids': ids}, headers=agency)
+        assert r.status_code == 201 and r.json['message'] == 'Invited 5 students'
+        assert invited_ids(app, ws) == sorted(ids)
+    finally:
+        routes.INVITE_CHUNK_SIZE = original
+
+if __name__ == "__main__":
+    test_progress_lines_follow_chunks(app_factory())
+    test_failed_chunk_ends_stream_with_error(app_factory())
+    test_plain_request_is_all_or_nothing(app_factory())
+    print("✅ Invitation streams report each chunk, and where a failure stopped them")
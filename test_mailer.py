@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Email Queue Test
+Delivers queued email to an in-process SMTP sink and checks the retry path:
+a rejected message is rescheduled with a doubling backoff and marked failed
+after MAIL_MAX_ATTEMPTS, a claim whose lease expired is picked up again,
+a refused STARTTLS never lets a message go out in plaintext, and the
+worker is only woken once the enqueuing transaction commits.
+
+Run with: python -m pytest test_mailer.py   (or python test_mailer.py)
+"""
+
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email import message_from_bytes
+
+from conftest import app_factory
+from database import db, OutboundEmail
+from mailer import drain, enqueue_email, make_transport, process_batch
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Just enough SMTP to accept messages (or reject them with a 451, or refuse STARTTLS)"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSession)
+        self.messages = []
+        self.reject = False
+        self.refuse_tls = False
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def config(self, **overrides):
+        """App config that delivers to this sink"""
+        return dict({'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': self.port, 'MAIL_USE_TLS': False}, **overrides)
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class SMTPSession(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 sink ready')
+        for raw in self.rfile:
+            command = raw.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO') and self.server.refuse_tls:
+                self.reply('250-sink')
+                self.reply('250 STARTTLS')
+            elif command.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            elif command == 'STARTTLS':
+                self.reply('454 TLS not available due to temporary reason')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                    lines.append(line[1:] if line.startswith(b'..') else line)
+                if self.server.reject:
+                    self.reply('451 Try again later')
+                else:
+                    self.server.messages.append(message_from_bytes(b''.join(lines)))
+                    self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+def queue(app, to_address='someone@example.com', subject='Hello', body='Hi there'):
+    with app.app_context():
+        enqueue_email(to_address, subject, body)
+        db.session.commit()
+
+def test_delivers_to_smtp_sink(make_app):
+    sink = SMTPSink()
+    try:
+        app = make_app('sink.db', **sink.config())
+        client = app.test_client()
+        r = client.post('/api/signup', json={'username': 'mailme', 'email': 'mailme@example.com',
+                                             'password': 'password123', 'first_name': 'Mail', 'last_name': 'Me',
+                                             'role': 'external'})
+        assert r.status_code == 201
+        assert client.post('/api/forgot-password', json={'email': 'mailme@example.com'}).status_code == 200
+        queue(app, 'other@example.com', 'Second', 'Another one')
+        drain(app)
+
+        assert [(m['To'], m['Subject']) for m in sink.messages] == [
+            ('mailme@example.com', 'Password Reset Request'), ('other@example.com', 'Second')]
+        assert sink.messages[0]['From'] == app.config['MAIL_DEFAULT_SENDER']
+        assert 'reset-password.html?token=' in sink.messages[0].get_payload(decode=True).decode()
+        with app.app_context():
+            assert {e.status for e in OutboundEmail.query} == {'sent'}
+    finally:
+        sink.close()
+
+def test_retry_backoff_doubles_then_fails(make_app):
+    sink = SMTPSink()
+    sink.reject = True
+    try:
+        app = make_app('retry.db', **sink.config(MAIL_MAX_ATTEMPTS=3, MAIL_RETRY_BACKOFF=30))
+        queue(app)
+        transport = make_transport(app.config)
+        with app.app_context():
+            delays = []
+            for attempt in (1, 2):
+                before = datetime.utcnow()
+                assert process_batch(transport) == 1
+                email = OutboundEmail.query.one()
+                assert email.status == 'pending' and email.attempts == attempt and '451' in email.last_error
+                delays.append((email.next_attempt_at - before).total_seconds())
+                # Not due yet: nothing to send until the backoff has passed
+                assert process_batch(transport) == 0
+                email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                db.session.commit()
+            assert 30 <= delays[0] < 32 and 60 <= delays[1] < 62
+
+            assert process_batch(transport) == 1
+            email = OutboundEmail.query.one()
+            assert email.status == 'failed' and email.attempts == 3
+            assert process_batch(transport) == 0
+        transport.close()
+        assert sink.messages == []
+    finally:
+        sink.close()
+
+def test_expired_lease_is_reclaimed(make_app):
+    sink = SMTPSink()
+    try:
+        app = make_app('lease.db', **sink.config(MAIL_CLAIM_LEASE=600))
+        with app.app_context():
+            now = datetime.utcnow()
+            # A worker that died mid-batch, and one that is still sending
+            db.session.add_all([
+                OutboundEmail(to_address='stale@example.com', subject='Stale', body='x', status='sending',
+                              claim_token='dead', claimed_at=now - timedelta(seconds=601)),
+                OutboundEmail(to_address='busy@example.com', subject='Busy', body='x', status='sending',
+                              claim_token='alive', claimed_at=now - timedelta(seconds=60)),
+            ])
+            db.session.commit()
+        drain(app)
+        assert [m['To'] for m in sink.messages] == ['stale@example.com']
+        with app.app_context():
+            assert {e.to_address: e.status for e in OutboundEmail.query} == {
+                'stale@example.com': 'sent', 'busy@example.com': 'sending'}
+    finally:
+        sink.close()
+
+def test_refused_starttls_sends_nothing(make_app):
+    sink = SMTPSink()
+    sink.refuse_tls = True
+    try:
+        app = make_app('tls.db', **sink.config(MAIL_USE_TLS=True))
+        queue(app, 'first@example.com', 'First')
+        queue(app, 'reset@example.com', 'Password Reset Request', 'token=secret')
+        transport = make_transport(app.config)
+        with app.app_context():
+            assert process_batch(transport) == 2
+            # Each message failed on its own setup; none reused a half set up connection
+            assert transport.conn is None
+            emails = OutboundEmail.query.order_by(OutboundEmail.id).all()
+            assert [(e.status, e.attempts) for e in emails] == [('pending', 1), ('pending', 1)]
+            assert all('TLS' in e.last_error for e in emails)
+        assert sink.messages == []
+    finally:
+        sink.close()
+
+class RecordingWorker:
+    def __init__(self):
+        self.calls = 0
+
+    def notify(self):
+        self.calls += 1
+
+    def stop(self):
+        pass
+
+def test_worker_woken_after_commit(make_app):
+    sink = SMTPSink()
+    try:
+        app = make_app('notify.db', **sink.config())
+        worker = app.extensions['mail_worker'] = RecordingWorker()
+        with app.app_context():
+            enqueue_email('a@example.com', 'Rolled back', 'x')
+            assert worker.calls == 0
+            db.session.rollback()
+            db.session.commit()
+            assert worker.calls == 0
+
+            enqueue_email('b@example.com', 'Committed', 'x')
+            assert worker.calls == 0
+            db.session.commit()
+            assert worker.calls == 1
+            assert [e.subject for e in OutboundEmail.query] == ['Committed']
+    finally:
+        sink.close()
+
+if __name__ == "__main__":
+    test_delivers_to_smtp_sink(app_factory())
+    test_retry_backoff_doubles_then_fails(app_factory())
+    test_expired_lease_is_reclaimed(app_factory())
+    test_refused_starttls_sends_nothing(app_factory())
+    test_worker_woken_after_commit(app_factory())
+    print("✅ Email is delivered over SMTP, retried with backoff and announced after commit")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Metrics Test
+Drives a few HTTP routes, an upload and Socket.IO events in-process, then
+scrapes /metrics and checks the Prometheus counters, histograms and gauges.
+Also checks that /metrics is closed unless a token is set (or it is made
+public explicitly) and that per-thread counters add up after their threads exit.
+
+Run with: python -m pytest test_metrics.py   (or python test_metrics.py)
+"""
+
+import io
+import os
+import re
+import threading
+
+from conftest import app_factory
+from metrics import Registry
+
+def scrape(client, **kwargs):
+    r = client.get('/metrics', **kwargs)
+    assert r.status_code == 200
+    assert r.content_type.startswith('text/plain; version=0.0.4')
+    samples = {}
+    for line in r.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+def test_metrics_endpoint(make_app):
+    app = make_app(REALTIME_ENABLED=True, METRICS_PUBLIC=True)
+    os.chdir(make_app.directory)
+    client = app.test_client()
+    r = client.post('/api/signup', json={'username': 'metric', 'email': 'metric@example.com',
+                                         'password': 'password123', 'first_name': 'Me', 'last_name': 'Tric',
+                                         'role': 'external'})
+    user_id, headers = r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+    ws = client.post('/api/workspaces', json={'name': 'Metrics'}, headers=headers).json['workspace']['id']
+    for _ in range(3):
+        client.get('/api/workspaces', headers=headers)
+    client.get('/api/no-such-route')
+    client.post(f'/api/workspaces/{ws}/files', data={'file': (io.BytesIO(b'x' * 1234), 'a.txt')},
+                headers=headers, content_type='multipart/form-data')
+
+    sock = app.extensions['socketio'].test_client(app)
+    sock.emit('join_workspace', {'workspace_id': ws, 'user_id': user_id})
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': user_id, 'content': 'hi'})
+
+    samples = scrape(client)
+    assert samples['http_requests_total{method="GET",route="/api/workspaces",status="200"}'] == 3
+    assert samples['http_request_duration_seconds_count{method="GET",route="/api/workspaces"}'] == 3
+    assert samples['http_request_duration_seconds_bucket{method="GET",route="/api/workspaces",le="+Inf"}'] == 3
+    assert samples['http_requests_total{method="GET",route="unmatched",status="404"}'] == 1
+    assert samples['upload_bytes_total'] == 1234 and samples['uploads_total'] == 1
+    assert samples['socketio_events_total{event="send_message"}'] == 1
+    assert samples['socketio_event_duration_seconds_count{event="join_workspace"}'] == 1
+    assert samples['socketio_connections'] == 1
+    # Room sizes are a distribution: no series names a workspace
+    assert samples['socketio_room_members_bucket{le="1.0"}'] == 1
+    assert samples['socketio_room_members_count'] == 1 and samples['socketio_room_members_sum'] == 1
+    assert not any('room=' in name for name in samples)
+    assert samples['db_pool_checkouts_total{bind="default"}'] > 0
+    assert 'db_pool_checked_out{bind="default"}' in samples
+
+    sock.disconnect()
+    assert scrape(client)['socketio_connections'] == 0
+
+def test_metrics_token(make_app):
+    app = make_app(METRICS_TOKEN='s3cret', METRICS_PUBLIC=False)
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    scrape(client, headers={'Authorization': 'Bearer s3cret'})
+
+def test_metrics_closed_without_token(make_app):
+    app = make_app(METRICS_PUBLIC=False)
+    assert app.config['METRICS_TOKEN'] == ''
+    assert app.test_client().get('/metrics').status_code == 403
+
+def test_thread_counters_add_up():
+    registry = Registry()
+    registry._shards.max_live = 4
+
+    def work():
+        for _ in range(1000):
+            registry.uploads.inc()
+            registry.http_duration.observe(0.02, ('GET', '/x'))
+
+    for _ in range(3):
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    text = registry.render()
+    assert re.search(r'^uploads_total 24000$', text, re.M)
+    assert re.search(r'^http_request_duration_seconds_bucket\{method="GET",route="/x",le="0.01"\} 0$', text, re.M)
+    assert re.search(r'^http_request_duration_seconds_bucket\{method="GET",route="/x",le="0.025"\} 24000$', text, re.M)
+    assert len(registry._shards._live) <= 8
+
+if __name__ == "__main__":
+    test_metrics_endpoint(app_factory())
+    test_metrics_token(app_factory())
+    test_metrics_closed_without_token(app_factory())
+    test_thread_counters_add_up()
+    print("✅ /metrics exposes route, socket, pool and upload metrics")
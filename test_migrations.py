@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Migration Test
+Applies the Alembic migrations to a scratch SQLite database and checks that
+the result matches the models, that SCHEMA_REVISION names the head revision
+and that startup refuses to run against an unmigrated database, from
+`flask run` too, while `flask db` and `flask shards` still work. Also
+checks the trigram reindex reads users a page at a time with its own copy
+of the tokenizer, and that pending_key is backfilled on the oldest of any
+duplicate pending join requests only.
+
+Run with: python -m pytest test_migrations.py   (or python test_migrations.py)
+"""
+
+from conftest import app_factory
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+import click
+from click.testing import CliRunner
+from flask.cli import FlaskGroup, run_command
+from sqlalchemy import event
+import search
+from database import db, JoinRequest, User, UserTrigram
+from schema import MIGRATIONS_DIR, SCHEMA_REVISION, SchemaOutOfDate, current_revision, upgrade
+
+def test_schema_revision_is_head(make_app):
+    app = make_app('head.db')
+    with app.app_context():
+        script = ScriptDirectory.from_config(app.extensions['migrate'].migrate.get_config(MIGRATIONS_DIR))
+        assert script.get_heads() == [SCHEMA_REVISION]
+
+def test_migrations_match_models(make_app):
+    app = make_app('models.db')
+    with app.app_context():
+        assert current_revision() == SCHEMA_REVISION
+        with db.engine.connect() as conn:
+            diff = compare_metadata(MigrationContext.configure(conn), db.metadata)
+        assert not diff, f"Models and migrations differ: {diff}"
+
+def test_startup_checks_schema_stamp(make_app):
+    try:
+        make_app('empty.db', migrate=False, SCHEMA_CHECK='strict')
+    except SchemaOutOfDate as e:
+        assert 'db upgrade' in str(e)
+    else:
+        raise AssertionError('startup accepted a database without a schema stamp')
+    make_app('stamped.db')
+    make_app('stamped.db', migrate=False, SCHEMA_CHECK='strict')
+
+def test_cli_checks_schema_except_schema_commands(make_app):
+    cli = FlaskGroup(create_app=lambda: make_app('cli.db', migrate=False, SCHEMA_CHECK='strict'))
+    runner = CliRunner()
+    # The commands that manage the schema run against an unmigrated database
+    assert runner.invoke(cli, ['shards', '--help']).exit_code == 0
+    result = runner.invoke(cli, ['db', 'current'])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli, ['routes'])
+    assert isinstance(result.exception, SchemaOutOfDate), result.output
+    # `flask run` loads the app inside its own command context
+    with click.Context(run_command, info_name='run'):
+        try:
+            make_app('cli.db', migrate=False, SCHEMA_CHECK='strict')
+        except SchemaOutOfDate:
+            pass
+        else:
+            raise AssertionError('flask run skipped the schema check')
+
+    result = runner.invoke(cli, ['db', 'upgrade'])
+    assert result.exit_code == 0, result.output
+    assert runner.invoke(cli, ['routes']).exit_code == 0
+
+def test_trigram_reindex_is_batched_and_frozen(make_app):
+    app = make_app('reindex.db', migrate=False)
+    upgrade(app, '0003_workspace_shards')
+    names = ['Zoë', 'Łukasz', 'Ada', 'Grace', 'Émile']
+    with app.app_context():
+        # Core inserts: no mapper events, so the index starts out empty
+        db.session.execute(User.__table__.insert(), [{
+            'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+            'first_name': names[i % len(names)], 'last_name': f'Batch{i}', 'role': 'student'
+        } for i in range(2500)])
+        db.session.commit()
+        pages = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count(conn, cursor, statement, *args):
+            if statement.startswith('SELECT id, first_name') and 'LIMIT' in statement:
+                pages.append(statement)
+
+    def broken(*args):
+        raise AssertionError('migration used the live search tokenizer')
+
+    original = search.trigrams
+    search.trigrams = broken
+    try:
+        upgrade(app)
+    finally:
+        search.trigrams = original
+    # Three pages of 1000 and the empty page that ends the walk
+    assert len(pages) == 4
+    with app.app_context():
+        indexed = {}
+        for row in UserTrigram.query:
+            indexed.setdefault(row.user_id, set()).add(row.trigram)
+        users = User.query.all()
+        assert len(indexed) == len(users) == 2500
+        assert all(indexed[user.id] == search.user_trigrams(user) for user in users)
+
+def test_pending_key_backfill_keeps_duplicates(make_app):
+    app = make_app('pending.db', migrate=False)
+    upgrade(app, '0004_unicode_trigrams')
+    with app.app_context():
+        rows = [(1, 2, 7, 'pending'), (1, 2, 7, 'pending'), (1, 2, None, 'pending'), (1, 2, 7, 'rejected')]
+        for agency, student, project, status in rows:
+            db.session.execute(db.text(
+                'INSERT INTO join_requests (from_agency_id, to_student_id, project_id, status) '
+                'VALUES (:a, :s, :p, :st)'), {'a': agency, 's': student, 'p': project, 'st': status})
+        db.session.commit()
+    upgrade(app)
+    with app.app_context():
+        keys = [r.pending_key for r in JoinRequest.query.order_by(JoinRequest.id)]
+        assert keys == ['1:2:7:', None, '1:2::', None]
+
+if __name__ == "__main__":
+    test_schema_revision_is_head(app_factory())
+    test_migrations_match_models(app_factory())
+    test_startup_checks_schema_stamp(app_factory())
+    test_cli_checks_schema_except_schema_commands(app_factory())
+    test_trigram_reindex_is_batched_and_frozen(app_factory())
+    test_pending_key_backfill_keeps_duplicates(app_factory())
+    print("✅ Migrations are at head and match the models")
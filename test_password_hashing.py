@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Password Hashing Test
+Checks hashing runs on the worker processes, that a saturated hasher
+answers signup and login with 503 and Retry-After instead of queueing
+forever, and that logging in upgrades a hash made with outdated cost
+parameters (and leaves a current one alone).
+
+Run with: python -m pytest test_password_hashing.py   (or python test_password_hashing.py)
+"""
+
+from conftest import TEST_CONFIG, app_factory
+from werkzeug.security import generate_password_hash, check_password_hash
+from database import db, User
+from passwords import hash_password, verify_password
+
+METHOD = TEST_CONFIG['PASSWORD_HASH_METHOD']
+
+def signup(client, username):
+    return client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                            'password': 'password123', 'first_name': username.title(),
+                                            'last_name': 'Hash', 'role': 'student'})
+
+def login(client, username, password='password123'):
+    return client.post('/api/login', json={'email': f'{username}@example.com', 'password': password})
+
+def stored_hash(app, username):
+    with app.app_context():
+        return User.query.filter_by(username=username).one().password_hash
+
+def test_hashing_runs_on_worker_processes(make_app):
+    app = make_app('pool.db', PASSWORD_HASH_WORKERS=1)
+    client = app.test_client()
+    assert signup(client, 'pooled').status_code == 201
+    assert login(client, 'pooled').status_code == 200
+    assert login(client, 'pooled', 'wrong').status_code == 401
+    with app.app_context():
+        assert app.extensions['password_hash_pool'] is not None
+        pwhash = hash_password('secret')
+        assert pwhash.startswith(METHOD + '$')
+        assert verify_password(pwhash, 'secret') and not verify_password(pwhash, 'Secret')
+
+def test_saturated_hasher_answers_503(make_app):
+    app = make_app('busy.db', PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_QUEUE_TIMEOUT=0.05)
+    client = app.test_client()
+    assert signup(client, 'early').status_code == 201
+    slots = app.extensions['password_hash_slots']
+
+    # Another request holds the only slot
+    assert slots.acquire(timeout=1)
+    try:
+        for r in (login(client, 'early'), signup(client, 'late')):
+            assert r.status_code == 503, r.json
+            assert r.headers['Retry-After'] == '1'
+            assert 'try again' in r.json['error']
+    finally:
+        slots.release()
+
+    # Nothing was written while busy, and the slot is usable again
+    with app.app_context():
+        assert User.query.filter_by(username='late').first() is None
+    assert login(client, 'early').status_code == 200
+    assert signup(client, 'late').status_code == 201
+
+    # The cap is per app: a second app is not held up by this one's slots
+    other = make_app('other.db')
+    assert slots.acquire(timeout=1)
+    try:
+        assert signup(other.test_client(), 'elsewhere').status_code == 201
+    finally:
+        slots.release()
+
+def test_login_rehashes_outdated_hashes(make_app):
+    app = make_app('rehash.db')
+    client = app.test_client()
+    assert signup(client, 'current').status_code == 201
+    with app.app_context():
+        db.session.add(User(username='legacy', email='legacy@example.com', first_name='Legacy',
+                            last_name='Hash', role='student',
+                            password_hash=generate_password_hash('password123', 'pbkdf2:sha256:500')))
+        db.session.commit()
+
+    # A failed login does not touch the outdated hash
+    assert login(client, 'legacy', 'wrong').status_code == 401
+    assert stored_hash(app, 'legacy').startswith('pbkdf2:sha256:500$')
+
+    assert login(client, 'legacy').status_code == 200
+    upgraded = stored_hash(app, 'legacy')
+    assert upgraded.startswith(METHOD + '$')
+    assert check_password_hash(upgraded, 'password123')
+    assert login(client, 'legacy').status_code == 200
+    assert stored_hash(app, 'legacy') == upgraded
+
+    current = stored_hash(app, 'current')
+    assert login(client, 'current').status_code == 200
+    assert stored_hash(app, 'current') == current
+
+if __name__ == "__main__":
+    test_hashing_runs_on_worker_processes(app_factory())
+    test_saturated_hasher_answers_503(app_factory())
+    test_login_rehashes_outdated_hashes(app_factory())
+    print("✅ Password hashing is bounded, and outdated hashes are upgraded on login")
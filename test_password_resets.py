@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Password Reset Test
+Requests a reset, delivers the queued email through an in-memory transport
+and checks that the reset link is not left behind in outbound_emails once
+the email is sent or has failed for good, and that the maintenance job
+deletes finished emails after MAIL_RETENTION_DAYS. Also checks only a hash
+of each reset token is stored, that tokens are looked up by that hash and
+work once, and that used or expired tokens are purged.
+
+Run with: python -m pytest test_password_resets.py   (or python test_password_resets.py)
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from conftest import app_factory
+from database import db, OutboundEmail, PasswordReset
+from mailer import process_batch, purge_outbound_emails
+from maintenance import purge_password_resets
+from passwords import hash_reset_token
+
+class RecordingTransport:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def send(self, msg):
+        if self.fail:
+            raise ConnectionRefusedError('smtp down')
+        self.sent.append(msg)
+
+    def close(self):
+        pass
+
+def signup(client, username):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': 'Re', 'last_name': 'Set',
+                                         'role': 'external'})
+    assert r.status_code == 201, r.json
+    return r.json['user']
+
+def request_reset(client, email):
+    assert client.post('/api/forgot-password', json={'email': email}).status_code == 200
+
+def token_in(body):
+    return re.search(r'token=([\w-]+)', body).group(1)
+
+def queued_token(app):
+    with app.app_context():
+        email = OutboundEmail.query.filter_by(status='pending').order_by(OutboundEmail.id.desc()).first()
+        return token_in(email.body)
+
+def reset(client, token, password='newpassword1'):
+    return client.post('/api/reset-password', json={'token': token, 'password': password})
+
+def test_reset_link_is_cleared_once_sent(make_app):
+    app = make_app('sent.db')
+    client = app.test_client()
+    user = signup(client, 'forgetful')
+    request_reset(client, user['email'])
+
+    transport = RecordingTransport()
+    with app.app_context():
+        assert process_batch(transport) == 1
+        email = OutboundEmail.query.one()
+        assert email.status == 'sent' and email.body == ''
+    token = token_in(transport.sent[0].get_content())
+    r = client.post('/api/reset-password', json={'token': token, 'password': 'newpassword1'})
+    assert r.status_code == 200
+
+def test_reset_link_is_cleared_after_final_failure(make_app):
+    app = make_app('failed.db', MAIL_MAX_ATTEMPTS=1)
+    client = app.test_client()
+    user = signup(client, 'unlucky')
+    request_reset(client, user['email'])
+    with app.app_context():
+        process_batch(RecordingTransport(fail=True))
+        email = OutboundEmail.query.one()
+        assert email.status == 'failed' and email.body == '' and 'smtp down' in email.last_error
+
+def test_purge_outbound_emails(make_app):
+    app = make_app('purge.db', MAIL_RETENTION_DAYS=7)
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=8)
+        db.session.add_all([
+            OutboundEmail(to_address='a@example.com', subject='old sent', body='', status='sent', created_at=old),
+            OutboundEmail(to_address='b@example.com', subject='old failed', body='', status='failed', created_at=old),
+            # Finished before bodies were cleared on delivery
+            OutboundEmail(to_address='c@example.com', subject='recent sent', body='token=abc', status='sent'),
+            OutboundEmail(to_address='d@example.com', subject='old pending', body='token=def', status='pending',
+                          created_at=old),
+        ])
+        db.session.commit()
+
+        assert purge_outbound_emails(batch_size=1) == 2
+        left = {email.subject: email.body for email in OutboundEmail.query}
+        assert left == {'recent sent': '', 'old pending': 'token=def'}
+
+def test_reset_tokens_are_stored_hashed(make_app):
+    app = make_app('hashed.db')
+    client = app.test_client()
+    user = signup(client, 'hashed')
+    request_reset(client, user['email'])
+    first = queued_token(app)
+    with app.app_context():
+        record = PasswordReset.query.one()
+        assert record.token_hash == hash_reset_token(first) != first
+        assert len(record.token_hash) == 64
+        assert first not in str(db.session.execute(db.text('SELECT * FROM password_resets')).all())
+
+    # A new request supersedes the outstanding token
+    request_reset(client, user['email'])
+    token = queued_token(app)
+    assert token != first
+    with app.app_context():
+        assert [r.token_hash for r in PasswordReset.query] == [hash_reset_token(token)]
+    assert reset(client, first).status_code == 400
+    # The stored hash is not itself a token
+    assert reset(client, hash_reset_token(token)).status_code == 400
+
+    assert reset(client, token).status_code == 200
+    assert reset(client, token, 'anotherpass1').json['error'] == 'Invalid or expired token'
+    login = {'email': user['email'], 'password': 'newpassword1'}
+    assert client.post('/api/login', json=login).status_code == 200
+
+    # An expired token is refused even though it was never used
+    request_reset(client, user['email'])
+    expired = queued_token(app)
+    with app.app_context():
+        PasswordReset.query.filter_by(token_hash=hash_reset_token(expired)).one().expires_at = \
+            datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+    assert reset(client, expired).json['error'] == 'Token has expired'
+
+def test_purge_password_resets(make_app):
+    app = make_app('purge_resets.db')
+    client = app.test_client()
+    user_id = signup(client, 'purged')['id']
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            PasswordReset(user_id=user_id, token_hash=hash_reset_token('used'), used=True,
+                          expires_at=now + timedelta(hours=1)),
+            PasswordReset(user_id=user_id, token_hash=hash_reset_token('expired'),
+                          expires_at=now - timedelta(minutes=1)),
+            PasswordReset(user_id=user_id, token_hash=hash_reset_token('used and expired'), used=True,
+                          expires_at=now - timedelta(hours=2)),
+            PasswordReset(user_id=user_id, token_hash=hash_reset_token('live'),
+                          expires_at=now + timedelta(hours=1)),
+        ])
+        db.session.commit()
+
+        assert purge_password_resets(batch_size=2) == 3
+        assert [r.token_hash for r in PasswordReset.query] == [hash_reset_token('live')]
+        assert purge_password_resets() == 0
+    assert reset(client, 'live').status_code == 200
+
+if __name__ == "__main__":
+    test_reset_link_is_cleared_once_sent(app_factory())
+    test_reset_link_is_cleared_after_final_failure(app_factory())
+    test_purge_outbound_emails(app_factory())
+    test_reset_tokens_are_stored_hashed(app_factory())
+    test_purge_password_resets(app_factory())
+    print("✅ Reset links leave outbound_emails once delivered or failed; finished emails and tokens are purged")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Profiler Test
+Profiles single requests and Socket.IO events on demand (only with the
+operator's DEBUG_TOKEN, not for admins) and runs the continuous sampler briefly, checking that the stored profiles are
+collapsed stacks ("frame;frame;frame count") that flamegraph tools accept.
+
+Run with: python -m pytest test_profiler.py   (or python test_profiler.py)
+"""
+
+import os
+import re
+import time
+
+from conftest import app_factory
+
+_FOLDED_LINE = re.compile(r'^[^;\n]+(;[^;\n]+)* \d+$')
+DEBUG_TOKEN = 'operator-secret'
+DEBUG = {'X-Debug-Token': DEBUG_TOKEN}
+
+def spin():
+    """Busy route so the sampler has something to see"""
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+    return 'done'
+
+def profiled_app(make_app, directory, **overrides):
+    """App that profiles into a subdirectory of the test's directory and serves /api/spin"""
+    app = make_app('profiler.db', PROFILER_ENABLED=True, PROFILER_DIR=os.path.join(make_app.directory, directory),
+                   DEBUG_TOKEN=DEBUG_TOKEN, **overrides)
+    app.add_url_rule('/api/spin', 'spin', spin)
+    return app
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': 'Pro', 'last_name': 'File',
+                                         'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], r.json['access_token']
+
+def read_profile(client, name):
+    r = client.get(f'/api/debug/profiles/{name}', headers=DEBUG)
+    assert r.status_code == 200
+    lines = r.get_data(as_text=True).splitlines()
+    assert lines and all(_FOLDED_LINE.match(line) for line in lines), lines[:3]
+    return lines
+
+def test_request_profiles_need_the_debug_token(make_app):
+    app = profiled_app(make_app, 'requests')
+    client = app.test_client()
+    _, admin_token = signup(client, 'rootuser', 'admin')
+    # Anyone can sign up as admin, so the role alone gets nothing
+    admin = {'Authorization': f'Bearer {admin_token}'}
+
+    r = client.get('/api/spin', headers=dict(admin, **{'X-Profile': '1'}))
+    assert r.status_code == 200 and 'X-Profile-Id' not in r.headers
+    assert client.get('/api/debug/profiles', headers=admin).status_code == 403
+
+    r = client.get('/api/spin?profile=1', headers=DEBUG)
+    name = r.headers['X-Profile-Id']
+    assert [p['name'] for p in client.get('/api/debug/profiles', headers=DEBUG).json] == [name]
+    lines = read_profile(client, name)
+    assert all(line.startswith('GET /api/spin;') for line in lines)
+    assert any('spin (' in line for line in lines)
+    assert client.get('/api/debug/profiles/..%2Fprofiler.db', headers=DEBUG).status_code == 404
+
+def test_profiler_is_off_by_default():
+    from config import Config
+    assert not Config.PROFILER_ENABLED and not Config.DEBUG_TOKEN
+
+def test_socket_event_profile(make_app):
+    app = profiled_app(make_app, 'events', REALTIME_ENABLED=True)
+    client = app.test_client()
+    user_id, admin_token = signup(client, 'chatadmin', 'admin')
+    ws = client.post('/api/workspaces', json={'name': 'Prof'},
+                     headers={'Authorization': f'Bearer {admin_token}'}).json['workspace']['id']
+    sock = app.extensions['socketio'].test_client(app)
+
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': user_id, 'content': 'x', '_profile': admin_token})
+    assert not [e for e in sock.get_received() if e['name'] == 'profile']
+
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': user_id, 'content': 'y', '_profile': DEBUG_TOKEN})
+    profiles = [e['args'][0]['id'] for e in sock.get_received() if e['name'] == 'profile']
+    assert len(profiles) == 1
+    lines = read_profile(client, profiles[0])
+    assert all(line.startswith('socket send_message;') for line in lines)
+
+def test_continuous_sampling_and_retention(make_app):
+    app = profiled_app(make_app, 'continuous', PROFILER_CONTINUOUS=True, PROFILER_KEEP=2,
+                       PROFILER_CONTINUOUS_INTERVAL=0.01, PROFILER_CONTINUOUS_WINDOW=0.05)
+    time.sleep(0.5)
+    app.extensions['continuous_profiler'].stop()
+    directory = app.config['PROFILER_DIR']
+    files = sorted(os.listdir(directory))
+    assert len(files) == 2 and all('-continuous-' in name for name in files)
+    with open(os.path.join(directory, files[0]), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert any(line.startswith('thread MainThread;') for line in lines)
+    assert not any('continuous-profiler' in line for line in lines)
+
+if __name__ == "__main__":
+    test_request_profiles_need_the_debug_token(app_factory())
+    test_profiler_is_off_by_default()
+    test_socket_event_profile(app_factory())
+    test_continuous_sampling_and_retention(app_factory())
+    print("✅ The debug token profiles requests and events; the continuous sampler writes folded stacks")
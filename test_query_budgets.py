@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Query Budget Test
+Seeds a workspace with a page of messages, files and tasks, and gives the
+owner a page of workspaces, and asserts that the list routes stay within a
+fixed number of SQL statements however many rows they return (an N+1 loop fails here first). Also checks the
+opt-in Server-Timing header and the /api/debug/queries endpoint, which
+only answers to the operator's DEBUG_TOKEN.
+
+Run with: python -m pytest test_query_budgets.py   (or python test_query_budgets.py)
+"""
+
+import io
+import os
+
+from conftest import app_factory
+from database import db, Message
+from querystats import query_budget
+
+ROWS = 10
+
+# Statements per request, independent of ROWS (auth + membership + list + one batch of users)
+BUDGETS = {
+    '/api/workspaces/{ws}/messages': 4,
+    '/api/workspaces/{ws}/files': 4,
+    '/api/workspaces/{ws}/tasks': 4,
+    '/api/workspaces': 2,  # auth + memberships joined with their workspaces
+}
+
+DEBUG = {'X-Debug-Token': 'operator-secret'}
+
+STATS = {'QUERY_STATS_ENABLED': True, 'QUERY_STATS_SERVER_TIMING': True, 'DEBUG_TOKEN': DEBUG['X-Debug-Token'],
+         'IDENTITY_CACHE_TTL': 0}
+
+def signup(client, username, role='external'):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Budget', 'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def seed(app, client, headers):
+    ws = client.post('/api/workspaces', json={'name': 'Budget'}, headers=headers).json['workspace']['id']
+    for i in range(ROWS - 1):
+        client.post('/api/workspaces', json={'name': f'Budget {i}'}, headers=headers)
+    members = [signup(client, f'member{i}') for i in range(ROWS)]
+    with app.app_context():
+        for i, (member_id, _) in enumerate(members):
+            db.session.add(Message(workspace_id=ws, user_id=member_id, content=f'hello {i}'))
+        db.session.commit()
+    for i, (member_id, _) in enumerate(members):
+        client.post(f'/api/workspaces/{ws}/tasks', json={'title': f'task {i}', 'assigned_to': member_id},
+                    headers=headers)
+        client.post(f'/api/workspaces/{ws}/files', data={'file': (io.BytesIO(b'x'), f'f{i}.txt')},
+                    headers=headers, content_type='multipart/form-data')
+    return ws
+
+def test_list_routes_stay_within_budget(make_app):
+    app = make_app(**STATS)
+    os.chdir(make_app.directory)
+    client = app.test_client()
+    _, owner = signup(client, 'owner')
+    ws = seed(app, client, owner)
+    for route, budget in BUDGETS.items():
+        with query_budget(app, budget):
+            r = client.get(route.format(ws=ws), headers=owner)
+        assert r.status_code == 200, (route, r.json)
+        assert len(r.json) == ROWS, (route, len(r.json))
+
+def test_server_timing_and_debug_endpoint(make_app):
+    app = make_app(**STATS)
+    client = app.test_client()
+    _, user = signup(client, 'plain')
+    _, admin = signup(client, 'admin', role='admin')
+
+    r = client.get('/api/workspaces', headers=user)
+    timing = r.headers['Server-Timing']
+    assert timing.startswith('db;dur=') and 'queries' in timing and 'app;dur=' in timing
+
+    # The admin role is self-service, so it does not open the debug endpoints; the operator's token does
+    assert client.get('/api/debug/queries', headers=user).status_code == 403
+    assert client.get('/api/debug/queries', headers=admin).status_code == 403
+    assert client.get('/api/debug/queries', headers={'X-Debug-Token': 'guess'}).status_code == 403
+    stats = client.get('/api/debug/queries', headers=DEBUG).json
+    assert stats['endpoints']['GET /api/workspaces']['requests'] == 1
+    entry = next(e for e in stats['recent'] if e['name'] == 'GET /api/workspaces')
+    assert entry['queries'] == len(entry['statements']) > 0 and entry['status'] == 200
+
+def test_debug_output_is_off_by_default(make_app):
+    app = make_app(**dict(STATS, QUERY_STATS_ENABLED=False, QUERY_STATS_SERVER_TIMING=False, DEBUG_TOKEN=''))
+    client = app.test_client()
+    _, user = signup(client, 'quiet')
+    assert 'Server-Timing' not in client.get('/api/workspaces', headers=user).headers
+    # No token configured: nothing matches, not even an empty header
+    assert client.get('/api/debug/queries', headers={'X-Debug-Token': ''}).status_code == 403
+
+def test_budget_helper_reports_statements(make_app):
+    app = make_app(**STATS)
+    client = app.test_client()
+    _, user = signup(client, 'over')
+    try:
+        with query_budget(app, 0):
+            client.get('/api/workspaces', headers=user)
+    except AssertionError as e:
+        assert 'budget is 0' in str(e) and 'SELECT' in str(e)
+    else:
+        raise AssertionError('query_budget did not fail')
+
+if __name__ == "__main__":
+    test_list_routes_stay_within_budget(app_factory())
+    test_server_timing_and_debug_endpoint(app_factory())
+    test_debug_output_is_off_by_default(app_factory())
+    test_budget_helper_reports_statements(app_factory())
+    print("✅ List routes stay within their query budgets")
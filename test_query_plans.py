@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Query Plan Test
+Drives every API route and socket event in-process against a scratch SQLite
+database, runs EXPLAIN QUERY PLAN on each statement the routes issue and
+fails if any of them full-scans one of the large tables.
+
+Run with: python -m pytest test_query_plans.py   (or python test_query_plans.py)
+"""
+
+import io
+import os
+import re
+
+from conftest import app_factory
+from sqlalchemy import event
+from database import db
+
+# Tables that grow with usage; a full scan of any of these is a missing index
+LARGE_TABLES = {
+    'users', 'memberships', 'messages', 'files', 'tasks', 'projects', 'join_requests',
+    'project_submissions', 'project_reviews', 'user_trigrams', 'password_resets',
+    'revoked_tokens', 'outbound_emails',
+}
+
+# 'SCAN t', or 'SCAN t USING [COVERING] INDEX i': walking a whole index is as unbounded
+# as walking the table. Bounded lookups show up as 'SEARCH t ...' instead.
+_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?$')
+_LIMIT_RE = re.compile(r'\bLIMIT (?:\?|\d+)(?: OFFSET (?:\?|\d+))?\s*$')
+
+def capture_statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+def exercise_routes(app):
+    """Hit every route once with realistic data"""
+    c = app.test_client()
+
+    def signup(username, role='student'):
+        r = c.post('/api/signup', json={'username': username, 'email': f'{username}@example.com', 'password': 'password123',
+                                        'first_name': username.title(), 'last_name': 'Tester', 'role': role})
+        assert r.status_code == 201, r.json
+        return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+    agency_id, agency = signup('agency', 'external')
+    student_id, student = signup('student')
+    other_id, other = signup('other')
+    c.post('/api/login', json={'email': 'agency@example.com', 'password': 'password123'})
+    c.get('/api/profile', headers=student)
+    c.put('/api/profile', json={'bio': 'hi', 'skills': 'python'}, headers=student)
+
+    ws = c.post('/api/workspaces', json={'name': 'Plans'}, headers=agency).json['workspace']['id']
+    c.get('/api/workspaces', headers=agency)
+    c.post('/api/workspaces/%d/members' % ws, json={'email': 'other@example.com'}, headers=agency)
+    c.post('/api/workspaces/%d/invite-students' % ws, json={'student_ids': [student_id]}, headers=agency)
+    c.get('/api/workspaces/%d/invitations' % ws, headers=agency)
+    invitation = c.get('/api/my-invitations', headers=student).json[0]['id']
+    c.get('/api/my-sent-invitations', headers=agency)
+    c.post('/api/invitations/%d/respond' % invitation, json={'action': 'accept'}, headers=student)
+    c.get('/api/workspaces/%d/members' % ws, headers=agency)
+
+    task = c.post('/api/workspaces/%d/tasks' % ws, json={'title': 'T', 'assigned_to': student_id}, headers=agency).json['task']['id']
+    c.get('/api/workspaces/%d/tasks' % ws, headers=student)
+    c.put('/api/tasks/%d' % task, json={'status': 'completed'}, headers=student)
+    c.delete('/api/tasks/%d' % task, headers=agency)
+
+    f = c.post('/api/workspaces/%d/files' % ws, data={'file': (io.BytesIO(b'data'), 'notes.txt')},
+               headers=agency, content_type='multipart/form-data').json['file']['id']
+    c.get('/api/workspaces/%d/files' % ws, headers=student)
+    c.get('/api/files/%d/download' % f, headers=student)
+
+    c.get('/api/students', headers=agency)
+    c.get('/api/students/%d' % student_id, headers=agency)
+    c.get('/api/users/search?q=studnt', headers=agency)
+
+    project = c.post('/api/projects', json={'title': 'P', 'workspace_id': ws}, headers=agency).json['id']
+    c.post('/api/requests', json={'to_student_id': student_id, 'project_id': project, 'workspace_id': ws}, headers=agency)
+    c.post('/api/requests/bulk', json={'student_ids': [student_id, other_id], 'project_id': project}, headers=agency)
+    c.get('/api/requests?status=pending', headers=agency)
+    req = c.get('/api/requests', headers=student).json[0]['id']
+    c.post('/api/requests/%d/respond' % req, json={'action': 'accept'}, headers=student)
+    sub = c.post('/api/projects/%d/submit' % project, json={'content_url': 'http://x'}, headers=student).json['submission_id']
+    c.get('/api/projects', headers=student)
+    c.get('/api/projects', headers=agency)
+    c.get('/api/projects?status=submitted', headers=agency)
+    c.get('/api/review-queue', headers=agency)
+    c.post('/api/submissions/%d/review' % sub, json={'status': 'approved'}, headers=agency)
+
+    sock = app.extensions['socketio'].test_client(app)
+    sock.emit('join_workspace', {'workspace_id': ws, 'user_id': student_id})
+    sock.emit('send_message', {'workspace_id': ws, 'user_id': student_id, 'content': 'hello'})
+    c.get('/api/workspaces/%d/messages' % ws, headers=student)
+    c.get('/api/workspaces/%d/messages/export' % ws, headers=student).get_data()
+
+    c.post('/api/forgot-password', json={'email': 'other@example.com'})
+    c.post('/api/reset-password', json={'token': 'not-a-token', 'password': 'password456'})
+    c.put('/api/me/role', json={'role': 'student'}, headers=other)
+    c.post('/api/logout', headers=other)
+
+def scanned_tables(statement, plan):
+    """Large tables the plan walks in full.
+
+    One exception: a top-level walk of an index that already yields the ORDER BY
+    of a LIMITed query (a keyset page) stops after LIMIT rows, so it is bounded.
+    """
+    keyset_page = (_LIMIT_RE.search(statement) is not None
+                   and not any(parent == 0 and detail == 'USE TEMP B-TREE FOR ORDER BY'
+                               for _, parent, _, detail in plan))
+    tables = []
+    for _, parent, _, detail in plan:
+        match = _SCAN_RE.match(detail)
+        if not match or match.group(1) not in LARGE_TABLES:
+            continue
+        if match.group(2) and parent == 0 and keyset_page:
+            continue
+        tables.append(match.group(1))
+    return tables
+
+def full_scans(app, statements):
+    """Return (table, statement) for every statement whose plan scans a large table"""
+    problems = []
+    seen = set()
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            for statement, parameters in statements:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                for table in scanned_tables(statement, plan):
+                    problems.append((table, statement))
+        finally:
+            conn.close()
+    return problems
+
+def test_routes_do_not_full_scan_large_tables(make_app):
+    app = make_app('plans.db', REALTIME_ENABLED=True)
+    os.chdir(make_app.directory)
+    statements = capture_statements(app)
+    exercise_routes(app)
+    assert statements, 'no statements captured'
+    problems = full_scans(app, statements)
+    assert not problems, 'Full table scans:\n' + '\n\n'.join(f"[{t}] {s}" for t, s in problems)
+
+def test_index_scans_count_as_full_scans(make_app):
+    app = make_app('plans.db')
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+
+            def scans(statement):
+                return scanned_tables(statement, cursor.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall())
+
+            # A covering index walked end to end, and a plain table scan
+            assert scans("SELECT count(*) FROM projects") == ['projects']
+            assert scans("SELECT id FROM projects WHERE title = 'x'") == ['projects']
+            # Ordered by the index but unbounded, or bounded but sorted afterwards
+            assert scans("SELECT id FROM projects ORDER BY created_at DESC") == ['projects']
+            assert scans("SELECT id FROM projects ORDER BY title LIMIT 10") == ['projects']
+            # A keyset page stops after LIMIT rows of the index
+            assert scans("SELECT id FROM projects ORDER BY created_at DESC LIMIT 10") == []
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    test_routes_do_not_full_scan_large_tables(app_factory())
+    test_index_scans_count_as_full_scans(app_factory())
+    print("✅ No full table scans on large tables")
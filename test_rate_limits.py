@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Rate Limit Test
+Floods send_message from a socket whose user is not a member of the
+workspace and checks that members can still post: only members reach the
+per-connection and per-workspace buckets. Then exhausts one member
+connection and checks that another connection is unaffected, and that
+unauthenticated sockets posting as a member cannot drain the workspace
+bucket of connections that authenticated with their token. Also checks
+login and forgot-password answer 429 with Retry-After, and that apps
+sharing a sqlite:/// store (one per worker) share their buckets.
+
+Run with: python -m pytest test_rate_limits.py   (or python test_rate_limits.py)
+"""
+
+import os
+
+from conftest import app_factory
+
+LIMITS = {
+    'REALTIME_ENABLED': True,
+    'RATELIMIT_ENABLED': True,
+    'RATELIMITS': {'send_message_user': '3/60', 'send_message_workspace': '5/60',
+                   'login': '3/60', 'forgot_password': '2/3600'},
+}
+
+def signup(client, username):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': 'Rate', 'last_name': 'Limit',
+                                         'role': 'external'})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def connect(app, workspace_id, user_id, token=None):
+    sock = app.extensions['socketio'].test_client(app, auth={'token': token} if token else None)
+    sock.emit('join_workspace', {'workspace_id': workspace_id, 'user_id': user_id})
+    sock.get_received()
+    return sock
+
+def send(sock, workspace_id, user_id, content='hi'):
+    sock.emit('send_message', {'workspace_id': workspace_id, 'user_id': user_id, 'content': content})
+    return [(event['name'], event['args'][0]) for event in sock.get_received()]
+
+def test_non_member_flood_does_not_limit_members(make_app):
+    app = make_app(**LIMITS)
+    client = app.test_client()
+    member_id, headers = signup(client, 'member')
+    outsider_id, _ = signup(client, 'outsider')
+    ws = client.post('/api/workspaces', json={'name': 'Limited'}, headers=headers).json['workspace']['id']
+
+    attacker = app.extensions['socketio'].test_client(app)
+    for _ in range(50):
+        events = send(attacker, ws, outsider_id)
+        assert events == [('error', {'msg': 'Access denied'})]
+
+    member = app.extensions['socketio'].test_client(app)
+    member.emit('join_workspace', {'workspace_id': ws, 'user_id': member_id})
+    member.get_received()
+    events = send(member, ws, member_id)
+    assert [name for name, _ in events] == ['new_message']
+
+    # The per-sender bucket belongs to the connection: exhausting one leaves another untouched
+    for _ in range(2):
+        send(member, ws, member_id)
+    name, payload = send(member, ws, member_id)[0]
+    assert name == 'error' and payload['msg'] == 'Rate limit exceeded' and payload['retry_after'] > 0
+    other = app.extensions['socketio'].test_client(app)
+    other.emit('join_workspace', {'workspace_id': ws, 'user_id': member_id})
+    other.get_received()
+    assert [name for name, _ in send(other, ws, member_id)] == ['new_message']
+
+def test_spoofed_sender_cannot_drain_authenticated_bucket(make_app):
+    app = make_app('spoof.db', **LIMITS)
+    client = app.test_client()
+    member_id, headers = signup(client, 'victim')
+    other_id, _ = signup(client, 'bystander')
+    ws = client.post('/api/workspaces', json={'name': 'Spoofed'}, headers=headers).json['workspace']['id']
+    token = headers['Authorization'].split()[1]
+
+    # Unauthenticated sockets naming the member use up the unauthenticated workspace bucket
+    sent = []
+    for _ in range(3):
+        spoofer = connect(app, ws, member_id)
+        sent += [name for _ in range(3) for name, _ in send(spoofer, ws, member_id)]
+    assert sent.count('new_message') == 5
+
+    member = connect(app, ws, member_id, token)
+    assert [name for name, _ in send(member, ws, member_id)] == ['new_message']
+    # An authenticated connection speaks only for its own user
+    assert send(member, ws, other_id) == [('error', {'msg': 'Access denied'})]
+
+    refused = app.extensions['socketio'].test_client(app, auth={'token': 'not-a-token'})
+    assert not refused.is_connected()
+
+def test_login_and_forgot_password_answer_429(make_app):
+    app = make_app('auth.db', **LIMITS)
+    client = app.test_client()
+    signup(client, 'locked')
+    login = {'email': 'locked@example.com', 'password': 'wrong'}
+    assert [client.post('/api/login', json=login).status_code for _ in range(3)] == [401] * 3
+    r = client.post('/api/login', json=login)
+    assert r.status_code == 429 and 0 < int(r.headers['Retry-After']) <= 20, r.headers
+
+    forgot = {'email': 'locked@example.com'}
+    assert [client.post('/api/forgot-password', json=forgot).status_code for _ in range(2)] == [200, 200]
+    r = client.post('/api/forgot-password', json=forgot)
+    assert r.status_code == 429 and 0 < int(r.headers['Retry-After']) <= 1800, r.headers
+    # Other clients (keyed by IP) are unaffected
+    other = client.post('/api/login', json=login, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 401
+
+def test_sqlite_store_is_shared_between_workers(make_app):
+    store = f"sqlite:///{os.path.join(make_app.directory, 'shared', 'buckets.db')}"
+    workers = [make_app('shared.db', RATELIMIT_STORAGE_URL=store, **LIMITS) for _ in range(2)]
+    login = {'email': 'nobody@example.com', 'password': 'password123'}
+    statuses = [workers[i % 2].test_client().post('/api/login', json=login).status_code for i in range(4)]
+    assert statuses == [401, 401, 401, 429]
+    assert workers[0].test_client().post('/api/login', json=login).status_code == 429
+
+if __name__ == "__main__":
+    test_non_member_flood_does_not_limit_members(app_factory())
+    test_spoofed_sender_cannot_drain_authenticated_bucket(app_factory())
+    test_login_and_forgot_password_answer_429(app_factory())
+    test_sqlite_store_is_shared_between_workers(app_factory())
+    print("✅ Rate limits apply per client, and only members are charged against the chat limits")
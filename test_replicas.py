@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Read Replica Test
+Runs the app against a primary SQLite file and a second SQLite file standing
+in for a read replica. "Replication" is an explicit copy, so the replica is
+stale in between and the test can tell which database a request read from.
+
+Run with: python -m pytest test_replicas.py   (or python test_replicas.py)
+"""
+
+import os
+import sqlite3
+import time
+
+from conftest import app_factory
+from sqlalchemy import event
+from database import db
+
+STICKY_SECONDS = 0.5
+
+def replica_app(make_app):
+    """App on primary.db with replica.db as its one read replica"""
+    replica = os.path.join(make_app.directory, 'replica.db')
+    return make_app('primary.db', DATABASE_REPLICA_URLS=[f"sqlite:///{replica}"],
+                    DB_REPLICA_STICKY_SECONDS=STICKY_SECONDS)
+
+def replicate(app):
+    """Copy the primary onto the replica, like a replica catching up"""
+    with app.app_context():
+        db.engines['replica_0'].dispose()
+    primary, replica = (url.removeprefix('sqlite:///') for url in
+                        (app.config['SQLALCHEMY_DATABASE_URI'], app.config['DATABASE_REPLICA_URLS'][0]))
+    src, dst = sqlite3.connect(primary), sqlite3.connect(replica)
+    src.backup(dst)
+    src.close()
+    dst.close()
+
+def count_queries(app, key):
+    counter = {'n': 0}
+    with app.app_context():
+        @event.listens_for(db.engines[key], 'before_cursor_execute')
+        def _count(*args):
+            counter['n'] += 1
+    return counter
+
+def signup(client, username):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Replica', 'role': 'external'})
+    assert r.status_code == 201, r.json
+    return {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def test_reads_go_to_replica_with_read_your_writes(make_app):
+    app = replica_app(make_app)
+    client = app.test_client()
+    alice = signup(client, 'alice')
+    bob = signup(client, 'bob')
+    replicate(app)
+    time.sleep(STICKY_SECONDS)
+    on_replica = count_queries(app, 'replica_0')
+    on_primary = count_queries(app, None)
+
+    # Bob has not written recently: his reads use the replica
+    assert client.get('/api/workspaces', headers=bob).status_code == 200
+    assert on_replica['n'] > 0
+
+    # Alice writes; her next read sees the write because it stays on the primary
+    r = client.post('/api/workspaces', json={'name': 'Fresh'}, headers=alice, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert r.status_code == 201, r.json
+    before = on_replica['n']
+    r = client.get('/api/workspaces', headers=alice, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert [w['name'] for w in r.json] == ['Fresh']
+    assert on_replica['n'] == before
+
+    # Once the window has passed her reads go back to the (stale) replica
+    time.sleep(STICKY_SECONDS)
+    r = client.get('/api/workspaces', headers=alice, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert r.json == []
+    assert on_replica['n'] > before
+
+    # ...until it catches up
+    replicate(app)
+    r = client.get('/api/workspaces', headers=alice, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert [w['name'] for w in r.json] == ['Fresh']
+    assert on_primary['n'] > 0
+
+def test_stickiness_is_per_user_not_per_address(make_app):
+    app = replica_app(make_app)
+    client = app.test_client()
+    carol = signup(client, 'carol')
+    dave = signup(client, 'dave')
+    replicate(app)
+    time.sleep(STICKY_SECONDS)
+    on_replica = count_queries(app, 'replica_0')
+    proxy = {'REMOTE_ADDR': '10.0.0.254'}  # both behind one reverse proxy or NAT
+
+    r = client.post('/api/workspaces', json={'name': 'Carols'}, headers=carol, environ_base=proxy)
+    assert r.status_code == 201 and 'db_sticky' not in r.headers.get('Set-Cookie', '')
+    before = on_replica['n']
+    assert client.get('/api/workspaces', headers=dave, environ_base=proxy).status_code == 200
+    assert on_replica['n'] > before
+    before = on_replica['n']
+    client.get('/api/workspaces', headers=carol, environ_base=proxy)
+    assert on_replica['n'] == before
+
+def test_anonymous_writer_gets_a_sticky_cookie(make_app):
+    app = replica_app(make_app)
+    client = app.test_client()
+    r = client.post('/api/signup', json={'username': 'erin', 'email': 'erin@example.com',
+                                         'password': 'password123', 'first_name': 'Erin',
+                                         'last_name': 'Replica', 'role': 'external'})
+    assert r.status_code == 201
+    cookie = r.headers['Set-Cookie']
+    assert cookie.startswith('db_sticky=') and 'HttpOnly' in cookie and 'Max-Age=1' in cookie
+    token = client.get_cookie('db_sticky').value
+    assert app.extensions['recent_writers'].recent([f'anon:{token}'], STICKY_SECONDS)
+    assert not app.extensions['recent_writers'].recent(['anon:someone-else'], STICKY_SECONDS)
+
+def test_replica_rejects_writes(make_app):
+    app = replica_app(make_app)
+    replicate(app)
+    with app.app_context():
+        with db.engines['replica_0'].connect() as conn:
+            try:
+                conn.exec_driver_sql("DELETE FROM users")
+            except Exception as e:
+                assert 'readonly' in str(e).lower()
+            else:
+                raise AssertionError('replica accepted a write')
+
+if __name__ == "__main__":
+    test_reads_go_to_replica_with_read_your_writes(app_factory())
+    test_stickiness_is_per_user_not_per_address(app_factory())
+    test_anonymous_writer_gets_a_sticky_cookie(app_factory())
+    test_replica_rejects_writes(app_factory())
+    print("✅ GET routes read from the replica, writers read their own writes")
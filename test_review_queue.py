@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Review Queue Test
+Fills two agencies' projects with submissions (some sharing a timestamp)
+and checks GET /api/review-queue lists only the caller's unreviewed
+submissions, oldest first with ties broken by id, pages through them with
+the cursor without skipping or repeating one, and drops a submission as
+soon as it is reviewed.
+
+Run with: python -m pytest test_review_queue.py   (or python test_review_queue.py)
+"""
+
+from datetime import datetime, timedelta
+
+from conftest import app_factory
+from database import db, ProjectSubmission
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Queue', 'role': role})
+    assert r.status_code == 201, r.json
+    return {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def create_project(client, headers, title):
+    ws = client.post('/api/workspaces', json={'name': title}, headers=headers).json['workspace']['id']
+    r = client.post('/api/projects', json={'title': title, 'workspace_id': ws}, headers=headers)
+    assert r.status_code == 201, r.json
+    return r.json['id']
+
+def submit(client, headers, project_id, created_at, app):
+    r = client.post(f'/api/projects/{project_id}/submit', json={'content_url': 'https://example.com/x'},
+                    headers=headers)
+    assert r.status_code == 201, r.json
+    submission_id = r.json['submission_id']
+    with app.app_context():
+        db.session.get(ProjectSubmission, submission_id).created_at = created_at
+        db.session.commit()
+    return submission_id
+
+def walk(client, headers, **params):
+    ids, cursor = [], None
+    while True:
+        r = client.get('/api/review-queue', query_string=dict(params, cursor=cursor) if cursor else params,
+                       headers=headers)
+        assert r.status_code == 200, r.json
+        ids.extend(item['id'] for item in r.json)
+        cursor = r.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+
+def test_review_queue_order_and_scope(make_app):
+    app = make_app()
+    client = app.test_client()
+    agency = signup(client, 'agency', 'external')
+    rival = signup(client, 'rival', 'external')
+    student = signup(client, 'student', 'student')
+    mine, also_mine = create_project(client, agency, 'Mine'), create_project(client, agency, 'Also mine')
+    theirs = create_project(client, rival, 'Theirs')
+
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    # Submitted out of order; two pairs share a timestamp
+    newest = submit(client, student, mine, t0 + timedelta(minutes=3), app)
+    tie_a = submit(client, student, also_mine, t0 + timedelta(minutes=1), app)
+    tie_b = submit(client, student, mine, t0 + timedelta(minutes=1), app)
+    oldest = submit(client, student, also_mine, t0, app)
+    late_a = submit(client, student, mine, t0 + timedelta(minutes=2), app)
+    late_b = submit(client, student, also_mine, t0 + timedelta(minutes=2), app)
+    other = submit(client, student, theirs, t0 - timedelta(minutes=5), app)
+
+    expected = [oldest, tie_a, tie_b, late_a, late_b, newest]
+    r = client.get('/api/review-queue', headers=agency)
+    assert [item['id'] for item in r.json] == expected
+    assert r.json[0]['project'] == {'id': also_mine, 'title': 'Also mine'}
+    assert r.json[0]['student']['name'] == 'Student Queue'
+    # Pages of two split both ties without skipping or repeating a submission
+    assert walk(client, agency, limit=2) == expected
+    assert walk(client, agency, limit=2, project_id=mine) == [tie_b, late_a, newest]
+    assert walk(client, rival) == [other]
+
+    # Reviewed submissions leave the queue
+    assert client.post(f'/api/submissions/{tie_a}/review', json={'status': 'approved'},
+                       headers=agency).status_code == 201
+    assert client.post(f'/api/submissions/{oldest}/review', json={'status': 'rework'},
+                       headers=agency).status_code == 201
+    assert walk(client, agency, limit=2) == [tie_b, late_a, late_b, newest]
+
+    assert client.get('/api/review-queue', headers=student).status_code == 403
+    assert client.get('/api/review-queue?cursor=bogus', headers=agency).status_code == 400
+
+if __name__ == "__main__":
+    test_review_queue_order_and_scope(app_factory())
+    print("✅ Review queue lists the caller's unreviewed submissions, oldest first")
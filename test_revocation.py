@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Token Revocation Test
+Logs one token out from several threads at once (a double-clicked logout
+button, or two tabs) and checks no request fails with a 500, the token is
+revoked once, and it is rejected afterwards. Also revokes the same jti
+twice through the revocation list directly, as two workers would, and
+checks expired revocations are purged by the maintenance job, never on a
+request's token check.
+
+Run with: python -m pytest test_revocation.py   (or python test_revocation.py)
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from conftest import app_factory
+from database import db, RevokedToken
+from maintenance import JOBS
+from revocation import RevocationList, purge_expired_revocations
+
+def test_concurrent_logouts_of_one_token(make_app):
+    app = make_app()
+    r = app.test_client().post('/api/signup', json={'username': 'leaver', 'email': 'leaver@example.com',
+                                                    'password': 'password123', 'first_name': 'Lea',
+                                                    'last_name': 'Ver', 'role': 'external'})
+    headers = {'Authorization': f"Bearer {r.json['access_token']}"}
+    barrier = threading.Barrier(6)
+    statuses = []
+
+    def logout():
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post('/api/logout', headers=headers).status_code)
+
+    threads = [threading.Thread(target=logout) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Logouts that passed the blocklist check before the first commit succeed too
+    assert 500 not in statuses and 200 in statuses, statuses
+    assert set(statuses) <= {200, 401}
+    assert app.test_client().get('/api/workspaces', headers=headers).status_code == 401
+    with app.app_context():
+        assert RevokedToken.query.count() == 1
+
+def test_duplicate_revoke_is_not_an_error(make_app):
+    app = make_app()
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    with app.app_context():
+        first, second = RevocationList(), RevocationList()  # two worker processes
+        first.revoke('same-jti', None, expires_at)
+        second.revoke('same-jti', None, expires_at)
+        assert second.is_revoked('same-jti')
+        assert RevokedToken.query.filter_by(jti='same-jti').count() == 1
+
+def test_expired_revocations_are_purged_by_maintenance(make_app):
+    app = make_app()
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([RevokedToken(jti=f'old-{i}', expires_at=now - timedelta(minutes=1)) for i in range(3)]
+                           + [RevokedToken(jti='live', expires_at=now + timedelta(hours=1))])
+        db.session.commit()
+        # A request's blocklist check syncs the list but leaves the table alone
+        assert RevocationList().is_revoked('live')
+        assert RevokedToken.query.filter(RevokedToken.jti.like('old-%')).count() == 3
+
+        assert purge_expired_revocations in [fn for fn, _ in JOBS]
+        purge_expired_revocations(batch_size=2)
+        assert not RevokedToken.query.filter(RevokedToken.jti.like('old-%')).count()
+        assert RevokedToken.query.filter_by(jti='live').count() == 1
+
+if __name__ == "__main__":
+    test_concurrent_logouts_of_one_token(app_factory())
+    test_duplicate_revoke_is_not_an_error(app_factory())
+    test_expired_revocations_are_purged_by_maintenance(app_factory())
+    print("✅ Concurrent logouts of one token all succeed and revoke it once")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+User Search Test
+Checks that the role filter and inactive users are applied before the
+candidate limit (so a query whose best matches have another role still
+finds matching students) and that names outside ASCII are indexed and
+matched case-insensitively.
+
+Run with: python -m pytest test_search.py   (or python test_search.py)
+"""
+
+from conftest import app_factory
+from database import db, User
+from search import search_users, trigrams
+
+def add_user(username, first_name, last_name, role, is_active=True):
+    user = User(username=username, email=f'{username}@example.com', password_hash='x',
+                first_name=first_name, last_name=last_name, role=role, is_active=is_active)
+    db.session.add(user)
+    return user
+
+def test_role_filter_applies_before_limit(make_app):
+    app = make_app('roles.db')
+    with app.app_context():
+        # Exact matches with other roles outnumber the candidate limit (limit * 5)
+        for i in range(15):
+            add_user(f'ext{i}', 'Johnson', 'Johnson', 'external')
+        add_user('stud1', 'Johnsen', 'Lee', 'student')
+        add_user('stud2', 'Johnston', 'Park', 'student')
+        add_user('gone', 'Johnson', 'Gone', 'student', is_active=False)
+        db.session.commit()
+
+        results = search_users('johnson', limit=2, role='student')
+        assert sorted(u.username for u, _ in results) == ['stud1', 'stud2']
+        assert all(u.is_active for u, _ in search_users('johnson', limit=50))
+
+def test_non_ascii_names(make_app):
+    assert trigrams('Łukasz') == trigrams('łukasz') and ' łu' in trigrams('Łukasz')
+    assert trigrams('Straße') == trigrams('STRASSE')
+    assert trigrams('john_doe') == trigrams('john doe')
+
+    app = make_app('unicode.db')
+    with app.app_context():
+        add_user('lukasz', 'Łukasz', 'Wójcik', 'student')
+        add_user('zoe', 'Zoë', 'Müller', 'student')
+        add_user('ivan', 'Иван', 'Петров', 'student')
+        db.session.commit()
+
+        assert [u.username for u, _ in search_users('ŁUKASZ')] == ['lukasz']
+        exact, = search_users('Wójcik')
+        unaccented, = search_users('wojcik')  # a missing accent is just another typo
+        assert exact[0].username == unaccented[0].username == 'lukasz' and exact[1] > unaccented[1]
+        assert [u.username for u, _ in search_users('Muller Zoë')] == ['zoe']
+        assert [u.username for u, _ in search_users('петров')] == ['ivan']
+
+if __name__ == "__main__":
+    test_role_filter_applies_before_limit(app_factory())
+    test_non_ascii_names(app_factory())
+    print("✅ Search filters by role before the candidate limit and indexes non-ASCII names")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Slow Query Log Test
+Runs the app with SLOW_QUERY_MS=0 so every statement counts as slow, then
+reads the JSON-lines log: each statement is written once with its plan,
+parameter types and route, repeats are folded into a summary line and the
+file rotates at SLOW_QUERY_LOG_MAX_BYTES.
+
+Run with: python -m pytest test_slow_queries.py   (or python test_slow_queries.py)
+"""
+
+import json
+import os
+
+from conftest import app_factory
+from slowlog import normalize, parameter_shape
+
+SLOW = {'SLOW_QUERY_MS': 0, 'IDENTITY_CACHE_TTL': 0}
+
+def read_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def signup(client, username):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': 'Slow', 'last_name': 'Query',
+                                         'role': 'external'})
+    assert r.status_code == 201, r.json
+    return {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def test_slow_queries_are_logged_once_and_summarized(make_app):
+    path = os.path.join(make_app.directory, 'slow.log')
+    app = make_app(SLOW_QUERY_LOG=path, **SLOW)
+    client = app.test_client()
+    headers = signup(client, 'slowpoke')
+    for _ in range(5):
+        assert client.get('/api/workspaces', headers=headers).status_code == 200
+    app.extensions['slow_query_log'].close()
+
+    records = read_log(path)
+    memberships = [r for r in records if r['event'] == 'slow_query' and 'FROM memberships' in r['sql']
+                   and r['route'] == 'GET /api/workspaces']
+    assert len(memberships) == 1
+    first = memberships[0]
+    assert first['plan'] and any('memberships' in row for row in first['plan'])
+    # Types only, never values
+    assert first['parameters'] and all(v in ('int', 'str[8]') for v in first['parameters'])
+    summaries = [r for r in records if r['event'] == 'slow_query_summary' and r['sql'] == first['sql']]
+    assert len(summaries) == 1 and summaries[0]['count'] == 5
+    assert summaries[0]['routes'] == {'GET /api/workspaces': 5}
+
+def test_log_rotates(make_app):
+    path = os.path.join(make_app.directory, 'rotating.log')
+    app = make_app(SLOW_QUERY_LOG=path, SLOW_QUERY_LOG_MAX_BYTES=2000, SLOW_QUERY_LOG_BACKUPS=2, SLOW_QUERY_WINDOW=0, **SLOW)
+    client = app.test_client()
+    headers = signup(client, 'rotator')
+    for _ in range(20):
+        client.get('/api/workspaces', headers=headers)
+    app.extensions['slow_query_log'].close()
+    assert os.path.exists(path + '.1') and os.path.exists(path + '.2') and not os.path.exists(path + '.3')
+
+def test_shapes_and_normalization():
+    assert normalize('SELECT *\n  FROM users WHERE id IN (?, ?, ?)') == 'SELECT * FROM users WHERE id IN (...)'
+    assert normalize('SELECT * FROM users WHERE id IN (?)') == 'SELECT * FROM users WHERE id IN (?)'
+    assert parameter_shape(('alice@example.com', 3, None)) == ['str[17]', 'int', 'NoneType']
+    assert parameter_shape({'email': 'x'}) == {'email': 'str[1]'}
+    assert parameter_shape([(1, 'a'), (2, 'b')], executemany=True) == {'rows': 2, 'row': ['int', 'str[1]']}
+
+if __name__ == "__main__":
+    test_slow_queries_are_logged_once_and_summarized(app_factory())
+    test_log_rotates(app_factory())
+    test_shapes_and_normalization()
+    print("✅ Slow queries are logged with plans, deduplicated and rotated")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Student Directory Test
+Checks that a profile write rebuilds only that student's snapshot (and the
+listing), that role changes add or drop a student, and that invalidating
+the directory does not wait for a rebuild that is querying the database.
+
+Run with: python -m pytest test_student_directory.py   (or python test_student_directory.py)
+"""
+
+import threading
+
+from conftest import app_factory
+from sqlalchemy import event
+from database import db
+
+def signup(client, username, role):
+    r = client.post('/api/signup', json={'username': username, 'email': f'{username}@example.com',
+                                         'password': 'password123', 'first_name': username.title(),
+                                         'last_name': 'Directory', 'role': role})
+    assert r.status_code == 201, r.json
+    return r.json['user']['id'], {'Authorization': f"Bearer {r.json['access_token']}"}
+
+def test_profile_write_rebuilds_one_student(make_app):
+    app = make_app()
+    client = app.test_client()
+    ids = {}
+    for name in ('amy', 'ben', 'cat'):
+        ids[name] = signup(client, name, 'student')
+    _, agency = signup(client, 'agency', 'external')
+    directory = app.extensions['student_directory']
+
+    r = client.get('/api/students', headers=agency)
+    assert [s['first_name'] for s in r.json] == ['Amy', 'Ben', 'Cat']
+    etag = r.headers['ETag']
+    before = dict(directory._students)
+
+    amy_id, amy = ids['amy']
+    assert client.put('/api/profile', json={'skills': 'sql'}, headers=amy).status_code == 200
+    r = client.get('/api/students', headers=agency)
+    assert r.headers['ETag'] != etag
+    assert [s['skills'] for s in r.json if s['id'] == amy_id] == ['sql']
+    assert client.get(f'/api/students/{amy_id}', headers=agency).json['skills'] == 'sql'
+    # Only Amy's snapshot was rebuilt
+    for name in ('ben', 'cat'):
+        assert directory._students[ids[name][0]] is before[ids[name][0]]
+    assert directory._students[amy_id] is not before[amy_id]
+
+    # Switching role drops a student from the listing, switching back adds them again
+    ben_id, ben = ids['ben']
+    client.put('/api/me/role', json={'role': 'external'}, headers=ben)
+    assert ben_id not in [s['id'] for s in client.get('/api/students', headers=agency).json]
+    assert client.get(f'/api/students/{ben_id}', headers=agency).status_code == 404
+    client.put('/api/me/role', json={'role': 'student'}, headers=ben)
+    assert [s['first_name'] for s in client.get('/api/students', headers=agency).json] == ['Amy', 'Ben', 'Cat']
+
+def test_invalidate_does_not_wait_for_a_rebuild(make_app):
+    app = make_app()
+    client = app.test_client()
+    student_id, student = signup(client, 'dan', 'student')
+    _, agency = signup(client, 'agency2', 'external')
+    directory = app.extensions['student_directory']
+    client.get('/api/students', headers=agency)
+
+    querying, release = threading.Event(), threading.Event()
+
+    def hold(conn, cursor, statement, *args):
+        # The per-student rebuild query, not the caller's own lookups
+        if threading.current_thread() is builder and 'users.id IN' in statement:
+            querying.set()
+            release.wait(5)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', hold)
+    try:
+        directory.invalidate(student_id)
+        builder = threading.Thread(target=lambda: app.test_client().get('/api/students', headers=agency))
+        builder.start()
+        assert querying.wait(5)
+        # The builder is inside its query; invalidating must not block on it
+        done = threading.Event()
+        threading.Thread(target=lambda: (directory.invalidate(student_id), done.set())).start()
+        assert done.wait(1)
+        release.set()
+        builder.join(5)
+    finally:
+        release.set()
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', hold)
+    # The second invalidation arrived mid-build, so the next read rebuilds again
+    assert directory._built_version != directory._version
+    assert client.put('/api/profile', json={'bio': 'hello'}, headers=student).status_code == 200
+    assert client.get(f'/api/students/{student_id}', headers=agency).json['bio'] == 'hello'
+    assert directory._built_version == directory._version
+
+if __name__ == "__main__":
+    test_profile_write_rebuilds_one_student(app_factory())
+    test_invalidate_does_not_wait_for_a_rebuild(app_factory())
+    print("✅ Student directory rebuilds only what changed, outside its lock")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Single Writer Test
+Runs writes through the DB_SINGLE_WRITER thread and checks what a caller
+sees when its wait times out: a write still in the queue is cancelled and
+reported as busy (503 with Retry-After on HTTP routes), while a write the
+writer already started is waited for and reported as the success it is.
+Also checks that each app's writes go to that app's own database.
+
+Run with: python -m pytest test_writer.py   (or python test_writer.py)
+"""
+
+import threading
+import time
+
+from conftest import app_factory
+from database import db, Task, Workspace
+from writer import WriterBusy, run_write
+
+WRITER = {'DB_SINGLE_WRITER': True, 'DB_WRITE_TIMEOUT': 0.3}
+
+def occupy_writer(app):
+    """Queue a unit of work that holds the writer until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(10)
+
+    def submit():
+        with app.app_context():
+            run_write(hold)
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    assert started.wait(5)
+    return release, thread
+
+def setup_task(app):
+    client = app.test_client()
+    r = client.post('/api/signup', json={'username': 'writer', 'email': 'writer@example.com',
+                                         'password': 'password123', 'first_name': 'Wri', 'last_name': 'Ter',
+                                         'role': 'external'})
+    headers = {'Authorization': f"Bearer {r.json['access_token']}"}
+    ws = client.post('/api/workspaces', json={'name': 'Writes'}, headers=headers).json['workspace']['id']
+    r = client.post(f'/api/workspaces/{ws}/tasks', json={'title': 'Before'}, headers=headers)
+    assert r.status_code == 201, r.json
+    return client, headers, r.json['task']['id']
+
+def task_title(app, task_id):
+    with app.app_context():
+        return db.session.get(Task, task_id).title
+
+def test_queued_write_is_cancelled_on_timeout(make_app):
+    app = make_app('cancel.db', **WRITER)
+    client, headers, task_id = setup_task(app)
+    release, holder = occupy_writer(app)
+    try:
+        r = client.put(f'/api/tasks/{task_id}', json={'title': 'After'}, headers=headers)
+        assert r.status_code == 503 and r.headers['Retry-After'] == '1', r.json
+        with app.app_context():
+            try:
+                run_write(lambda: None)
+            except WriterBusy:
+                pass
+            else:
+                raise AssertionError('queued write was not cancelled')
+    finally:
+        release.set()
+        holder.join(5)
+    # The writer skips the cancelled units: the caller was told it failed, and it did
+    with app.app_context():
+        run_write(lambda: None)
+    assert task_title(app, task_id) == 'Before'
+
+def test_started_write_is_reported_as_done(make_app):
+    app = make_app('slow.db', **WRITER)
+    client, headers, task_id = setup_task(app)
+
+    def slow_rename():
+        time.sleep(0.6)  # longer than DB_WRITE_TIMEOUT
+        db.session.get(Task, task_id).title = 'Slow'
+        return 'renamed'
+
+    with app.app_context():
+        assert run_write(slow_rename) == 'renamed'
+    assert task_title(app, task_id) == 'Slow'
+
+def test_each_app_writes_to_its_own_database(make_app):
+    first, second, inline = make_app('first.db', **WRITER), make_app('second.db', **WRITER), make_app('inline.db', DB_SINGLE_WRITER=False)
+    assert first.extensions['single_writer'] is not second.extensions['single_writer']
+    assert 'single_writer' not in inline.extensions
+
+    def add_workspace(name):
+        db.session.add(Workspace(name=name, created_by=1))
+        return threading.current_thread().name
+
+    threads = {}
+    for app in (first, second, inline):
+        with app.app_context():
+            threads[app] = run_write(add_workspace, app.config['SQLALCHEMY_DATABASE_URI'])
+    assert threads[first] == threads[second] == 'db-writer'
+    assert threads[inline] == threading.current_thread().name
+    for app in (first, second, inline):
+        with app.app_context():
+            assert [w.name for w in Workspace.query] == [app.config['SQLALCHEMY_DATABASE_URI']]
+
+if __name__ == "__main__":
+    test_queued_write_is_cancelled_on_timeout(app_factory())
+    test_started_write_is_reported_as_done(app_factory())
+    test_each_app_writes_to_its_own_database(app_factory())
+    print("✅ Timed-out writes are either cancelled or reported as done, never both")